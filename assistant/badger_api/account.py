@@ -1,26 +1,55 @@
-import requests
-from assistant.badger_api.config import urls
-import concurrent.futures
+from assistant.badger_api.client import get_json
+from config.rewards_config import rewards_config
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
 
 
 def fetch_account_data(address):
-    data = (
-        requests.get("{}/accounts/{}".format(urls["staging"], address))
-        .json()
-        .get("claimableBalances", [])
-    )
+    data = get_json("/accounts/{}".format(address)).get("claimableBalances", [])
     return data
 
 
-def fetch_claimable_balances(addresses):
-    results = {}
-    with concurrent.futures.ThreadPoolExecutor(max_workers=100) as executor:
-        futures_to_addr = {
-            executor.submit(fetch_account_data, address=addr): addr
-            for addr in addresses
+def fetch_accounts_bulk(addresses):
+    """
+    Claimable balances of several accounts in one request, from
+    rewards_config.badgerApiBulkAccountsPath answering
+    {address: {"claimableBalances": [...]}}
+    """
+    path = "{}?addresses={}".format(
+        rewards_config.badgerApiBulkAccountsPath, ",".join(addresses)
+    )
+    accounts = get_json(path)
+    return {
+        addr: accounts.get(addr, {}).get("claimableBalances", []) for addr in addresses
+    }
+
+
+def iter_claimable_balances(addresses):
+    """
+    Yield (address, claimableBalances) as they come in, with at most
+    badgerApiConcurrency requests in flight
+    """
+    if rewards_config.badgerApiBulkAccountsPath:
+        batchSize = rewards_config.badgerApiBulkSize
+        for i in range(0, len(addresses), batchSize):
+            yield from fetch_accounts_bulk(addresses[i : i + batchSize]).items()
+        return
+
+    concurrency = rewards_config.badgerApiConcurrency
+    remaining = iter(addresses)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = {
+            executor.submit(fetch_account_data, addr): addr
+            for addr in islice(remaining, concurrency)
         }
-        for future in concurrent.futures.as_completed(futures_to_addr):
-            addr = futures_to_addr[future]
-            data = future.result()
-            results[addr] = data
-    return results
+        while pending:
+            (done, _) = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                addr = pending.pop(future)
+                for nextAddr in islice(remaining, 1):
+                    pending[executor.submit(fetch_account_data, nextAddr)] = nextAddr
+                yield (addr, future.result())
+
+
+def fetch_claimable_balances(addresses):
+    return dict(iter_claimable_balances(addresses))
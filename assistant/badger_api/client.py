@@ -0,0 +1,55 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from assistant.badger_api.config import urls
+from assistant.fixtures.bundle import fixture_response
+from config.rewards_config import rewards_config
+
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+sessions = {}
+sessionLock = threading.Lock()
+
+
+def session():
+    """
+    Keep-alive session shared by every badger api request, holding up to
+    badgerApiConcurrency connections and retrying failed requests with
+    exponential backoff
+    """
+    with sessionLock:
+        if "session" not in sessions:
+            retry = Retry(
+                total=rewards_config.badgerApiRetries,
+                backoff_factor=rewards_config.badgerApiBackoff,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=["GET"],
+            )
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=rewards_config.badgerApiConcurrency,
+                max_retries=retry,
+            )
+            s = requests.Session()
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            sessions["session"] = s
+        return sessions["session"]
+
+
+def fetch_json(path):
+    response = session().get(
+        "{}{}".format(urls["staging"], path), timeout=rewards_config.badgerApiTimeout
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def get_json(path):
+    """
+    GET a badger api path, e.g. "/prices", recorded to or replayed from the
+    fixture bundle when fixtures are on
+    """
+    return fixture_response("badger_api", path, lambda: fetch_json(path))
@@ -1,14 +1,66 @@
-import requests
-from assistant.badger_api.config import urls
+import json
+
+from assistant.badger_api.client import get_json
+from config.rewards_config import rewards_config
+from helpers.ttl_cache import TTLCache
 
 
 def fetch_ppfs():
-    response = requests.get("{}/setts".format(urls["staging"])).json()
+    response = get_json("/setts")
     badger = [s for s in response if s["asset"] == "BADGER"][0]
     digg = [s for s in response if s["asset"] == "DIGG"][0]
     return badger["ppfs"], digg["ppfs"]
 
 
 def fetch_token_prices():
-    response = requests.get("{}/prices".format(urls["staging"])).json()
+    response = get_json("/prices")
     return response
+
+
+def read_price_snapshot(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_price_snapshot(path, prices, block=None):
+    with open(path, "w") as f:
+        json.dump({"block": block, "prices": prices}, f, indent=4)
+
+
+class TokenPrices:
+    """
+    Token prices from the badger api, fetched on first use and refetched
+    after rewards_config.priceTtl seconds.
+    For reproducible runs, prices are pinned with pin() or read from the
+    snapshot file at rewards_config.priceSnapshot instead.
+    """
+
+    def __init__(self):
+        self.cache = TTLCache()
+
+    def fetch(self):
+        if rewards_config.priceSnapshot:
+            return read_price_snapshot(rewards_config.priceSnapshot)["prices"]
+        return fetch_token_prices()
+
+    def all(self):
+        ttl = None if rewards_config.priceSnapshot else rewards_config.priceTtl
+        return self.cache.get("prices", self.fetch, ttl)
+
+    def __getitem__(self, token):
+        return self.all()[token]
+
+    def pin(self, prices):
+        self.cache.pin("prices", prices)
+
+    def unpin(self):
+        self.cache.unpin("prices")
+
+    def snapshot(self, path, block=None):
+        """
+        Save the prices in use, to pin a later run to them
+        """
+        write_price_snapshot(path, self.all(), block)
+
+
+prices = TokenPrices()
@@ -0,0 +1,106 @@
+import json
+import os
+import time
+
+from rich.console import Console
+from assistant.badger_api.config import urls
+from assistant.subgraph.cache import cache_key, get_subgraph_cache
+from assistant.subgraph.config import subgraph_config
+from config.rewards_config import rewards_config
+
+console = Console()
+
+"""
+Recorded fixture bundles for the rewards pipeline.
+
+A bundle is a directory holding everything a rewards cycle read from the
+outside world:
+
+- responses.sqlite: subgraph, badger api and JSON-RPC responses, in the
+  subgraph cache format
+- s3/<bucket>/<key>[@<versionId>]: objects downloaded from s3
+- published/<bucket>/<key>: objects uploaded while replaying
+- manifest.json: the endpoints the bundle was recorded against
+
+Modes (rewards_config.fixtureMode):
+- "off": nothing is recorded
+- "record": every response is stored in the bundle on its way through
+- "replay": responses only come from the bundle, misses raise FixtureMiss
+"""
+
+FIXTURE_MODES = ["off", "record", "replay"]
+RESPONSES_FILE = "responses.sqlite"
+MANIFEST_FILE = "manifest.json"
+
+
+class FixtureMiss(Exception):
+    pass
+
+
+def fixture_file(*parts):
+    return os.path.join(rewards_config.fixturePath, *parts)
+
+
+def use_fixtures(mode, path):
+    """
+    Record to or replay from the bundle at path.
+    Subgraph queries go through the subgraph cache, pointed at the bundle.
+    """
+    assert mode in FIXTURE_MODES, "Unknown fixture mode {}".format(mode)
+    rewards_config.fixtureMode = mode
+    rewards_config.fixturePath = path
+    if mode == "off":
+        return
+
+    os.makedirs(path, exist_ok=True)
+    rewards_config.subgraphCachePath = os.path.join(path, RESPONSES_FILE)
+    rewards_config.subgraphCacheMaxBytes = None
+    rewards_config.subgraphCacheMode = "readwrite" if mode == "record" else "replay"
+    if mode == "record":
+        write_manifest()
+    console.log("{} fixtures at {}".format(mode.capitalize(), path))
+
+
+def write_manifest(**extra):
+    manifest = read_manifest()
+    manifest.update(
+        {
+            "recordedAt": int(time.time()),
+            "subgraphs": dict(subgraph_config),
+            "badgerApi": urls["staging"],
+            **extra,
+        }
+    )
+    with open(fixture_file(MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=4)
+
+
+def read_manifest():
+    path = fixture_file(MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def fixture_response(service, request, fetch):
+    """
+    JSON response of a request to service, fetch() being the live call.
+    request identifies the call and must be JSON serializable.
+    """
+    mode = rewards_config.fixtureMode
+    assert mode in FIXTURE_MODES, "Unknown fixture mode {}".format(mode)
+    if mode == "off":
+        return fetch()
+
+    cache = get_subgraph_cache()
+    key = cache_key(service, "", request)
+    if mode == "replay":
+        response = cache.get(key)
+        if response is None:
+            raise FixtureMiss("No recorded {} response for {}".format(service, request))
+        return response
+
+    response = fetch()
+    cache.put(key, service, None, response)
+    return response
@@ -0,0 +1,62 @@
+import json
+
+from assistant.fixtures.bundle import fixture_response, write_manifest
+from config.rewards_config import rewards_config
+
+"""
+Recording of contract reads, as a web3 middleware on the JSON-RPC requests.
+Recorded calls are replayed by the replay server's /rpc endpoint.
+"""
+
+# Calls that only read chain state
+RPC_READ_METHODS = [
+    "eth_blockNumber",
+    "eth_call",
+    "eth_chainId",
+    "eth_gasPrice",
+    "eth_getBalance",
+    "eth_getBlockByHash",
+    "eth_getBlockByNumber",
+    "eth_getCode",
+    "eth_getLogs",
+    "eth_getStorageAt",
+    "eth_getTransactionByHash",
+    "eth_getTransactionReceipt",
+    "net_version",
+    "web3_clientVersion",
+]
+
+
+def rpc_request(method, params):
+    """
+    JSON form of a request, the key it is recorded under
+    """
+    return json.loads(
+        json.dumps(
+            [method, list(params or [])],
+            default=lambda v: v.hex() if hasattr(v, "hex") else str(v),
+        )
+    )
+
+
+def rpc_recorder(make_request, w3):
+    def middleware(method, params):
+        if rewards_config.fixtureMode != "record" or method not in RPC_READ_METHODS:
+            return make_request(method, params)
+        response = fixture_response(
+            "rpc", rpc_request(method, params), lambda: make_request(method, params)
+        )
+        return response
+
+    return middleware
+
+
+def install_rpc_recorder(w3):
+    """
+    Record w3's read calls into the fixture bundle.
+    Injected closest to the provider, so raw JSON-RPC requests and responses
+    are recorded.
+    """
+    if "fixtures" not in w3.middleware_onion:
+        w3.middleware_onion.inject(rpc_recorder, name="fixtures", layer=0)
+    write_manifest(chainId=int(w3.net.version))
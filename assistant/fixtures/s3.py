@@ -0,0 +1,122 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+
+from assistant.fixtures.bundle import FixtureMiss, fixture_file, fixture_response
+
+"""
+s3 clients for fixture bundles, covering the calls aws_utils makes.
+Objects are kept as files under the bundle's s3/ directory.
+"""
+
+
+def object_file(bucket, key, versionId=None):
+    name = key if versionId is None else "{}@{}".format(key, versionId)
+    return fixture_file("s3", bucket, name)
+
+
+def published_file(bucket, key):
+    return fixture_file("published", bucket, key)
+
+
+def write_object(path, body):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(body)
+
+
+def copy_object(source, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    shutil.copyfile(source, path)
+
+
+def as_json(response):
+    # Responses hold datetimes
+    return json.loads(json.dumps(response, default=str))
+
+
+class PublishedS3:
+    """
+    Uploads written to the bundle's published/ directory instead of s3
+    """
+
+    def __init__(self):
+        # Upload arguments of each published object, returned by head_object
+        self.published = {}
+
+    def put_object(self, Body, Bucket, Key):
+        body = Body.encode() if isinstance(Body, str) else Body
+        write_object(published_file(Bucket, Key), body)
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Config=None):
+        copy_object(Filename, published_file(Bucket, Key))
+        self.published[(Bucket, Key)] = ExtraArgs or {}
+
+    def head_object(self, Bucket, Key):
+        path = published_file(Bucket, Key)
+        if not os.path.exists(path):
+            raise FixtureMiss("No published s3 object s3://{}/{}".format(Bucket, Key))
+        with open(path, "rb") as f:
+            etag = hashlib.md5(f.read()).hexdigest()
+        return {
+            "ContentLength": os.path.getsize(path),
+            "ETag": '"{}"'.format(etag),
+            "Metadata": {},
+            **self.published.get((Bucket, Key), {}),
+        }
+
+
+class RecordingS3(PublishedS3):
+    """
+    Wraps a boto3 s3 client, copying everything it downloads into the bundle.
+    Nothing is written to s3: uploads go to the bundle's published/ directory.
+    """
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+
+    def get_object(self, Bucket, Key, VersionId=None):
+        kwargs = {"Bucket": Bucket, "Key": Key}
+        if VersionId is not None:
+            kwargs["VersionId"] = VersionId
+        response = self.client.get_object(**kwargs)
+        body = response["Body"].read()
+        write_object(object_file(Bucket, Key, VersionId), body)
+        return {**response, "Body": io.BytesIO(body)}
+
+    def download_file(self, Bucket, Key, Filename):
+        self.client.download_file(Bucket, Key, Filename)
+        copy_object(Filename, object_file(Bucket, Key))
+
+    def list_object_versions(self, **kwargs):
+        response = self.client.list_object_versions(**kwargs)
+        fixture_response(
+            "s3", ["list_object_versions", kwargs], lambda: as_json(response)
+        )
+        return response
+
+
+class FixtureS3(PublishedS3):
+    """
+    Serves downloads from the bundle and writes uploads to its published/
+    directory instead of s3
+    """
+
+    def open_object(self, Bucket, Key, VersionId=None):
+        path = object_file(Bucket, Key, VersionId)
+        if not os.path.exists(path):
+            raise FixtureMiss("No recorded s3 object s3://{}/{}".format(Bucket, Key))
+        return path
+
+    def get_object(self, Bucket, Key, VersionId=None):
+        with open(self.open_object(Bucket, Key, VersionId), "rb") as f:
+            return {"Body": io.BytesIO(f.read())}
+
+    def download_file(self, Bucket, Key, Filename):
+        shutil.copyfile(self.open_object(Bucket, Key), Filename)
+
+    def list_object_versions(self, **kwargs):
+        return fixture_response("s3", ["list_object_versions", kwargs], None)
@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from graphql import parse, print_ast
+from rich.console import Console
+from assistant.fixtures.bundle import MANIFEST_FILE, RESPONSES_FILE
+from assistant.fixtures.rpc import rpc_request
+from assistant.subgraph.cache import SubgraphCache, cache_key
+
+console = Console()
+
+"""
+Local stand in for the subgraphs, the badger api and the JSON-RPC node,
+serving a recorded fixture bundle over HTTP:
+
+- POST /subgraphs/<name>  GraphQL, <name> as in assistant/subgraph/config.py
+- GET  /api/<path>        badger api
+- POST /rpc               JSON-RPC, for brownie and web3
+
+python -m assistant.fixtures.server fixtures/cycle --port 8545
+"""
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length))
+
+    def send_json(self, body, status=200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path == "/rpc":
+            request = self.read_json()
+            if isinstance(request, list):
+                self.send_json([self.server.rpc(r) for r in request])
+            else:
+                self.send_json(self.server.rpc(request))
+        elif self.path.startswith("/subgraphs/"):
+            name = self.path[len("/subgraphs/") :]
+            self.send_json(self.server.subgraph(name, self.read_json()))
+        else:
+            self.send_json({"error": "Unknown path {}".format(self.path)}, 404)
+
+    def do_GET(self):
+        if self.path.startswith("/api/"):
+            (response, found) = self.server.badger_api(self.path[len("/api") :])
+            self.send_json(response, 200 if found else 404)
+        else:
+            self.send_json({"error": "Unknown path {}".format(self.path)}, 404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, path, host="127.0.0.1", port=0):
+        super().__init__((host, port), ReplayHandler)
+        self.bundlePath = path
+        self.responses = SubgraphCache(os.path.join(path, RESPONSES_FILE), None)
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        self.misses = []
+        self.thread = None
+
+    @property
+    def url(self):
+        (host, port) = self.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def endpoints(self):
+        """
+        URLs to point subgraph_config, the badger api and brownie at
+        """
+        return {
+            "subgraphs": {
+                name: "{}/subgraphs/{}".format(self.url, name)
+                for name in self.manifest["subgraphs"]
+            },
+            "badgerApi": "{}/api".format(self.url),
+            "rpc": "{}/rpc".format(self.url),
+        }
+
+    def lookup(self, endpoint, queryText, request):
+        return self.responses.get(cache_key(endpoint, queryText, request))
+
+    def miss(self, endpoint, request):
+        self.misses.append([endpoint, request])
+
+    def rpc(self, request):
+        (method, params) = (request["method"], request.get("params", []))
+        response = self.lookup("rpc", "", rpc_request(method, params))
+        if response is None and method in ["eth_chainId", "net_version"]:
+            chainId = self.manifest["chainId"]
+            result = hex(chainId) if method == "eth_chainId" else str(chainId)
+            response = {"jsonrpc": "2.0", "result": result}
+        if response is None:
+            self.miss("rpc", request)
+            response = {
+                "jsonrpc": "2.0",
+                "error": {"code": -32000, "message": "No recorded response"},
+            }
+        return {**response, "id": request.get("id")}
+
+    def subgraph(self, name, body):
+        endpoint = self.manifest["subgraphs"].get(name)
+        queryText = print_ast(parse(body["query"]))
+        response = self.lookup(endpoint, queryText, body.get("variables"))
+        if response is None:
+            self.miss(endpoint, body)
+            return {"errors": [{"message": "No recorded response"}]}
+        return {"data": response}
+
+    def badger_api(self, path):
+        response = self.lookup("badger_api", "", path)
+        if response is None:
+            self.miss("badger_api", path)
+            return ({"error": "No recorded response"}, False)
+        return (response, True)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.responses.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a recorded fixture bundle")
+    parser.add_argument("path")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8545)
+    args = parser.parse_args()
+
+    server = ReplayServer(args.path, args.host, args.port)
+    console.log("Serving {} at {}".format(args.path, server.url))
+    for name, url in server.endpoints().items():
+        console.log(name, url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        console.log("{} requests had no recorded response".format(len(server.misses)))
+        server.stop()
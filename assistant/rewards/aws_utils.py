@@ -1,73 +1,162 @@
 import boto3
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from brownie import *
 from rich.console import Console
 from config.env_config import env_config
+from config.rewards_config import rewards_config
+from assistant.fixtures.s3 import FixtureS3, RecordingS3
+from assistant.rewards.classes.LazyTree import LazyTree
+from assistant.rewards.classes.TreeCache import TreeCache
 import json
 
 console = Console()
 
-s3 = boto3.client(
-    "s3",
-    aws_access_key_id=env_config.aws_access_key_id,
-    aws_secret_access_key=env_config.aws_secret_access_key,
-)
+s3_clients = {}
+
+
+def s3_client():
+    """
+    s3 client for the current fixture mode, recording downloads to or
+    replaying them from the fixture bundle
+    """
+    mode = rewards_config.fixtureMode
+    if mode not in s3_clients:
+        if mode == "replay":
+            s3_clients[mode] = FixtureS3()
+        else:
+            client = boto3.client(
+                "s3",
+                aws_access_key_id=env_config.aws_access_key_id,
+                aws_secret_access_key=env_config.aws_secret_access_key,
+                config=Config(max_pool_connections=rewards_config.s3MaxPoolConnections),
+            )
+            s3_clients[mode] = RecordingS3(client) if mode == "record" else client
+    return s3_clients[mode]
+
+
 merkle_bucket = "badger-merkle-proofs"
 rewards_bucket = "badger-json"
 analytics_bucket = "badger-analytics"
 
+GZIP_MAGIC = b"\x1f\x8b"
+DIGEST_CHUNK_SIZE = 1 << 20
 
-def download_latest_tree():
 
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=env_config.aws_access_key_id,
-        aws_secret_access_key=env_config.aws_secret_access_key,
-    )
+def decode_body(body):
+    """
+    Published trees may be gzip compressed, JSON never starts with gzip's magic
+    """
+    if body[:2] == GZIP_MAGIC:
+        return gzip.decompress(body)
+    return body
+
 
+def decode_file(path):
+    with open(path, "rb") as f:
+        compressed = f.read(2) == GZIP_MAGIC
+    if compressed:
+        decodedPath = path + ".decoded"
+        with gzip.open(path, "rb") as src, open(decodedPath, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(decodedPath, path)
+
+
+def download_latest_tree():
     target = {
         "bucket": merkle_bucket,
         "key": "badger-tree.json",
     }  # badger-api production
 
     console.print("Downloading latest rewards file from s3: " + target["bucket"])
-    s3_clientobj = s3.get_object(Bucket=target["bucket"], Key=target["key"])
-    s3_clientdata = s3_clientobj["Body"].read().decode("utf-8")
+    s3_clientobj = s3_client().get_object(Bucket=target["bucket"], Key=target["key"])
+    s3_clientdata = decode_body(s3_clientobj["Body"].read()).decode("utf-8")
     return s3_clientdata
 
 
 def download_tree(fileName):
-
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=env_config.aws_access_key_id,
-        aws_secret_access_key=env_config.aws_secret_access_key,
-    )
-
     upload_bucket = "badger-json"
     upload_file_key = "rewards/" + fileName
 
     console.print("Downloading file from s3: " + upload_file_key)
 
-    s3_clientobj = s3.get_object(Bucket=upload_bucket, Key=upload_file_key)
+    s3_clientobj = s3_client().get_object(Bucket=upload_bucket, Key=upload_file_key)
     # console.print(s3_clientobj)
-    s3_clientdata = s3_clientobj["Body"].read().decode("utf-8")
+    s3_clientdata = decode_body(s3_clientobj["Body"].read()).decode("utf-8")
 
     return s3_clientdata
 
 
-def download_past_trees(number):
-    trees = []
+def download_tree_to_file(fileName, path):
+    """
+    Stream a rewards file from s3 straight to disk instead of into memory
+    """
+    upload_bucket = "badger-json"
+    upload_file_key = "rewards/" + fileName
+
+    console.print("Downloading file from s3: " + upload_file_key + " to " + path)
+    s3_client().download_file(upload_bucket, upload_file_key, path)
+    decode_file(path)
+    return path
+
+
+def past_tree_versions(number):
     key = "badger-tree.json"
-    response = s3.list_object_versions(Prefix=key, Bucket=merkle_bucket)
-    versions = response["Versions"][:number]
-    for version in versions:
-        console.log(version["Key"], version["VersionId"])
-        # yield version
-        s3_client_obj = s3.get_object(
-            Bucket=merkle_bucket, Key=version["Key"], VersionId=version["VersionId"]
+    response = s3_client().list_object_versions(Prefix=key, Bucket=merkle_bucket)
+    return response["Versions"][:number]
+
+
+tree_caches = {}
+
+
+def tree_cache():
+    path = rewards_config.treeCachePath
+    if path not in tree_caches:
+        tree_caches[path] = TreeCache(path)
+    return tree_caches[path]
+
+
+def download_tree_version(version):
+    console.log(version["Key"], version["VersionId"])
+    s3_client_obj = s3_client().get_object(
+        Bucket=merkle_bucket, Key=version["Key"], VersionId=version["VersionId"]
+    )
+    tree_cache().put(
+        version["VersionId"],
+        s3_client_obj["Body"],
+        lastModified=str(version.get("LastModified")),
+    )
+
+
+def cache_past_trees(number):
+    """
+    Make sure the last number versions of the tree are in the tree cache,
+    downloading missing ones concurrently. Returns their VersionIds, newest first.
+    """
+    cache = tree_cache()
+    versions = past_tree_versions(number)
+    missing = [v for v in versions if cache.get(v["VersionId"]) is None]
+    console.log(
+        "{} of {} past trees cached, downloading {}".format(
+            len(versions) - len(missing), len(versions), len(missing)
         )
-        trees.append(s3_client_obj["Body"].read())
-    return trees
+    )
+    if len(missing) > 0:
+        workers = min(rewards_config.treeDownloadWorkers, len(missing))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(download_tree_version, missing))
+    return [v["VersionId"] for v in versions]
+
+
+def download_past_trees(number):
+    cache = tree_cache()
+    return [cache.read(versionId) for versionId in cache_past_trees(number)]
 
 
 def upload(fileName, data, bucket="badger-json", publish=True):
@@ -96,16 +185,112 @@ def upload(fileName, data, bucket="badger-json", publish=True):
             }  # badger-api production
         )
 
-    for target in upload_targets:
-        console.print(
-            "Uploading file to s3://" + target["bucket"] + "/" + target["key"]
-        )
-        s3.put_object(
-            Body=str(json.dumps(data)), Bucket=target["bucket"], Key=target["key"]
-        )
-        console.print(
-            "✅ Uploaded file to s3://" + target["bucket"] + "/" + target["key"]
-        )
+    with tempfile.TemporaryDirectory() as directory:
+        payload = write_payload(data, directory)
+        # One target at a time, staging first: a failed or unverified
+        # staging upload stops the tree before it reaches production
+        for target in upload_targets:
+            upload_payload(payload, target)
+
+
+def transfer_config():
+    return TransferConfig(
+        multipart_threshold=rewards_config.s3MultipartChunkSize,
+        multipart_chunksize=rewards_config.s3MultipartChunkSize,
+        max_concurrency=rewards_config.s3MaxConcurrency,
+    )
+
+
+def write_payload(data, directory):
+    """
+    Serialize and compress a tree once for every upload target.
+    LazyTrees are already serialized on disk.
+    """
+    encoding = rewards_config.publishEncoding
+    assert encoding in [None, "gzip"], "Unknown encoding {}".format(encoding)
+    path = os.path.join(directory, "payload.json")
+    if encoding == "gzip":
+        path += ".gz"
+        with gzip.open(path, "wb", compresslevel=6) as out:
+            if isinstance(data, LazyTree):
+                with open(data.path, "rb") as src:
+                    shutil.copyfileobj(src, out)
+            else:
+                out.write(json.dumps(data).encode())
+    elif isinstance(data, LazyTree):
+        path = data.path
+    else:
+        with open(path, "w") as out:
+            json.dump(data, out)
+    return {"path": path, "encoding": encoding, **file_digests(path)}
+
+
+def file_digests(path):
+    """
+    Size, sha256 and the ETags s3 gives the file in one or several parts
+    """
+    chunkSize = rewards_config.s3MultipartChunkSize
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    partDigests = []
+    part = hashlib.md5()
+    partSize = 0
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(min(DIGEST_CHUNK_SIZE, chunkSize - partSize))
+            if not chunk:
+                break
+            sha256.update(chunk)
+            md5.update(chunk)
+            part.update(chunk)
+            partSize += len(chunk)
+            size += len(chunk)
+            if partSize == chunkSize:
+                partDigests.append(part.digest())
+                part = hashlib.md5()
+                partSize = 0
+    if partSize > 0:
+        partDigests.append(part.digest())
+    return {
+        "size": size,
+        "sha256": sha256.hexdigest(),
+        "etag": md5.hexdigest(),
+        "multipartEtag": "{}-{}".format(
+            hashlib.md5(b"".join(partDigests)).hexdigest(), len(partDigests)
+        ),
+    }
+
+
+def upload_payload(payload, target):
+    bucket = target["bucket"]
+    key = target["key"]
+    console.print("Uploading file to s3://" + bucket + "/" + key)
+    extraArgs = {
+        "ContentType": "application/json",
+        "Metadata": {"sha256": payload["sha256"]},
+    }
+    if payload["encoding"] is not None:
+        extraArgs["ContentEncoding"] = payload["encoding"]
+    s3_client().upload_file(
+        payload["path"], bucket, key, ExtraArgs=extraArgs, Config=transfer_config()
+    )
+    verify_upload(payload, bucket, key)
+    console.print("✅ Uploaded file to s3://" + bucket + "/" + key)
+
+
+def verify_upload(payload, bucket, key):
+    """
+    Check the uploaded object against the payload's size, ETag and sha256
+    """
+    head = s3_client().head_object(Bucket=bucket, Key=key)
+    etag = head["ETag"].strip('"')
+    expectedEtag = payload["multipartEtag"] if "-" in etag else payload["etag"]
+    assert head["ContentLength"] == payload["size"], "Size mismatch for " + key
+    assert etag == expectedEtag, "ETag mismatch for " + key
+    assert head["Metadata"].get("sha256") == payload["sha256"], (
+        "Hash mismatch for " + key
+    )
 
 
 def upload_boosts(test):
@@ -116,12 +301,23 @@ def upload_boosts(test):
     else:
         bucket = "badger-merkle-proofs"
     console.log("Uploading file to s3://" + bucket + "/" + fileName)
-    s3.upload_file(fileName, bucket, fileName)
+    s3_client().upload_file(fileName, bucket, fileName)
     console.log("✅ Uploaded file to s3://" + bucket + "/" + fileName)
 
 
 def upload_analytics(cycle, data):
     jsonKey = "logs/{}.json".format(cycle)
     console.log("Uploading file to s3://" + analytics_bucket + "/" + jsonKey)
-    s3.put_object(Body=str(json.dumps(data)), Bucket=analytics_bucket, Key=jsonKey)
+    s3_client().put_object(
+        Body=str(json.dumps(data)), Bucket=analytics_bucket, Key=jsonKey
+    )
+    console.log("✅ Uploaded file to s3://" + analytics_bucket + "/" + jsonKey)
+
+
+def upload_trace(cycle, data):
+    jsonKey = "logs/{}-trace.json".format(cycle)
+    console.log("Uploading file to s3://" + analytics_bucket + "/" + jsonKey)
+    s3_client().put_object(
+        Body=str(json.dumps(data)), Bucket=analytics_bucket, Key=jsonKey
+    )
     console.log("✅ Uploaded file to s3://" + analytics_bucket + "/" + jsonKey)
@@ -1,102 +1,64 @@
 from brownie import *
 import json
+import numpy as np
 from rich.console import Console
 from assistant.rewards.aws_utils import upload_boosts
 from assistant.subgraph.client import fetch_wallet_balances
-from helpers.constants import BADGER, DIGG, SETT_BOOST_RATIOS, MAX_BOOST
-from collections import OrderedDict
-from assistant.rewards.rewards_utils import combine_balances, calculate_sett_balances
-from assistant.badger_api.prices import (
-    fetch_token_prices,
-    fetch_ppfs,
-)
+from helpers.constants import BADGER, DIGG, SETT_BOOST_RATIOS
+from assistant.rewards.rewards_utils import calculate_sett_balances
+from assistant.rewards.boost_engine import calc_boosts
+from assistant.rewards.classes.CycleReads import cycleReads
+from assistant.badger_api.prices import prices
 
-from assistant.rewards.classes.UserBalance import UserBalance, UserBalances
-
-prices = fetch_token_prices()
 console = Console()
 
 boostInfo = {}
 
 
-def convert_balances_to_usd(sett, name, userBalances):
+def convert_balances_to_usd(sett, name, userBalances, tokenPrices):
+    """
+    USD value of each balance in a sett, as (addresses, usdBalances).
+    Reads the balances without modifying them, they are cached and shared
+    with the rewards calculation.
+    """
     tokenAddress = sett.address
-    price = prices[tokenAddress]
-    decimals = interface.IERC20(tokenAddress).decimals()
+    price = tokenPrices[tokenAddress]
+    decimals = cycleReads.decimals(tokenAddress)
     price_ratio = SETT_BOOST_RATIOS[name]
 
-    for user in userBalances:
-        user.balance = (price_ratio * price * user.balance) / (pow(10, decimals))
-
-    return userBalances
-
-
-def calc_cumulative(l):
-    result = [None] * len(l)
-    cumulative = 0
-    for idx, val in enumerate(l):
-        cumulative += val
-        result[idx] = cumulative
-    return result
+    addresses = [user.address for user in userBalances]
+    balances = np.array([float(user.balance) for user in userBalances])
+    return (addresses, (price_ratio * price * balances) / float(pow(10, decimals)))
 
 
-def calc_boost(percentages):
-    boosts = []
-    for p in percentages:
-        boost = MAX_BOOST - (p * (MAX_BOOST - 1))
-        if boost < 1:
-            boost = 1
-        boosts.append(boost)
-    return boosts
-
-
-def calc_stake_ratio(address, diggSetts, badgerSetts, nonNativeSetts):
-    diggBalance = getattr(diggSetts[address], "balance", 0)
-    badgerBalance = getattr(badgerSetts[address], "balance", 0)
-    nonNativeBalance = getattr(nonNativeSetts[address], "balance", 0)
-    if nonNativeBalance == 0:
-        stakeRatio = 0
-    else:
-        stakeRatio = (diggBalance + badgerBalance) / nonNativeBalance
-    return stakeRatio
-
-
-def calc_union_addresses(diggSetts, badgerSetts, nonNativeSetts):
-    return set.union(
-        *[
-            {user.address for user in diggSetts},
-            {user.address for user in badgerSetts},
-            {user.address for user in nonNativeSetts},
-        ]
-    )
-
-
-def filter_dust(balances):
-    return UserBalances(list(filter(lambda user: user.balance > 1, balances)))
+def wallet_balances_to_usd(walletBalances, price):
+    addresses = list(walletBalances.keys())
+    return (addresses, np.array(list(walletBalances.values()), dtype=float) * price)
 
 
 def badger_boost(badger, currentBlock):
     console.log("Calculating boost ...")
+    # One set of prices for the whole boost calculation
+    tokenPrices = prices.all()
     allSetts = badger.sett_system.vaults
-    diggSetts = UserBalances()
-    badgerSetts = UserBalances()
-    nonNativeSetts = UserBalances()
-    boostInfo = {}
+    diggParts = []
+    badgerParts = []
+    nonNativeParts = []
     for name, sett in allSetts.items():
         if name in ["experimental.digg"]:
             continue
         balances = calculate_sett_balances(badger, name, currentBlock)
-        balances = convert_balances_to_usd(sett, name, balances)
+        usdBalances = convert_balances_to_usd(sett, name, balances, tokenPrices)
         if name in ["native.uniDiggWbtc", "native.sushiDiggWbtc", "native.digg"]:
-            diggSetts = combine_balances([diggSetts, balances])
+            diggParts.append(usdBalances)
         elif name in [
             "native.badger",
             "native.uniBadgerWbtc",
             "native.sushiBadgerWbtc",
         ]:
-            badgerSetts = combine_balances([badgerSetts, balances])
+            badgerParts.append(usdBalances)
         else:
-            nonNativeSetts = combine_balances([nonNativeSetts, balances])
+            nonNativeParts.append(usdBalances)
 
     sharesPerFragment = badger.digg.logic.UFragments._sharesPerFragment()
     badger_wallet_balances, digg_wallet_balances, _ = fetch_wallet_balances(
@@ -108,84 +70,15 @@ def badger_boost(badger, currentBlock):
             len(badger_wallet_balances), len(digg_wallet_balances)
         )
     )
-    badger_wallet_balances = UserBalances(
-        [
-            UserBalance(addr, bal * prices[BADGER], BADGER)
-            for addr, bal in badger_wallet_balances.items()
-        ]
+    badgerParts.append(
+        wallet_balances_to_usd(badger_wallet_balances, tokenPrices[BADGER])
     )
+    diggParts.append(wallet_balances_to_usd(digg_wallet_balances, tokenPrices[DIGG]))
 
-    digg_wallet_balances = UserBalances(
-        [
-            UserBalance(addr, bal * prices[DIGG], DIGG)
-            for addr, bal in digg_wallet_balances.items()
-        ]
-    )
-    badgerSetts = filter_dust(combine_balances([badgerSetts, badger_wallet_balances]))
-    diggSetts = filter_dust(combine_balances([diggSetts, digg_wallet_balances]))
-    allAddresses = calc_union_addresses(diggSetts, badgerSetts, nonNativeSetts)
-
-    console.log("Non native Setts before filter {}".format(len(nonNativeSetts)))
-    nonNativeSetts = filter_dust(nonNativeSetts)
-    console.log("Non native Setts after filter {}".format(len(nonNativeSetts)))
+    badgerBoost, boostInfo = calc_boosts(diggParts, badgerParts, nonNativeParts)
 
     console.log("Filtered balances < $1")
-
-    console.log(
-        "{} addresses collected for boost calculation".format(len(allAddresses))
-    )
-    stakeRatiosList = [
-        calc_stake_ratio(addr, diggSetts, badgerSetts, nonNativeSetts)
-        for addr in allAddresses
-    ]
-    stakeRatios = dict(zip(allAddresses, stakeRatiosList))
-    stakeRatios = OrderedDict(
-        sorted(stakeRatios.items(), key=lambda t: t[1], reverse=True)
-    )
-
-    for addr in allAddresses:
-        boostInfo[addr.lower()] = {
-            "nativeBalance": 0,
-            "nonNativeBalance": 0,
-            "stakeRatio": 0,
-        }
-
-    for user in badgerSetts:
-        boostInfo[user.address.lower()]["nativeBalance"] += user.balance
-
-    for user in diggSetts:
-        boostInfo[user.address.lower()]["nativeBalance"] += user.balance
-
-    for user in nonNativeSetts:
-        boostInfo[user.address.lower()]["nonNativeBalance"] += user.balance
-
-    for addr, ratio in stakeRatios.items():
-        boostInfo[addr.lower()]["stakeRatio"] = ratio
-
-    sortedNonNative = UserBalances(
-        sorted(
-            nonNativeSetts.userBalances.values(),
-            key=lambda u: stakeRatios[u.address],
-            reverse=True,
-        )
-    )
-    nonNativeTotal = sortedNonNative.total_balance()
-    percentageNonNative = {}
-    for user in sortedNonNative:
-        percentage = user.balance / nonNativeTotal
-        percentageNonNative[user.address] = percentage
-
-    cumulativePercentages = dict(
-        zip(percentageNonNative.keys(), calc_cumulative(percentageNonNative.values()))
-    )
-    badgerBoost = dict(
-        zip(cumulativePercentages.keys(), calc_boost(cumulativePercentages.values()))
-    )
-    for addr, boost in badgerBoost.items():
-        # Users with no stake ratio have a boost of 1
-        if stakeRatios[addr] == 0:
-            badgerBoost[addr] = 1
-
+    console.log("{} addresses collected for boost calculation".format(len(boostInfo)))
     console.log(len(badgerBoost))
 
     return badgerBoost, boostInfo
@@ -0,0 +1,126 @@
+import numpy as np
+from helpers.constants import MAX_BOOST
+
+"""
+Array based badger boost.
+
+Balances come in as parts, (addresses, usdBalances) pairs in the order they
+are merged. Every address is interned to an index and each group (native
+badger, native digg, non native) becomes one dense array, so the boost is a
+single sort and cumsum instead of merging UserBalances collections.
+
+Float operations are done in the same order as the UserBalances version
+(sequential sums, stable descending sort by stake ratio) so the results are
+bit for bit identical.
+"""
+
+# Balances at or below this (in USD) are dropped
+DUST_THRESHOLD = 1
+
+
+def intern_parts(addressIndex, parts):
+    """
+    Map each part's addresses to indices, adding unseen addresses to addressIndex
+    """
+    indexed = []
+    for addresses, balances in parts:
+        idx = np.empty(len(addresses), dtype=np.int64)
+        for i, addr in enumerate(addresses):
+            position = addressIndex.get(addr)
+            if position is None:
+                position = len(addressIndex)
+                addressIndex[addr] = position
+            idx[i] = position
+        indexed.append((idx, np.asarray(balances, dtype=np.float64)))
+    return indexed
+
+
+def sum_parts(indexed, numAddresses):
+    """
+    Sum each address' balances across parts, in part order.
+    Returns (present, totals, firstSeen) where firstSeen lists the addresses
+    in the order they first appear in the parts.
+    """
+    if len(indexed) == 0:
+        return (
+            np.zeros(numAddresses, dtype=bool),
+            np.zeros(numAddresses),
+            np.empty(0, dtype=np.int64),
+        )
+    idx = np.concatenate([i for i, _ in indexed])
+    balances = np.concatenate([b for _, b in indexed])
+    # bincount accumulates in input order, same as summing part by part
+    totals = np.bincount(idx, weights=balances, minlength=numAddresses)
+    present = np.bincount(idx, minlength=numAddresses) > 0
+    (_, firstPositions) = np.unique(idx, return_index=True)
+    firstSeen = idx[np.sort(firstPositions)]
+    return (present, totals, firstSeen)
+
+
+def calc_boosts(diggParts, badgerParts, nonNativeParts):
+    """
+    Compute (badgerBoost, boostInfo) from USD balances of native digg,
+    native badger and non native setts.
+    """
+    addressIndex = {}
+    diggIndexed = intern_parts(addressIndex, diggParts)
+    badgerIndexed = intern_parts(addressIndex, badgerParts)
+    nonNativeIndexed = intern_parts(addressIndex, nonNativeParts)
+    addresses = list(addressIndex.keys())
+    numAddresses = len(addresses)
+
+    (diggPresent, diggTotals, _) = sum_parts(diggIndexed, numAddresses)
+    (badgerPresent, badgerTotals, _) = sum_parts(badgerIndexed, numAddresses)
+    (nonNativePresent, nonNativeTotals, nonNativeOrder) = sum_parts(
+        nonNativeIndexed, numAddresses
+    )
+
+    diggKept = diggPresent & (diggTotals > DUST_THRESHOLD)
+    badgerKept = badgerPresent & (badgerTotals > DUST_THRESHOLD)
+    # Dust non native holders still get a boostInfo entry
+    boostedAddresses = diggKept | badgerKept | nonNativePresent
+    nonNativeKept = nonNativePresent & (nonNativeTotals > DUST_THRESHOLD)
+
+    diggBalances = np.where(diggKept, diggTotals, 0.0)
+    badgerBalances = np.where(badgerKept, badgerTotals, 0.0)
+    nonNativeBalances = np.where(nonNativeKept, nonNativeTotals, 0.0)
+    nativeBalances = badgerBalances + diggBalances
+
+    stakeRatios = np.zeros(numAddresses)
+    np.divide(
+        diggBalances + badgerBalances,
+        nonNativeBalances,
+        out=stakeRatios,
+        where=nonNativeKept,
+    )
+
+    # Rank non native holders by stake ratio, ties keep their merge order
+    nonNativeOrder = nonNativeOrder[nonNativeKept[nonNativeOrder]]
+    ranked = nonNativeOrder[np.argsort(-stakeRatios[nonNativeOrder], kind="stable")]
+    rankedBalances = nonNativeBalances[ranked]
+    if len(ranked) > 0:
+        nonNativeTotal = np.cumsum(rankedBalances)[-1]
+        cumulativePercentages = np.cumsum(rankedBalances / nonNativeTotal)
+    else:
+        cumulativePercentages = np.zeros(0)
+    boosts = MAX_BOOST - (cumulativePercentages * (MAX_BOOST - 1))
+
+    badgerBoost = {}
+    for addrIdx, boost in zip(ranked.tolist(), boosts.tolist()):
+        # Users with no stake ratio have a boost of 1
+        if boost < 1 or stakeRatios[addrIdx] == 0:
+            boost = 1
+        badgerBoost[addresses[addrIdx]] = boost
+
+    boostInfo = {}
+    for addrIdx in np.flatnonzero(boostedAddresses).tolist():
+        hasNative = badgerKept[addrIdx] or diggKept[addrIdx]
+        boostInfo[addresses[addrIdx].lower()] = {
+            "nativeBalance": float(nativeBalances[addrIdx]) if hasNative else 0,
+            "nonNativeBalance": float(nonNativeBalances[addrIdx])
+            if nonNativeKept[addrIdx]
+            else 0,
+            "stakeRatio": float(stakeRatios[addrIdx]) if nonNativeKept[addrIdx] else 0,
+        }
+
+    return (badgerBoost, boostInfo)
@@ -1,54 +1,57 @@
 from assistant.rewards.rewards_utils import calculate_sett_balances
 from assistant.rewards.classes.RewardsList import RewardsList
+from assistant.rewards.distribution import distribute
 from assistant.rewards.classes.RewardsLog import rewardsLog
 from assistant.rewards.classes.Schedule import Schedule
+from assistant.rewards.classes.CycleReads import cycleReads
 from helpers.time_utils import to_days, to_hours, to_utc_date
 from helpers.constants import NON_NATIVE_SETTS, NATIVE_DIGG_SETTS, DIGG, BADGER_TREE
+from assistant.rewards import log
 from brownie import *
-from rich.console import Console
-
-console = Console()
 
 
 def calc_snapshot(
     badger, name, startBlock, endBlock, nextCycle, boosts, unclaimedBalances
 ):
-    digg = interface.IDigg(DIGG)
-
-    console.log("==== Processing rewards for {} at {} ====".format(name, endBlock))
+    log.info("==== Processing rewards for {} at {} ====", name, endBlock)
 
     rewards = RewardsList(nextCycle, badger.badgerTree)
 
     sett = badger.getSett(name)
-    startTime = web3.eth.getBlock(startBlock)["timestamp"]
+    startTime = cycleReads.block_timestamp(startBlock)
 
-    endTime = web3.eth.getBlock(endBlock)["timestamp"]
+    endTime = cycleReads.block_timestamp(endBlock)
 
     userBalances = calculate_sett_balances(badger, name, endBlock)
 
     apyBoosts = {}
     if name in NON_NATIVE_SETTS:
-        console.log(
-            "{} users out of {} boosted in {}".format(
-                len(userBalances), len(boosts), name
-            )
+        log.info(
+            "{} users out of {} boosted in {}", len(userBalances), len(boosts), name
         )
-        preBoost = {}
-        for user in userBalances:
-            preBoost[user.address] = userBalances.percentage_of_total(user.address)
-
-        for user in userBalances:
-            boostAmount = boosts.get(user.address, 1)
-            user.boost_balance(boostAmount)
+        apyBoosts = userBalances.apply_boosts(boosts)
+
+    schedulesByToken = parse_schedules(cycleReads.unlock_schedules(badger, sett))
+    distribute_schedules(
+        rewards,
+        name,
+        userBalances,
+        schedulesByToken,
+        startTime,
+        endTime,
+        unclaimedBalances,
+    )
 
-        for user in userBalances:
-            postBoost = userBalances.percentage_of_total(user.address)
-            apyBoosts[user.address] = postBoost / preBoost[user.address]
+    return rewards, apyBoosts
 
-    schedulesByToken = parse_schedules(
-        badger.rewardsLogger.getAllUnlockSchedulesFor(sett)
-    )
 
+def distribute_schedules(
+    rewards, name, userBalances, schedulesByToken, startTime, endTime, unclaimedBalances
+):
+    """
+    Add what each unlock schedule released between startTime and endTime to
+    rewards, split by userBalances
+    """
     for token, schedules in schedulesByToken.items():
         endDist = get_distributed_for_token_at(token, endTime, schedules, name)
         startDist = get_distributed_for_token_at(token, startTime, schedules, name)
@@ -57,88 +60,84 @@ def calc_snapshot(
         # Make sure there are tokens to distribute (some geysers only
         # distribute one token)
         if token == DIGG:
-
             # if name in NATIVE_DIGG_SETTS:
             #    tokenDistribution = tokenDistribution * diggAllocation
             # else:
             #    tokenDistribution = tokenDistribution * (1 - diggAllocation)
-            fragments = digg.sharesToFragments(tokenDistribution) / 1e9
-            console.log(
-                "{} DIGG tokens distributed".format(
-                    digg.sharesToFragments(tokenDistribution) / 1e9
-                )
-            )
+            fragments = cycleReads.shares_to_fragments(tokenDistribution) / 1e9
+            log.info("{} DIGG tokens distributed", fragments)
             rewardsLog.add_total_token_dist(name, token, fragments)
         elif token == "0x20c36f062a31865bED8a5B1e512D9a1A20AA333A":
-            console.log("{} DFD tokens distributed".format(tokenDistribution / 1e18))
+            log.info("{} DFD tokens distributed", tokenDistribution / 1e18)
             rewardsLog.add_total_token_dist(name, token, tokenDistribution / 1e18)
         else:
             badgerAmount = tokenDistribution / 1e18
-            console.log("{} Badger token distributed".format(badgerAmount))
+            log.info("{} Badger token distributed", badgerAmount)
             rewardsLog.add_total_token_dist(name, token, tokenDistribution / 1e18)
 
         if tokenDistribution > 0:
-            sumBalances = sum([b.balance for b in userBalances])
-            rewardsUnit = tokenDistribution / sumBalances
-            totalRewards = 0
-            console.log("Processing rewards for {} addresses".format(len(userBalances)))
-            for user in userBalances:
+            token = web3.toChecksumAddress(token)
+            log.info("Processing rewards for {} addresses", len(userBalances))
+            rewardAmounts = distribute(
+                tokenDistribution, [user.balance for user in userBalances]
+            )
+            for user, rewardAmount in zip(userBalances, rewardAmounts):
                 addr = web3.toChecksumAddress(user.address)
-
-                token = web3.toChecksumAddress(token)
-                rewardAmount = user.balance * rewardsUnit
-                totalRewards += rewardAmount
                 ## If giving rewards to tree , distribute them to users with unlcaimed bals
                 if addr == BADGER_TREE:
                     if name == "native.cvx":
-                        console.log(
-                            "Distributing {} rewards to {} unclaimed bCvx holders".format(
-                                rewardAmount / 1e18, len(unclaimedBalances["bCvx"])
-                            )
+                        distribute_unclaimed(
+                            rewards,
+                            token,
+                            rewardAmount,
+                            unclaimedBalances["bCvx"],
+                            "bCvx",
                         )
-                        totalbCvxBal = sum(unclaimedBalances["bCvx"].values())
-                        cvxRewardsUnit = rewardAmount / totalbCvxBal
-                        for addr, bal in unclaimedBalances["bCvx"].items():
-                            rewards.increase_user_rewards(
-                                web3.toChecksumAddress(addr),
-                                token,
-                                int(cvxRewardsUnit * bal),
-                            )
                     if name == "native.cvxCrv":
-
-                        console.log(
-                            "Distributing {} rewards to {} unclaimed bCvxCrv holders".format(
-                                rewardAmount / 1e18, len(unclaimedBalances["bCvxCrv"])
-                            )
+                        distribute_unclaimed(
+                            rewards,
+                            token,
+                            rewardAmount,
+                            unclaimedBalances["bCvxCrv"],
+                            "bCvxCrv",
                         )
-
-                        totalbCvxCrvBal = sum(unclaimedBalances["bCvxCrv"].values())
-                        bCvxCrvRewardsUnit = rewardAmount / totalbCvxCrvBal
-                        for addr, bal in unclaimedBalances["bCvxCrv"].items():
-                            rewards.increase_user_rewards(
-                                web3.toChecksumAddress(addr),
-                                token,
-                                int(bCvxCrvRewardsUnit * bal),
-                            )
                 else:
-                    rewards.increase_user_rewards(addr, token, int(rewardAmount))
+                    rewards.increase_user_rewards(addr, token, rewardAmount)
 
-            console.log(
-                "Token Distribution: {}\nRewards Released: {}".format(
-                    tokenDistribution / 1e18, totalRewards / 1e18
-                )
+            totalRewards = sum(rewardAmounts)
+            log.info(
+                "Token Distribution: {}\nRewards Released: {}",
+                tokenDistribution / 1e18,
+                totalRewards / 1e18,
             )
-            console.log("Diff {}\n\n".format((abs(tokenDistribution - totalRewards))))
-
-    return rewards, apyBoosts
+            log.info("Diff {}\n\n", abs(tokenDistribution - totalRewards))
+
+
+def distribute_unclaimed(rewards, token, rewardAmount, unclaimed, symbol):
+    """
+    Pass the tree's share of a distribution on to holders with unclaimed balances
+    """
+    log.info(
+        "Distributing {} rewards to {} unclaimed {} holders",
+        rewardAmount / 1e18,
+        len(unclaimed),
+        symbol,
+    )
+    addresses = list(unclaimed.keys())
+    amounts = distribute(rewardAmount, unclaimed.values())
+    for addr, amount in zip(addresses, amounts):
+        rewards.increase_user_rewards(web3.toChecksumAddress(addr), token, amount)
 
 
 def get_distributed_for_token_at(token, endTime, schedules, name):
     totalToDistribute = 0
+    summary = log.Summary("Unlock schedules of {} for {} at {}", token, name, endTime)
     for index, schedule in enumerate(schedules):
+        summary.add("schedules")
         if endTime < schedule.startTime:
             toDistribute = 0
-            console.log("\nSchedule {} for {} completed\n".format(index, name))
+            summary.add("not started")
+            log.debug("\nSchedule {} for {} completed\n", index, name)
         else:
             rangeDuration = endTime - schedule.startTime
             toDistribute = min(
@@ -146,22 +145,21 @@ def get_distributed_for_token_at(token, endTime, schedules, name):
                 int(schedule.initialTokensLocked * rangeDuration // schedule.duration),
             )
             if schedule.startTime <= endTime and schedule.endTime >= endTime:
-                console.log(
-                    "Tokens distributed by schedule {} at {} are {}% of total\n".format(
-                        index,
-                        to_utc_date(schedule.startTime),
-                        (int(toDistribute) / int(schedule.initialTokensLocked) * 100),
-                    )
+                summary.add("active")
+                log.debug(
+                    "Tokens distributed by schedule {} at {} are {}% of total\n",
+                    index,
+                    to_utc_date(schedule.startTime),
+                    (int(toDistribute) / int(schedule.initialTokensLocked) * 100),
                 )
-
-                console.log(
-                    "Total duration of schedule elapsed is {} hours out of {} hours, or {}% of total duration.\n".format(
-                        to_hours(rangeDuration),
-                        to_hours(schedule.duration),
-                        rangeDuration / schedule.duration * 100,
-                    )
+                log.debug(
+                    "Total duration of schedule elapsed is {} hours out of {} hours, or {}% of total duration.\n",
+                    to_hours(rangeDuration),
+                    to_hours(schedule.duration),
+                    rangeDuration / schedule.duration * 100,
                 )
         totalToDistribute += toDistribute
+    summary.log()
     return totalToDistribute
 
 
@@ -0,0 +1,212 @@
+import json
+import mmap
+import struct
+
+from eth_utils import to_checksum_address
+from eth_utils.hexadecimal import encode_hex
+from assistant.rewards.classes.RewardsList import encode_node
+
+"""
+Compact binary layout for rewards trees:
+
+    preamble   magic, then offsets / sizes of the sections below
+    records    one per claim, in the tree's claim order
+    index      (20 byte address, u64 record offset) sorted by address
+    header     json: every top level key except claims, the token dictionary
+               and the original key order
+
+Records store token ids, uint256 amounts and raw proof hashes; the encoded
+node is rebuilt from them on read. A claim that would not round trip exactly
+is stored verbatim as json instead (see tree_binary.py), so conversion is
+always lossless.
+"""
+
+MAGIC = b"BDGTREE1"
+PREAMBLE = struct.Struct("<8sQQQQQ")
+INDEX_ENTRY = struct.Struct("<20sQ")
+RECORD_HEAD = struct.Struct("<BQQB")
+ADDRESS_SIZE = 20
+WORD_SIZE = 32
+CLAIM_KEYS = ["index", "user", "cycle", "tokens", "cumulativeAmounts", "proof", "node"]
+
+# record flags
+USER_CHECKSUM = 1
+VERBATIM = 2
+
+
+def address_bytes(address):
+    return bytes.fromhex(address[2:])
+
+
+def decode_claim(buf, offset, tokens):
+    """
+    Returns (user, claim, offset of the next record)
+    """
+    (flags, index, cycle, numTokens) = RECORD_HEAD.unpack_from(buf, offset)
+    offset += RECORD_HEAD.size
+    if flags & VERBATIM:
+        (size,) = struct.unpack_from("<Q", buf, offset)
+        offset += 8
+        (user, claim) = json.loads(bytes(buf[offset : offset + size]))
+        return (user, claim, offset + size)
+
+    user = "0x" + bytes(buf[offset : offset + ADDRESS_SIZE]).hex()
+    if flags & USER_CHECKSUM:
+        user = to_checksum_address(user)
+    offset += ADDRESS_SIZE
+
+    tokenIds = struct.unpack_from("<{}H".format(numTokens), buf, offset)
+    offset += 2 * numTokens
+    amounts = []
+    for _ in range(numTokens):
+        amounts.append(int.from_bytes(buf[offset : offset + WORD_SIZE], "big"))
+        offset += WORD_SIZE
+    (proofLen,) = struct.unpack_from("<B", buf, offset)
+    offset += 1
+    proof = []
+    for _ in range(proofLen):
+        proof.append("0x" + bytes(buf[offset : offset + WORD_SIZE]).hex())
+        offset += WORD_SIZE
+
+    claimTokens = [tokens[t] for t in tokenIds]
+    claim = {
+        "index": hex(index),
+        "user": user,
+        "cycle": hex(cycle),
+        "tokens": claimTokens,
+        "cumulativeAmounts": [str(a) for a in amounts],
+        "proof": proof,
+        "node": encode_hex(encode_node(index, user, cycle, claimTokens, amounts)),
+    }
+    return (user, claim, offset)
+
+
+class BinaryClaims:
+    """
+    Claims of a BinaryTree: lookups binary search the address index of the
+    memory mapped file and decode a single record
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+
+    def find(self, address):
+        """
+        Case insensitive lookup, returns (user, claim) or None
+        """
+        tree = self.tree
+        target = address_bytes(address.lower())
+        lo, hi = 0, tree.numClaims
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = tree.indexOffset + mid * INDEX_ENTRY.size
+            if tree.buf[entry : entry + ADDRESS_SIZE] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == tree.numClaims:
+            return None
+        (found, offset) = INDEX_ENTRY.unpack_from(
+            tree.buf, tree.indexOffset + lo * INDEX_ENTRY.size
+        )
+        if found != target:
+            return None
+        (user, claim, _) = decode_claim(tree.buf, offset, tree.tokens)
+        return (user, claim)
+
+    def get(self, user, default=None):
+        found = self.find(user)
+        # Keys are case sensitive, same as the json tree
+        if found is None or found[0] != user:
+            return default
+        return found[1]
+
+    def __getitem__(self, user):
+        claim = self.get(user)
+        if claim is None:
+            raise KeyError(user)
+        return claim
+
+    def __contains__(self, user):
+        return self.get(user) is not None
+
+    def items(self):
+        tree = self.tree
+        offset = tree.recordsOffset
+        for _ in range(tree.numClaims):
+            (user, claim, offset) = decode_claim(tree.buf, offset, tree.tokens)
+            yield (user, claim)
+
+    def keys(self):
+        for user, _ in self.items():
+            yield user
+
+    def values(self):
+        for _, claim in self.items():
+            yield claim
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self):
+        return self.tree.numClaims
+
+
+class BinaryTree:
+    """
+    Rewards tree backed by a memory mapped binary file (see tree_binary.py for
+    converters). tree["claims"] is a BinaryClaims.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic,
+            self.recordsOffset,
+            self.indexOffset,
+            self.numClaims,
+            headerOffset,
+            headerSize,
+        ) = PREAMBLE.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            raise ValueError("{} is not a binary rewards tree".format(path))
+
+        header = json.loads(bytes(self.buf[headerOffset : headerOffset + headerSize]))
+        self.header = header["header"]
+        self.keyOrder = header["keys"]
+        self.tokens = header["tokens"]
+        self.claims = BinaryClaims(self)
+
+    def __getitem__(self, key):
+        if key == "claims":
+            return self.claims
+        return self.header[key]
+
+    def get(self, key, default=None):
+        if key == "claims":
+            return self.claims
+        return self.header.get(key, default)
+
+    def __contains__(self, key):
+        return key in self.keyOrder
+
+    def items(self):
+        """
+        Top level (key, value) pairs in the original order, claims as an
+        iterator of (user, claim), the shape tree_stream.dump_tree takes
+        """
+        for key in self.keyOrder:
+            yield (key, self.claims.items() if key == "claims" else self.header[key])
+
+    def to_dict(self):
+        return {
+            key: dict(value) if key == "claims" else value
+            for key, value in self.items()
+        }
+
+    def close(self):
+        self.buf.close()
+        self.file.close()
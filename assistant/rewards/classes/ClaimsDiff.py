@@ -0,0 +1,150 @@
+from fractions import Fraction
+
+import numpy as np
+
+"""
+Cumulative claims of two rewards trees as aligned per-token columns.
+
+Every amount is parsed once, into a column per token address with a row per
+user (0 where a tree has no claim of that token for the user). Checks are
+then whole-column comparisons and sums, keyed by token address rather than
+by position in cumulativeAmounts.
+
+Amounts are uint256 (digg shares go well past 2 ** 128), so columns hold
+python ints in object arrays: exact, and compared element by element inside
+numpy rather than in a python loop over claims.
+"""
+
+# Offending users listed in a report, the rest are counted
+REPORT_USERS = 5
+
+
+def token_columns(claims, userIndex):
+    """
+    {token: amounts} for claims, a mapping of user to claim (or LazyClaims),
+    with rows ordered by userIndex
+    """
+    columns = {}
+    numUsers = len(userIndex)
+    for user, claim in claims.items():
+        row = userIndex[user]
+        for token, amount in zip(claim["tokens"], claim["cumulativeAmounts"]):
+            if token not in columns:
+                columns[token] = np.zeros(numUsers, dtype=object)
+            columns[token][row] = int(amount)
+    return columns
+
+
+def claim_totals(claims):
+    """
+    Total cumulative claims of each token
+    """
+    userIndex = {user: row for row, user in enumerate(claims.keys())}
+    return {
+        token: int(column.sum())
+        for token, column in token_columns(claims, userIndex).items()
+    }
+
+
+def format_users(users, amounts):
+    shown = ", ".join(
+        "{} ({})".format(user, amount)
+        for user, amount in zip(users[:REPORT_USERS], amounts[:REPORT_USERS])
+    )
+    if len(users) > REPORT_USERS:
+        shown += " and {} more".format(len(users) - REPORT_USERS)
+    return shown
+
+
+class ClaimsDiff:
+    def __init__(self, before, after):
+        self.users = sorted(set(before.keys()) | set(after.keys()))
+        userIndex = {user: row for row, user in enumerate(self.users)}
+        self.before = token_columns(before, userIndex)
+        self.after = token_columns(after, userIndex)
+        self.tokens = sorted(set(self.before) | set(self.after))
+        zeros = np.zeros(len(self.users), dtype=object)
+        for token in self.tokens:
+            self.before.setdefault(token, zeros)
+            self.after.setdefault(token, zeros)
+
+    def totals_before(self):
+        return {token: int(self.before[token].sum()) for token in self.tokens}
+
+    def totals_after(self):
+        return {token: int(self.after[token].sum()) for token in self.tokens}
+
+    def deltas(self):
+        return {
+            token: int((self.after[token] - self.before[token]).sum())
+            for token in self.tokens
+        }
+
+    def offenders(self, token, rows):
+        """
+        Users at rows, largest decrease first, with the change in their claims
+        """
+        changes = self.after[token][rows] - self.before[token][rows]
+        order = np.argsort(changes.astype(float), kind="stable")
+        users = [self.users[row] for row in rows[order]]
+        return (users, changes[order].tolist())
+
+    def decreased(self, token):
+        """
+        Rows of the users whose cumulative claims of token went down
+        """
+        return np.flatnonzero(self.after[token] < self.before[token])
+
+    def growth_outside(self, token, low, high):
+        """
+        Rows of the users with an existing claim of token that grew by a
+        ratio outside (low, high)
+        """
+        low = Fraction(str(low))
+        high = Fraction(str(high))
+        before = self.before[token]
+        after = self.after[token]
+        outside = (after * low.denominator <= before * low.numerator) | (
+            after * high.denominator >= before * high.numerator
+        )
+        return np.flatnonzero((before > 0) & outside)
+
+    def check(self, maxTotals=None, maxDeltas=None):
+        """
+        Problems found, as messages: decreased user claims or token totals,
+        totals above maxTotals and increases above maxDeltas, keyed by token
+        """
+        maxTotals = maxTotals or {}
+        maxDeltas = maxDeltas or {}
+        problems = []
+        totals = self.totals_after()
+        deltas = self.deltas()
+        for token in self.tokens:
+            rows = self.decreased(token)
+            if len(rows) > 0:
+                problems.append(
+                    "{} users' claims of {} decreased: {}".format(
+                        len(rows), token, format_users(*self.offenders(token, rows))
+                    )
+                )
+            if deltas[token] < 0:
+                problems.append(
+                    "Total {} claims decreased by {}".format(token, -deltas[token])
+                )
+            if token in maxTotals and totals[token] > maxTotals[token]:
+                problems.append(
+                    "Total {} claims {} above {}".format(
+                        token, totals[token], maxTotals[token]
+                    )
+                )
+            if token in maxDeltas and deltas[token] > maxDeltas[token]:
+                problems.append(
+                    "{} claims grew by {}, above {}".format(
+                        token, deltas[token], maxDeltas[token]
+                    )
+                )
+        return problems
+
+    def assert_valid(self, maxTotals=None, maxDeltas=None):
+        problems = self.check(maxTotals, maxDeltas)
+        assert len(problems) == 0, "\n".join(problems)
@@ -0,0 +1,132 @@
+from brownie import *
+from eth_utils import to_checksum_address
+from assistant.rewards import log
+from config.rewards_config import rewards_config
+from helpers.constants import DIGG
+from helpers.multicall import Call, Multicall
+
+"""
+Chain reads shared by the stages of a rewards cycle.
+
+Block timestamps, unlock schedules, token decimals and digg's share ratios
+are read once per cycle. prefetch() fetches the contract reads for every
+sett with Multicall at the start of the cycle, anything missing is read on
+first use.
+"""
+
+UNLOCK_SCHEDULES = (
+    "getAllUnlockSchedulesFor(address)"
+    "((address,address,uint256,uint256,uint256,uint256)[])"
+)
+
+
+def checksum_schedules(schedules):
+    # eth_abi returns lowercase addresses, contract calls checksummed ones
+    return [
+        (to_checksum_address(s[0]), to_checksum_address(s[1]), *s[2:])
+        for s in schedules
+    ]
+
+
+class CycleReads:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._timestamps = {}
+        self._values = {}
+
+    def block_timestamp(self, block):
+        block = int(block)
+        if block not in self._timestamps:
+            self._timestamps[block] = web3.eth.getBlock(block)["timestamp"]
+        return self._timestamps[block]
+
+    def read(self, key, fetch):
+        if key not in self._values:
+            self._values[key] = fetch()
+        return self._values[key]
+
+    def unlock_schedules(self, badger, sett):
+        return self.read(
+            ("schedules", sett.address),
+            lambda: badger.rewardsLogger.getAllUnlockSchedulesFor(sett),
+        )
+
+    def decimals(self, token):
+        return self.read(
+            ("decimals", token), lambda: interface.IERC20(token).decimals()
+        )
+
+    def shares_per_fragment(self):
+        return self.read(
+            ("sharesPerFragment", DIGG),
+            lambda: interface.IDigg(DIGG)._sharesPerFragment(),
+        )
+
+    def initial_shares_per_fragment(self):
+        return self.read(
+            ("initialSharesPerFragment", DIGG),
+            lambda: interface.IDigg(DIGG)._initialSharesPerFragment(),
+        )
+
+    def shares_to_fragments(self, shares):
+        """
+        Same as digg's sharesToFragments, at the cycle's share ratio
+        """
+        if shares == 0:
+            return 0
+        return shares // self.shares_per_fragment()
+
+    def prefetch(self, badger, blocks):
+        """
+        Start a new cycle, reading every sett's unlock schedules and decimals
+        and digg's share ratios in Multicall batches
+        """
+        self.reset()
+        for block in blocks:
+            self.block_timestamp(block)
+
+        calls = [
+            Call(
+                DIGG,
+                "_sharesPerFragment()(uint256)",
+                [[("sharesPerFragment", DIGG), None]],
+            ),
+            Call(
+                DIGG,
+                "_initialSharesPerFragment()(uint256)",
+                [[("initialSharesPerFragment", DIGG), None]],
+            ),
+        ]
+        for sett in badger.sett_system.vaults.values():
+            calls.append(
+                Call(
+                    badger.rewardsLogger.address,
+                    [UNLOCK_SCHEDULES, sett.address],
+                    [[("schedules", sett.address), checksum_schedules]],
+                )
+            )
+            calls.append(
+                Call(
+                    sett.address,
+                    "decimals()(uint8)",
+                    [[("decimals", sett.address), None]],
+                )
+            )
+
+        batchSize = rewards_config.multicallBatchSize
+        for i in range(0, len(calls), batchSize):
+            try:
+                self._values.update(Multicall(calls[i : i + batchSize])())
+            except (KeyError, ValueError) as e:
+                # Reads left out are made one by one when first used
+                log.warning("Multicall prefetch failed: {}", e)
+        log.info(
+            "Prefetched {} chain reads for {} setts",
+            len(self._values),
+            len(badger.sett_system.vaults),
+        )
+
+
+cycleReads = CycleReads()
@@ -0,0 +1,204 @@
+import cProfile
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+import psutil
+from rich.console import Console
+from tabulate import tabulate
+from config.rewards_config import rewards_config
+from assistant.rewards import log
+from assistant.rewards.aws_utils import upload_trace
+from assistant.subgraph.cache import add_request_counter
+
+console = Console()
+
+"""
+Stage level instrumentation of a rewards cycle.
+
+Each stage records its wall and cpu time, how many subgraph requests and
+JSON-RPC calls it made, the process' resident memory when it started and
+ended and how far it raised the process' peak memory. Stages
+nest: a stage opened inside another gets its path, e.g.
+"sett_rewards/native.renCrv".
+"""
+
+PROFILERS = ["cprofile", "pyinstrument"]
+
+
+def rss_mb():
+    return psutil.Process().memory_info().rss / 1024**2
+
+
+def max_rss_mb():
+    """
+    Peak resident memory of the process so far
+    """
+    maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    if sys.platform == "darwin":
+        return maxRss / 1024**2
+    return maxRss / 1024
+
+
+def start_profiler(kind):
+    assert kind in PROFILERS, "Unknown profiler {}".format(kind)
+    if kind == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    # Not in requirements.txt, only needed when asked for
+    from pyinstrument import Profiler
+
+    profiler = Profiler()
+    profiler.start()
+    return profiler
+
+
+def dump_profile(profiler, kind, cycle):
+    if kind == "cprofile":
+        profiler.disable()
+        fileName = "cycle-profile-{}.prof".format(cycle)
+        profiler.dump_stats(fileName)
+    else:
+        profiler.stop()
+        fileName = "cycle-profile-{}.html".format(cycle)
+        with open(fileName, "w") as f:
+            f.write(profiler.output_html())
+    console.log("Profile of cycle {} written to {}".format(cycle, fileName))
+    return fileName
+
+
+class CycleTrace:
+    def __init__(self):
+        self.reset(None)
+
+    def reset(self, cycle):
+        self._cycle = cycle
+        self._startTime = time.time()
+        self._start = time.perf_counter()
+        self._stages = []
+        self._path = []
+        self._counts = {}
+        self._profiler = None
+
+    def start(self, cycle):
+        self.reset(cycle)
+        if rewards_config.cycleProfiler:
+            self._profiler = start_profiler(rewards_config.cycleProfiler)
+
+    def count(self, counter, amount=1):
+        self._counts[counter] = self._counts.get(counter, 0) + amount
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time the enclosed block as a stage, yielding its record so the caller
+        can add details to it
+        """
+        self._path.append(str(name))
+        record = {"stage": "/".join(self._path), "depth": len(self._path) - 1}
+        self._stages.append(record)
+        countsBefore = dict(self._counts)
+        record["rssStartMb"] = rss_mb()
+        maxRssBefore = max_rss_mb()
+        start = time.perf_counter()
+        cpuStart = time.process_time()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            record["cpuSeconds"] = time.process_time() - cpuStart
+            record["counts"] = {
+                counter: total - countsBefore.get(counter, 0)
+                for counter, total in self._counts.items()
+                if total != countsBefore.get(counter, 0)
+            }
+            record["rssEndMb"] = rss_mb()
+            record["maxRssGrowthMb"] = max_rss_mb() - maxRssBefore
+            self._path.pop()
+
+    def data(self):
+        return {
+            "cycle": self._cycle,
+            "startedAt": int(self._startTime),
+            "seconds": time.perf_counter() - self._start,
+            "maxRssMb": max_rss_mb(),
+            "counts": self._counts,
+            "stages": self._stages,
+        }
+
+    def print_summary(self):
+        console.print(
+            tabulate(
+                [
+                    [
+                        "  " * s["depth"] + s["stage"].split("/")[-1],
+                        "{:.2f}".format(s.get("seconds", 0)),
+                        s.get("counts", {}).get("subgraphRequests", 0),
+                        s.get("counts", {}).get("rpcCalls", 0),
+                        "{:.0f}".format(s.get("rssStartMb", 0)),
+                        "{:.0f}".format(s.get("rssEndMb", 0)),
+                        "{:.0f}".format(s.get("maxRssGrowthMb", 0)),
+                    ]
+                    for s in self._stages
+                    if s["depth"] <= 1
+                ],
+                headers=[
+                    "stage",
+                    "seconds",
+                    "subgraph",
+                    "rpc",
+                    "rss start (MB)",
+                    "rss end (MB)",
+                    "peak rss growth (MB)",
+                ],
+            )
+        )
+
+    def save(self):
+        """
+        Upload the trace next to the cycle's analytics log, dumping the
+        profile first if one was running
+        """
+        data = self.data()
+        if self._profiler is not None:
+            data["profile"] = dump_profile(
+                self._profiler, rewards_config.cycleProfiler, self._cycle
+            )
+            self._profiler = None
+        self.print_summary()
+        if rewards_config.cycleTrace:
+            try:
+                upload_trace(self._cycle, data)
+            except Exception as e:
+                # Saved after failed cycles too, don't hide their error
+                log.warning("Trace of cycle {} not uploaded: {}", self._cycle, e)
+        return data
+
+
+def rpc_counter(make_request, w3):
+    def middleware(method, params):
+        cycleTrace.count("rpcCalls")
+        return make_request(method, params)
+
+    return middleware
+
+
+def install_rpc_counter(w3):
+    """
+    Count w3's JSON-RPC requests into the trace
+    """
+    if "cycleTrace" not in w3.middleware_onion:
+        w3.middleware_onion.inject(rpc_counter, name="cycleTrace", layer=0)
+
+
+def install_subgraph_counter():
+    """
+    Count subgraph requests and cache hits into the trace
+    """
+    add_request_counter(cycleTrace.count)
+
+
+cycleTrace = CycleTrace()
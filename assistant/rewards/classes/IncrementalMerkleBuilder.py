@@ -0,0 +1,281 @@
+import os
+import random
+import struct
+
+from eth_utils import keccak
+from eth_utils.hexadecimal import encode_hex
+from rich.console import Console
+from assistant.rewards import log
+from assistant.rewards.classes.MerkleTree import MerkleTree
+from assistant.rewards.classes.RewardsList import (
+    RewardsList,
+    encode_node,
+    encode_nodes,
+    node_entry,
+)
+
+console = Console()
+
+"""
+abi.encode(uint index, address user, uint cycle, address[] tokens, uint[] amounts)
+puts index and cycle in fixed 32 byte head words, so a cached encoding can be
+moved to a new index / cycle by overwriting those words instead of re-encoding
+"""
+INDEX_WORD = slice(0, 32)
+CYCLE_WORD = slice(64, 96)
+
+
+"""
+Cache file layout, all integers little endian:
+
+    preamble   magic, format version, cycle, node and layer counts
+    nodes      user, tokens, uint256 amounts, encoded node, leaf hash
+    layers     hash count, then the 32 byte hashes of each layer
+
+A file with another magic or version, or one that fails the sampled checks in
+check_cache(), is ignored and the tree is built from scratch.
+"""
+MAGIC = b"BDGMRKLC"
+CACHE_VERSION = 1
+PREAMBLE = struct.Struct("<8sHQII")
+NODE_HEAD = struct.Struct("<BBI")
+COUNT = struct.Struct("<I")
+WORD_SIZE = 32
+# Cached nodes re-encoded and traced up to the root on load
+CACHE_SAMPLE = 64
+
+
+def splice_node(encoded, index, cycle):
+    return (
+        index.to_bytes(32, "big")
+        + encoded[INDEX_WORD.stop : CYCLE_WORD.start]
+        + cycle.to_bytes(32, "big")
+        + encoded[CYCLE_WORD.stop :]
+    )
+
+
+class IncrementalMerkleBuilder:
+    """
+    Builds the rewards tree reusing work from the previous run:
+    - users whose tokens and cumulative amounts are unchanged keep their
+      encoded node, with the index and cycle words patched in place
+    - leaves whose bytes are unchanged keep their hash
+    - subtrees whose leaves are unchanged keep their layer hashes
+
+    The cycle is part of every leaf, so between two cycles every leaf still
+    has to be re-hashed and the layers rebuilt; layer reuse only kicks in when
+    the same cycle is built again (guardian runs, retries).
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.cycle = None
+        # user -> (tokens, amounts, encoded bytes, leaf hash)
+        self.nodes = {}
+        self.layers = None
+        self.stats = {}
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    (self.cycle, self.nodes, self.layers) = read_cache(f)
+                check_cache(self.cycle, self.nodes, self.layers)
+            except (ValueError, struct.error) as e:
+                log.warning("Merkle cache {} not used: {}", path, e)
+                self.cycle = None
+                self.nodes = {}
+                self.layers = None
+
+    def to_merkle_leaves(self, rewards: RewardsList, serial=False):
+        """
+        Drop-in for RewardsList.to_merkle_leaves
+        """
+        cycle = int(rewards.cycle)
+        nodeEntries = []
+        encoded = []
+        leaves = []
+        changed = []
+        newNodes = {}
+        stats = {
+            "users": 0,
+            "reencoded": 0,
+            "spliced": 0,
+            "unchanged": 0,
+            "leavesHashed": 0,
+        }
+
+        for index, (user, userData) in enumerate(rewards.claims.items()):
+            tokens = tuple(userData.keys())
+            amounts = tuple(int(a) for a in userData.values())
+            nodeEntries.append(node_entry(user, tokens, amounts, rewards.cycle, index))
+            stats["users"] += 1
+
+            cached = self.nodes.get(user)
+            if cached and cached[0] == tokens and cached[1] == amounts:
+                node = splice_node(cached[2], index, cycle)
+                if node == cached[2]:
+                    leaf = cached[3]
+                    stats["unchanged"] += 1
+                else:
+                    leaf = keccak(node)
+                    stats["spliced"] += 1
+                    stats["leavesHashed"] += 1
+                encoded.append(encode_hex(node))
+                leaves.append(leaf)
+                newNodes[user] = (tokens, amounts, node, leaf)
+            else:
+                changed.append((index, user, cycle, list(tokens), list(amounts)))
+                encoded.append(None)
+                leaves.append(None)
+
+        for (index, user, _, tokens, amounts), (node, leaf) in zip(
+            changed, encode_nodes(changed, serial)
+        ):
+            encoded[index] = node
+            leaves[index] = leaf
+            newNodes[user] = (
+                tuple(tokens),
+                tuple(amounts),
+                bytes.fromhex(node[2:]),
+                leaf,
+            )
+        stats["reencoded"] = len(changed)
+        stats["leavesHashed"] += len(changed)
+
+        entries = [
+            {"node": nodeEntry, "encoded": node}
+            for nodeEntry, node in zip(nodeEntries, encoded)
+        ]
+
+        self.cycle = cycle
+        self.nodes = newNodes
+        self.stats = stats
+        return (nodeEntries, encoded, entries, leaves)
+
+    def build_tree(self, encodedNodes, leaves):
+        tree = MerkleTree(encodedNodes, leaves, self.layers)
+        self.layers = tree.layers
+        self.stats["layerHashesReused"] = tree.reusedHashes
+        self.stats["layerHashesComputed"] = (
+            sum(len(layer) for layer in tree.layers[1:]) - tree.reusedHashes
+        )
+        console.log("Incremental merkle build", self.stats)
+        return tree
+
+    def save(self, path=None):
+        path = path or self.path
+        with open(path, "wb") as f:
+            write_cache(f, self.cycle, self.nodes, self.layers)
+
+
+def write_string(out, value):
+    raw = value.encode()
+    out.write(struct.pack("<B", len(raw)) + raw)
+
+
+def read_string(f):
+    (size,) = struct.unpack("<B", f.read(1))
+    return f.read(size).decode()
+
+
+def read_exactly(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("truncated")
+    return data
+
+
+def write_cache(out, cycle, nodes, layers):
+    layers = layers or []
+    out.write(PREAMBLE.pack(MAGIC, CACHE_VERSION, cycle, len(nodes), len(layers)))
+    for user, (tokens, amounts, encoded, leaf) in nodes.items():
+        out.write(NODE_HEAD.pack(len(user), len(tokens), len(encoded)))
+        out.write(user.encode())
+        for token in tokens:
+            write_string(out, token)
+        out.write(b"".join(a.to_bytes(WORD_SIZE, "big") for a in amounts))
+        out.write(encoded)
+        out.write(leaf)
+    for layer in layers:
+        out.write(COUNT.pack(len(layer)))
+        out.write(b"".join(layer))
+
+
+def read_cache(f):
+    """
+    (cycle, nodes, layers) from a cache file written by write_cache
+    """
+    (magic, version, cycle, numNodes, numLayers) = PREAMBLE.unpack(
+        read_exactly(f, PREAMBLE.size)
+    )
+    if magic != MAGIC:
+        raise ValueError("not a merkle cache")
+    if version != CACHE_VERSION:
+        raise ValueError(
+            "format version {}, expected {}".format(version, CACHE_VERSION)
+        )
+
+    nodes = {}
+    for _ in range(numNodes):
+        (userSize, numTokens, encodedSize) = NODE_HEAD.unpack(
+            read_exactly(f, NODE_HEAD.size)
+        )
+        user = read_exactly(f, userSize).decode()
+        tokens = tuple(read_string(f) for _ in range(numTokens))
+        amounts = tuple(
+            int.from_bytes(read_exactly(f, WORD_SIZE), "big") for _ in range(numTokens)
+        )
+        encoded = read_exactly(f, encodedSize)
+        leaf = read_exactly(f, WORD_SIZE)
+        nodes[user] = (tokens, amounts, encoded, leaf)
+
+    layers = []
+    for _ in range(numLayers):
+        (size,) = COUNT.unpack(read_exactly(f, COUNT.size))
+        raw = read_exactly(f, size * WORD_SIZE)
+        layers.append([raw[i : i + WORD_SIZE] for i in range(0, len(raw), WORD_SIZE)])
+    if f.read(1):
+        raise ValueError("trailing data")
+    return (cycle, nodes, layers or None)
+
+
+def check_cache(cycle, nodes, layers):
+    """
+    Re-encode a sample of cached nodes and check each one's path up to the
+    root, raising ValueError on the first mismatch
+    """
+    if layers:
+        for depth in range(1, len(layers)):
+            if len(layers[depth]) != (len(layers[depth - 1]) + 1) // 2:
+                raise ValueError("layer {} has the wrong size".format(depth))
+        if len(layers[-1]) != 1:
+            raise ValueError("layers don't end in a root")
+        positions = {leaf: idx for idx, leaf in enumerate(layers[0])}
+
+    users = list(nodes.keys())
+    sample = random.Random(cycle).sample(users, min(CACHE_SAMPLE, len(users)))
+    for user in sample:
+        (tokens, amounts, encoded, leaf) = nodes[user]
+        index = int.from_bytes(encoded[INDEX_WORD], "big")
+        try:
+            node = encode_node(index, user, cycle, list(tokens), list(amounts))
+        except Exception as e:
+            raise ValueError("node of {} can't be encoded: {}".format(user, e))
+        if node != encoded:
+            raise ValueError("node of {} doesn't match its claims".format(user))
+        if keccak(encoded) != leaf:
+            raise ValueError("leaf of {} doesn't match its node".format(user))
+        if not layers:
+            continue
+        if leaf not in positions:
+            raise ValueError("leaf of {} is not in the tree".format(user))
+        idx = positions[leaf]
+        for depth in range(len(layers) - 1):
+            layer = layers[depth]
+            pair = idx ^ 1
+            parent = MerkleTree.combined_hash(
+                layer[idx], layer[pair] if pair < len(layer) else None
+            )
+            if parent != layers[depth + 1][idx // 2]:
+                raise ValueError("layer {} hash doesn't match".format(depth + 1))
+            idx //= 2
@@ -0,0 +1,110 @@
+from assistant.rewards.tree_stream import walk_tree, iter_claims, read_value_at
+
+
+class LazyClaims:
+    """
+    Read-only view of a tree's claims map backed by the file on disk.
+    Iteration streams claims from the file, lookups seek to the claim in a
+    file kept open until close().
+    """
+
+    def __init__(self, path, offsets):
+        self.path = path
+        self.offsets = offsets
+        self._fp = None
+
+    def items(self):
+        with open(self.path, "rb") as fp:
+            yield from iter_claims(fp)
+
+    def keys(self):
+        return self.offsets.keys()
+
+    def values(self):
+        for _, claim in self.items():
+            yield claim
+
+    def get(self, user, default=None):
+        if user not in self.offsets:
+            return default
+        if self._fp is None:
+            self._fp = open(self.path, "rb")
+        return read_value_at(self._fp, self.offsets[user])
+
+    def __getitem__(self, user):
+        if user not in self.offsets:
+            raise KeyError(user)
+        return self.get(user)
+
+    def __contains__(self, user):
+        return user in self.offsets
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+
+class LazyTree:
+    """
+    Rewards tree loaded from a json file without materializing the claims.
+    Everything but the claims is kept in memory; tree["claims"] is a LazyClaims.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.header = {}
+        # Top level keys in file order, "claims" included
+        self.keyOrder = []
+        offsets = {}
+        with open(path, "rb") as fp:
+            for key, value, offset in walk_tree(fp):
+                if key == "claims":
+                    offsets[value[0]] = offset
+                else:
+                    self.header[key] = value
+                if key not in self.keyOrder:
+                    self.keyOrder.append(key)
+        if "claims" not in self.keyOrder:
+            # walk_tree yields nothing for an empty claims map, rewards trees
+            # keep it just before metadata
+            at = len(self.keyOrder)
+            if "metadata" in self.keyOrder:
+                at = self.keyOrder.index("metadata")
+            self.keyOrder.insert(at, "claims")
+        self.claims = LazyClaims(path, offsets)
+
+    def __getitem__(self, key):
+        if key == "claims":
+            return self.claims
+        return self.header[key]
+
+    def get(self, key, default=None):
+        if key == "claims":
+            return self.claims
+        return self.header.get(key, default)
+
+    def __contains__(self, key):
+        return key == "claims" or key in self.header
+
+    def items(self):
+        for key in self.keyOrder:
+            yield (key, self.get(key))
+
+    def close(self):
+        self.claims.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def to_dict(self):
+        return {**self.header, "claims": dict(self.claims.items())}
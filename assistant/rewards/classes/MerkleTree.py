@@ -15,9 +15,19 @@ Convert merkle_tree
 
 
 class MerkleTree:
-    def __init__(self, elements):
-        self.elements = sorted(set(web3.keccak(hexstr=el) for el in elements))
-        self.layers = MerkleTree.get_layers(self.elements)
+    def __init__(self, elements, leaves=None, previousLayers=None):
+        # Leaf hashes in input order, so proofs can be emitted without re-hashing
+        if leaves is None:
+            leaves = [web3.keccak(hexstr=el) for el in elements]
+        self.leaves = leaves
+        self.elements = sorted(set(self.leaves))
+        # hash -> position in the sorted leaf layer
+        self.positions = {el: idx for idx, el in enumerate(self.elements)}
+        self.reusedHashes = 0
+        if previousLayers:
+            self.layers = self.get_layers_reusing(self.elements, previousLayers)
+        else:
+            self.layers = MerkleTree.get_layers(self.elements)
 
         # console.log(self.elements, self.layers)
 
@@ -27,7 +37,9 @@ class MerkleTree:
 
     def get_proof(self, el):
         el = web3.keccak(hexstr=el)
-        idx = self.elements.index(el)
+        return self.get_proof_at(self.positions[el])
+
+    def get_proof_at(self, idx):
         proof = []
         for layer in self.layers:
             pair_idx = idx + 1 if idx % 2 == 0 else idx - 1
@@ -36,6 +48,23 @@ class MerkleTree:
             idx //= 2
         return proof
 
+    def get_all_proofs(self):
+        """
+        Proofs for every leaf, in the order the elements were given.
+        Walks each layer once instead of once per leaf.
+        """
+        idxs = [self.positions[leaf] for leaf in self.leaves]
+        proofs = [[] for _ in idxs]
+        for layer in self.layers:
+            size = len(layer)
+            hexLayer = [encode_hex(node) for node in layer]
+            for proof, idx in zip(proofs, idxs):
+                pair_idx = idx ^ 1
+                if pair_idx < size:
+                    proof.append(hexLayer[pair_idx])
+            idxs = [idx // 2 for idx in idxs]
+        return proofs
+
     @staticmethod
     def get_layers(elements):
         layers = [elements]
@@ -43,6 +72,49 @@ class MerkleTree:
             layers.append(MerkleTree.get_next_layer(layers[-1]))
         return layers
 
+    def get_layers_reusing(self, elements, previousLayers):
+        """
+        Build layers, copying any node from previousLayers whose children are
+        unchanged instead of hashing it again
+        """
+        layers = [elements]
+        previous = previousLayers[0]
+        clean = [
+            idx < len(previous) and el == previous[idx]
+            for idx, el in enumerate(elements)
+        ]
+        depth = 0
+        while len(layers[-1]) > 1:
+            layer = layers[-1]
+            previous = previousLayers[depth] if depth < len(previousLayers) else []
+            previousNext = (
+                previousLayers[depth + 1] if depth + 1 < len(previousLayers) else []
+            )
+            nextLayer = []
+            nextClean = []
+            for a in range(0, len(layer), 2):
+                b = a + 1
+                if b < len(layer):
+                    sameShape = b < len(previous) and clean[b]
+                else:
+                    sameShape = b >= len(previous)
+                if clean[a] and sameShape and a // 2 < len(previousNext):
+                    nextLayer.append(previousNext[a // 2])
+                    nextClean.append(True)
+                    self.reusedHashes += 1
+                else:
+                    node = MerkleTree.combined_hash(
+                        layer[a], layer[b] if b < len(layer) else None
+                    )
+                    nextLayer.append(node)
+                    nextClean.append(
+                        a // 2 < len(previousNext) and node == previousNext[a // 2]
+                    )
+            layers.append(nextLayer)
+            clean = nextClean
+            depth += 1
+        return layers
+
     @staticmethod
     def get_next_layer(elements):
         return [
@@ -59,8 +131,44 @@ class MerkleTree:
         return web3.keccak(b"".join(sorted([a, b])))
 
 
-def rewards_to_merkle_tree(rewards: RewardsList, startBlock, endBlock, geyserRewards):
-    (nodes, encodedNodes, entries) = rewards.to_merkle_format()
+def claims_from_entries(entries, proofs):
+    for entry in entries:
+        node = entry["node"]
+        yield (
+            node["user"],
+            {
+                "index": hex(node["index"]),
+                "user": node["user"],
+                "cycle": hex(node["cycle"]),
+                "tokens": node["tokens"],
+                "cumulativeAmounts": node["cumulativeAmounts"],
+                "proof": proofs[node["index"]],
+                "node": entry["encoded"],
+            },
+        )
+
+
+def rewards_to_merkle_tree(
+    rewards: RewardsList,
+    startBlock,
+    endBlock,
+    geyserRewards,
+    serial=False,
+    builder=None,
+    stream=False,
+):
+    """
+    Pass an IncrementalMerkleBuilder as builder to reuse the previous run's
+    encoded leaves and layer hashes.
+    With stream set, "claims" is a one-shot iterator of (user, claim) pairs
+    for tree_stream.dump_tree instead of a dict.
+    """
+    if builder:
+        (nodes, encodedNodes, entries, leaves) = builder.to_merkle_leaves(
+            rewards, serial
+        )
+    else:
+        (nodes, encodedNodes, entries, leaves) = rewards.to_merkle_leaves(serial)
 
     # For each user, encode their data into a node
 
@@ -74,7 +182,11 @@ def rewards_to_merkle_tree(rewards: RewardsList, startBlock, endBlock, geyserRew
             for index, user, amount in elements
         },
     """
-    tree = MerkleTree(encodedNodes)
+    if builder:
+        tree = builder.build_tree(encodedNodes, leaves)
+    else:
+        tree = MerkleTree(encodedNodes, leaves)
+    proofs = tree.get_all_proofs()
     distribution = {
         "merkleRoot": encode_hex(tree.root),
         "cycle": nodes[0]["cycle"],
@@ -85,19 +197,12 @@ def rewards_to_merkle_tree(rewards: RewardsList, startBlock, endBlock, geyserRew
         "metadata": {},
     }
 
-    for entry in entries:
-        node = entry["node"]
-        encoded = entry["encoded"]
-        # console.log(node)
-        distribution["claims"][node["user"]] = {
-            "index": hex(node["index"]),
-            "user": node["user"],
-            "cycle": hex(node["cycle"]),
-            "tokens": node["tokens"],
-            "cumulativeAmounts": node["cumulativeAmounts"],
-            "proof": tree.get_proof(encodedNodes[node["index"]]),
-            "node": encoded,
-        }
+    claims = claims_from_entries(entries, proofs)
+    if stream:
+        # Consumed by tree_stream.dump_tree as it writes
+        distribution["claims"] = claims
+    else:
+        distribution["claims"] = dict(claims)
     if len(geyserRewards) > 0:
         for user, data in geyserRewards.metadata.items():
             distribution["metadata"][user] = data.toDict()
@@ -1,20 +1,204 @@
 from decimal import Decimal
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
 from brownie import *
 from dotmap import DotMap
 from rich.console import Console
+from eth_utils import keccak
 from eth_utils.hexadecimal import encode_hex
+from config.rewards_config import rewards_config
 from helpers.constants import BADGER
 from eth_abi import encode_abi
 from tabulate import tabulate
 
 console = Console()
 
+NODE_TYPES = ["uint", "address", "uint", "address[]", "uint[]"]
+
+
+def encode_node(index, user, cycle, tokens, intAmounts):
+    """
+    abi.encode() a claim, returning the raw bytes used as a leaf in the tree
+    """
+    return encode_abi(NODE_TYPES, (index, user, cycle, tokens, intAmounts))
+
+
+def node_entry(user, tokens, amounts, cycle, index):
+    """
+    A claim as listed in the tree's nodes, amounts as decimal strings
+    """
+    return {
+        "user": user,
+        "tokens": list(tokens),
+        "cumulativeAmounts": [str(int(a)) for a in amounts],
+        "cycle": cycle,
+        "index": index,
+    }
+
+
+def encode_node_batch(batch):
+    """
+    Encode and hash a batch of (index, user, cycle, tokens, intAmounts) claims.
+    Module level so it can be sent to worker processes.
+    """
+    results = []
+    for index, user, cycle, tokens, intAmounts in batch:
+        encoded = encode_node(index, user, cycle, tokens, intAmounts)
+        results.append((encode_hex(encoded), keccak(encoded)))
+    return results
+
+
+def encode_nodes(claims, serial=False):
+    """
+    Encode and hash all claims, splitting them across a process pool unless
+    serial is set or there are too few claims to be worth it.
+    Results are returned in the same order as claims.
+    """
+    workers = rewards_config.merkleEncodingWorkers
+    batchSize = rewards_config.merkleEncodingBatchSize
+    if serial or workers == 1 or len(claims) <= batchSize:
+        return encode_node_batch(claims)
+
+    batches = [claims[i : i + batchSize] for i in range(0, len(claims), batchSize)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() yields in submission order, so leaf order is deterministic
+        for batchResults in executor.map(encode_node_batch, batches):
+            results.extend(batchResults)
+    return results
+
+
+class UserClaims(Mapping):
+    """
+    Read-only view of one user's rewards, token -> cumulative amount.
+    Tokens are yielded in the order the user first received them.
+    """
+
+    __slots__ = ("rewards", "userId")
+
+    def __init__(self, rewards, userId):
+        self.rewards = rewards
+        self.userId = userId
+
+    def __getitem__(self, token):
+        tokenId = self.rewards.tokenIds.get(token)
+        if tokenId is None or tokenId not in self.rewards.userTokens[self.userId]:
+            raise KeyError(token)
+        return self.rewards.columns[tokenId][self.userId]
+
+    def __contains__(self, token):
+        tokenId = self.rewards.tokenIds.get(token)
+        return tokenId is not None and tokenId in self.rewards.userTokens[self.userId]
+
+    def __iter__(self):
+        tokenList = self.rewards.tokenList
+        return (tokenList[tokenId] for tokenId in self.rewards.userTokens[self.userId])
+
+    def __len__(self):
+        return len(self.rewards.userTokens[self.userId])
+
+    def items(self):
+        tokenList = self.rewards.tokenList
+        columns = self.rewards.columns
+        userId = self.userId
+        return [
+            (tokenList[tokenId], columns[tokenId][userId])
+            for tokenId in self.rewards.userTokens[userId]
+        ]
+
+    def values(self):
+        columns = self.rewards.columns
+        userId = self.userId
+        return [columns[tokenId][userId] for tokenId in self.rewards.userTokens[userId]]
+
+    def toDict(self):
+        return dict(self.items())
+
+
+class ClaimsView(Mapping):
+    """
+    Read-only view of all claims, user -> UserClaims, in insertion order.
+    Stands in for the nested DotMap RewardsList.claims used to be.
+    """
+
+    __slots__ = ("rewards",)
+
+    def __init__(self, rewards):
+        self.rewards = rewards
+
+    def __getitem__(self, user):
+        return UserClaims(self.rewards, self.rewards.userIds[user])
+
+    def __contains__(self, user):
+        return user in self.rewards.userIds
+
+    def __iter__(self):
+        return iter(self.rewards.users)
+
+    def __len__(self):
+        return len(self.rewards.users)
+
+    def items(self):
+        rewards = self.rewards
+        return (
+            (user, UserClaims(rewards, userId))
+            for userId, user in enumerate(rewards.users)
+        )
+
+    def values(self):
+        rewards = self.rewards
+        return (UserClaims(rewards, userId) for userId in range(len(rewards.users)))
+
+    def toDict(self):
+        return {user: userClaims.toDict() for user, userClaims in self.items()}
+
+
+class TotalsView(Mapping):
+    """
+    Read-only view of the total rewarded per token, token -> amount.
+    """
+
+    __slots__ = ("rewards",)
+
+    def __init__(self, rewards):
+        self.rewards = rewards
+
+    def __getitem__(self, token):
+        return self.rewards.tokenTotals[self.rewards.tokenIds[token]]
+
+    def __contains__(self, token):
+        return token in self.rewards.tokenIds
+
+    def __iter__(self):
+        return iter(self.rewards.tokenList)
+
+    def __len__(self):
+        return len(self.rewards.tokenList)
+
+    def toDict(self):
+        return dict(zip(self.rewards.tokenList, self.rewards.tokenTotals))
+
 
 class RewardsList:
+    """
+    Accumulates rewards per (user, token).
+    Users and tokens are interned to integer ids; amounts live in one dense
+    column per token indexed by user id, and each user keeps the ids of the
+    tokens they hold in the order they first received them, so claims come
+    out in the same order the old nested DotMap produced.
+    """
+
     def __init__(self, cycle, badgerTree) -> None:
-        self.claims = DotMap()
+        self.userIds = {}
+        self.users = []
+        self.userTokens = []
+        self.tokenIds = {}
+        self.tokenList = []
+        self.columns = []
+        self.tokenTotals = []
+        self.claims = ClaimsView(self)
+        self.totals = TotalsView(self)
         self.tokens = DotMap()
-        self.totals = DotMap()
         self.cycle = cycle
         self.badgerTree = badgerTree
         self.metadata = DotMap()
@@ -27,13 +211,32 @@ class RewardsList:
         self.sources[source][user][token] += toAdd
 
     def __repr__(self):
-        return self.claims()
+        return repr(self.claims.toDict())
 
     def track_user_metadata_source(self, source, user, metadata):
         if not self.sourceMetadata[source][user][metadata]:
             self.sourceMetadata[source][user][metadata] = DotMap()
         self.sourceMetadata[source][user][metadata] = metadata
 
+    def user_id(self, user):
+        userId = self.userIds.get(user)
+        if userId is None:
+            userId = len(self.users)
+            self.userIds[user] = userId
+            self.users.append(user)
+            self.userTokens.append([])
+        return userId
+
+    def token_id(self, token):
+        tokenId = self.tokenIds.get(token)
+        if tokenId is None:
+            tokenId = len(self.tokenList)
+            self.tokenIds[token] = tokenId
+            self.tokenList.append(token)
+            self.columns.append([])
+            self.tokenTotals.append(0)
+        return tokenId
+
     def increase_user_rewards(self, user, token, toAdd):
         if toAdd < 0:
             print("NEGATIVE to ADD")
@@ -42,15 +245,26 @@ class RewardsList:
         """
         If user has rewards, increase. If not, set their rewards to this initial value
         """
-        if user in self.claims and token in self.claims[user]:
-            self.claims[user][token] += toAdd
-        else:
-            self.claims[user][token] = toAdd
+        userId = self.userIds.get(user)
+        if userId is None:
+            userId = self.user_id(user)
+        tokenId = self.tokenIds.get(token)
+        if tokenId is None:
+            tokenId = self.token_id(token)
 
-        if token in self.totals:
-            self.totals[token] += toAdd
+        column = self.columns[tokenId]
+        if userId >= len(column):
+            # Columns grow lazily, only up to the newest user holding the token
+            column.extend([0] * (len(self.users) - len(column)))
+
+        userTokens = self.userTokens[userId]
+        if tokenId in userTokens:
+            column[userId] += toAdd
         else:
-            self.totals[token] = toAdd
+            userTokens.append(tokenId)
+            column[userId] = toAdd
+
+        self.tokenTotals[tokenId] += toAdd
 
     def track_user_metadata(self, user, metadata):
         if user in self.metadata:
@@ -99,93 +313,56 @@ class RewardsList:
             return False
 
     def getTokenRewards(self, user, token):
-        if self.claims[user][token]:
-            return self.claims[user][token]
-        else:
+        userId = self.userIds.get(user)
+        tokenId = self.tokenIds.get(token)
+        if userId is None or tokenId is None:
+            return 0
+        if tokenId not in self.userTokens[userId]:
             return 0
+        return self.columns[tokenId][userId]
 
-    def to_node_entry(self, user, userData, cycle, index):
+    def to_merkle_format(self, serial=False):
         """
-        Use abi.encode() to encode data into the hex format used as raw node information in the tree
-        This is the value that will be hashed to form the rest of the tree
+        - Sort users into alphabetical order
+        - Node entry = [cycle, user, index, token[], cumulativeAmount[]]
         """
-        user_str = str(user).lower()
-        nodeEntry = {
-            "user": user,
-            "tokens": [],
-            "cumulativeAmounts": [],
-            "cycle": cycle,
-            "index": index,
-        }
-        intAmounts = []
-        for tokenAddress, cumulativeAmount in userData.items():
-            nodeEntry["tokens"].append(tokenAddress)
-            nodeEntry["cumulativeAmounts"].append(str(int(cumulativeAmount)))
-            intAmounts.append(int(cumulativeAmount))
-
-        # console.print(
-        #     "Encoding Node entry...",
-        #     {
-        #         "index": int(nodeEntry["index"]),
-        #         "account": nodeEntry["user"],
-        #         "cycle": int(nodeEntry["cycle"]),
-        #         "tokens": nodeEntry["tokens"],
-        #         "cumulativeAmounts": nodeEntry["cumulativeAmounts"],
-        #         "(integer encoded)": intAmounts,
-        #     }
-        # )
-
-        encoded_local = encode_hex(
-            encode_abi(
-                ["uint", "address", "uint", "address[]", "uint[]"],
-                (
-                    int(nodeEntry["index"]),
-                    nodeEntry["user"],
-                    int(nodeEntry["cycle"]),
-                    nodeEntry["tokens"],
-                    intAmounts,
-                ),
-            )
-        )
-
-        # encoder = BadgerTree.at(web3.toChecksumAddress("0x660802Fc641b154aBA66a62137e71f331B6d787A"))
-
-        # console.print("nodeEntry", nodeEntry)
-        # console.print("encoded_local", encoded_local)
-
-        # ===== Verify encoding on-chain =====
-        # encoded_chain = encoder.encodeClaim(
-        #     nodeEntry["tokens"],
-        #     nodeEntry["cumulativeAmounts"],
-        #     nodeEntry["user"],
-        #     nodeEntry["index"],
-        #     nodeEntry["cycle"],
-        # )[0]
-
-        # console.print("encoded_onchain", encoded_chain)
-        # assert encoded_local == encoded_chain
-
-        return (nodeEntry, encoded_local)
+        (nodeEntries, encodedEntries, entries, _) = self.to_merkle_leaves(serial)
+        return (nodeEntries, encodedEntries, entries)
 
-    def to_merkle_format(self):
+    def to_merkle_leaves(self, serial=False):
         """
-        - Sort users into alphabetical order
-        - Node entry = [cycle, user, index, token[], cumulativeAmount[]]
+        Same as to_merkle_format, also returning the keccak hash of each encoded
+        node so the tree doesn't need to hash them again.
+        Encoding is batched across processes unless serial is set.
         """
         cycle = self.cycle
-        dict = self.claims.toDict()
 
         nodeEntries = []
-        encodedEntries = []
-        entries = []
-
-        index = 0
+        claims = []
 
-        for user, userData in self.claims.items():
-            (nodeEntry, encoded) = self.to_node_entry(user, userData, cycle, index)
+        for index, (user, userData) in enumerate(self.claims.items()):
+            nodeEntry = node_entry(
+                user, userData.keys(), userData.values(), cycle, index
+            )
             nodeEntries.append(nodeEntry)
+            claims.append(
+                (
+                    index,
+                    user,
+                    int(cycle),
+                    nodeEntry["tokens"],
+                    [int(a) for a in userData.values()],
+                )
+            )
+
+        encodedEntries = []
+        leaves = []
+        entries = []
+        for nodeEntry, (encoded, leaf) in zip(
+            nodeEntries, encode_nodes(claims, serial)
+        ):
             encodedEntries.append(encoded)
+            leaves.append(leaf)
             entries.append({"node": nodeEntry, "encoded": encoded})
-            index += 1
 
-        return (nodeEntries, encodedEntries, entries)
+        return (nodeEntries, encodedEntries, entries, leaves)
@@ -0,0 +1,204 @@
+from brownie import web3
+from rich.console import Console
+from assistant.subgraph.client import fetch_sett_balances, fetch_geyser_events
+from assistant.rewards.rewards_utils import (
+    calc_balances_from_geyser_events,
+    calculate_sett_balances,
+    merge_sett_balances,
+)
+from config.rewards_config import rewards_config
+from helpers.constants import AddressZero, NO_GEYSERS
+
+console = Console()
+
+TRANSFER_TOPIC = web3.keccak(text="Transfer(address,address,uint256)").hex()
+STAKED_TOPIC = web3.keccak(
+    text="Staked(address,uint256,uint256,uint256,uint256,bytes)"
+).hex()
+UNSTAKED_TOPIC = web3.keccak(
+    text="Unstaked(address,uint256,uint256,uint256,uint256,bytes)"
+).hex()
+
+
+def fetch_logs(address, topics, fromBlock, toBlock):
+    """
+    Logs emitted by address matching any of topics, in chain order,
+    split into rewards_config.balanceIndexLogRange block requests
+    """
+    logs = []
+    step = rewards_config.balanceIndexLogRange
+    for start in range(fromBlock, toBlock + 1, step):
+        logs.extend(
+            web3.eth.getLogs(
+                {
+                    "address": web3.toChecksumAddress(address),
+                    "fromBlock": start,
+                    "toBlock": min(start + step - 1, toBlock),
+                    "topics": [topics],
+                }
+            )
+        )
+    return logs
+
+
+def log_bytes(value):
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    return bytes(value)
+
+
+def log_address(topic):
+    return "0x" + log_bytes(topic)[-20:].hex()
+
+
+def log_words(log):
+    data = log_bytes(log["data"])
+    return [int.from_bytes(data[i : i + 32], "big") for i in range(0, len(data), 32)]
+
+
+def transfer_deltas(logs):
+    """
+    (blockNumber, address, delta) share balance changes from Transfer logs
+    """
+    deltas = []
+    for log in logs:
+        (sender, recipient) = (
+            log_address(log["topics"][1]),
+            log_address(log["topics"][2]),
+        )
+        value = log_words(log)[0]
+        if sender != AddressZero:
+            deltas.append((log["blockNumber"], sender, -value))
+        if recipient != AddressZero:
+            deltas.append((log["blockNumber"], recipient, value))
+    return deltas
+
+
+def stake_totals(logs):
+    """
+    (blockNumber, user, total) from geyser Staked / Unstaked logs, total being
+    the user's staked balance after the event
+    """
+    return [
+        (log["blockNumber"], log_address(log["topics"][1]), log_words(log)[1])
+        for log in logs
+    ]
+
+
+class SettBalanceIndex:
+    """
+    Balances of one sett at any block in [startBlock, endBlock].
+
+    Takes one subgraph snapshot of share balances and geyser stakes at
+    startBlock, then replays share Transfer and geyser Staked / Unstaked logs
+    up to the requested block, instead of downloading a full snapshot for
+    every block. Blocks are cheapest to query in increasing order, going back
+    replays from the snapshot.
+    """
+
+    def __init__(self, badger, name, startBlock, endBlock):
+        self.badger = badger
+        self.name = name
+        self.startBlock = int(startBlock)
+        self.endBlock = int(endBlock)
+        sett = badger.getSett(name)
+        hasGeyser = name not in NO_GEYSERS
+
+        console.log(
+            "Indexing {} balances between {} and {}".format(
+                name, self.startBlock, self.endBlock
+            )
+        )
+        self.settSnapshot = fetch_sett_balances(
+            name, sett.address.lower(), self.startBlock
+        )
+        self.geyserSnapshot = {}
+        if hasGeyser:
+            geyserAddr = badger.getGeyser(name).address.lower()
+            self.geyserSnapshot = calc_balances_from_geyser_events(
+                fetch_geyser_events(geyserAddr, self.startBlock)
+            )
+
+        self.transfers = []
+        self.stakes = []
+        if self.endBlock > self.startBlock:
+            self.transfers = transfer_deltas(
+                fetch_logs(
+                    sett.address, [TRANSFER_TOPIC], self.startBlock + 1, self.endBlock
+                )
+            )
+            if hasGeyser:
+                self.stakes = stake_totals(
+                    fetch_logs(
+                        geyserAddr,
+                        [STAKED_TOPIC, UNSTAKED_TOPIC],
+                        self.startBlock + 1,
+                        self.endBlock,
+                    )
+                )
+        console.log(
+            "{} share transfers and {} stake changes to replay".format(
+                len(self.transfers), len(self.stakes)
+            )
+        )
+        self.rewind()
+
+    def rewind(self):
+        self.block = self.startBlock
+        self.settBalances = dict(self.settSnapshot)
+        self.geyserBalances = dict(self.geyserSnapshot)
+        self.transferCursor = 0
+        self.stakeCursor = 0
+
+    def replay_to(self, block):
+        if block < self.block:
+            self.rewind()
+        while (
+            self.transferCursor < len(self.transfers)
+            and self.transfers[self.transferCursor][0] <= block
+        ):
+            (_, address, delta) = self.transfers[self.transferCursor]
+            self.settBalances[address] = self.settBalances.get(address, 0) + delta
+            self.transferCursor += 1
+        while (
+            self.stakeCursor < len(self.stakes)
+            and self.stakes[self.stakeCursor][0] <= block
+        ):
+            (_, user, total) = self.stakes[self.stakeCursor]
+            self.geyserBalances[user] = total
+            self.stakeCursor += 1
+        self.block = block
+
+    def balances_at(self, block):
+        block = int(block)
+        assert (
+            self.startBlock <= block <= self.endBlock
+        ), "Block {} outside of indexed range {} - {}".format(
+            block, self.startBlock, self.endBlock
+        )
+        self.replay_to(block)
+        return merge_sett_balances(
+            self.badger, self.name, self.settBalances, self.geyserBalances
+        )
+
+
+def balance_indexes(badger, blocksBySett):
+    """
+    One SettBalanceIndex per sett spanning the blocks it will be queried at
+    """
+    return {
+        name: SettBalanceIndex(badger, name, min(blocks), max(blocks))
+        for name, blocks in blocksBySett.items()
+    }
+
+
+def balances_lookup(badger, blocksBySett):
+    """
+    Function (name, block) -> UserBalances for the given setts and blocks.
+    Backed by one SettBalanceIndex per sett, or by full snapshots if
+    rewards_config.balanceIndex is off
+    """
+    if not rewards_config.balanceIndex:
+        return lambda name, block: calculate_sett_balances(badger, name, int(block))
+    indexes = balance_indexes(badger, blocksBySett)
+    return lambda name, block: indexes[name].balances_at(block)
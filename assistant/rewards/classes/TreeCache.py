@@ -0,0 +1,101 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zlib
+
+from assistant.rewards.tree_stream import iter_claims
+
+GZIP_MAGIC = b"\x1f\x8b"
+CHUNK_SIZE = 1 << 20
+INDEX_FILE = "index.json"
+
+
+class TreeCache:
+    """
+    Past rewards trees on disk, gzip compressed.
+    Files are named by the sha256 of the tree JSON and indexed by s3 VersionId:
+    a version never changes, so a cached one is never downloaded again.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.index = {}
+        indexPath = os.path.join(directory, INDEX_FILE)
+        if os.path.exists(indexPath):
+            with open(indexPath) as f:
+                self.index = json.load(f)
+
+    def path(self, contentHash):
+        return os.path.join(self.directory, contentHash + ".json.gz")
+
+    def get(self, versionId):
+        entry = self.index.get(versionId)
+        if entry is None or not os.path.exists(self.path(entry["sha256"])):
+            return None
+        return entry
+
+    def put(self, versionId, body, **info):
+        """
+        Store a tree read from body, a file-like object holding plain or
+        gzip compressed JSON, without reading it into memory
+        """
+        (fd, tmpPath) = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        sha256 = hashlib.sha256()
+        size = 0
+        with os.fdopen(fd, "wb") as out:
+            chunk = body.read(CHUNK_SIZE)
+            if chunk[:2] == GZIP_MAGIC:
+                # Keep the compressed bytes, hashing what they decompress to
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                while chunk:
+                    out.write(chunk)
+                    decoded = decompressor.decompress(chunk)
+                    sha256.update(decoded)
+                    size += len(decoded)
+                    chunk = body.read(CHUNK_SIZE)
+            else:
+                with gzip.GzipFile(fileobj=out, mode="wb", mtime=0) as compressed:
+                    while chunk:
+                        compressed.write(chunk)
+                        sha256.update(chunk)
+                        size += len(chunk)
+                        chunk = body.read(CHUNK_SIZE)
+
+        entry = {"sha256": sha256.hexdigest(), "size": size, **info}
+        os.replace(tmpPath, self.path(entry["sha256"]))
+        with self.lock:
+            self.index[versionId] = entry
+            self.save_index()
+        return entry
+
+    def save_index(self):
+        tmpPath = os.path.join(self.directory, INDEX_FILE + ".tmp")
+        with open(tmpPath, "w") as f:
+            json.dump(self.index, f, indent=4)
+        os.replace(tmpPath, os.path.join(self.directory, INDEX_FILE))
+
+    def open(self, versionId):
+        """
+        Decompressing stream of a cached tree's JSON
+        """
+        return gzip.open(self.path(self.index[versionId]["sha256"]), "rb")
+
+    def read(self, versionId):
+        with self.open(versionId) as f:
+            return f.read()
+
+    def load(self, versionId):
+        with self.open(versionId) as f:
+            return json.load(f)
+
+    def claims(self, versionId):
+        """
+        Stream (user, claim) pairs of a cached tree
+        """
+        with self.open(versionId) as f:
+            yield from iter_claims(f)
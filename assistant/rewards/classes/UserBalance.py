@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import List, Dict
+from typing import List
 
 
 @dataclass
@@ -13,43 +13,162 @@ class UserBalance:
         self.balance = self.balance * boost
 
 
-@dataclass
+class UserBalanceRow:
+    """
+    One user of a UserBalances, reading and writing through to its columns.
+    Behaves like a UserBalance.
+    """
+
+    __slots__ = ("owner", "position")
+
+    def __init__(self, owner, position):
+        self.owner = owner
+        self.position = position
+
+    @property
+    def address(self):
+        return self.owner.addresses[self.position]
+
+    @property
+    def balance(self):
+        return self.owner.balances[self.position]
+
+    @balance.setter
+    def balance(self, value):
+        self.owner.balances[self.position] = value
+        self.owner.invalidate_total()
+
+    @property
+    def token(self):
+        return self.owner.tokens[self.position]
+
+    @property
+    def type(self):
+        return self.owner.types[self.position]
+
+    def boost_balance(self, boost):
+        self.balance = self.balance * boost
+
+    def __repr__(self):
+        return "UserBalance(address={!r}, balance={!r}, token={!r}, type={!r})".format(
+            self.address, self.balance, self.token, self.type
+        )
+
+
 class UserBalances:
-    userBalances: Dict[str, UserBalance] = field(default_factory=lambda: [])
+    """
+    Balances of many users, stored as parallel columns (addresses, balances,
+    tokens, types) with an address -> position index.
+    Iterating or indexing yields UserBalanceRow views.
+    """
+
+    def __init__(self, userBalances=[]):
+        self.addresses = []
+        self.balances = []
+        self.tokens = []
+        self.types = []
+        self.index = {}
+        self._total = None
+        for user in userBalances:
+            self.set_user(user.address, user.balance, user.token, user.type)
+
+    @classmethod
+    def from_columns(cls, addresses, balances, token, settType):
+        """
+        Build from parallel address / balance lists sharing a token and type.
+        Addresses must be unique.
+        """
+        userBalances = cls()
+        userBalances.addresses = list(addresses)
+        userBalances.balances = list(balances)
+        userBalances.tokens = [token] * len(userBalances.addresses)
+        userBalances.types = [settType] * len(userBalances.addresses)
+        userBalances.index = {
+            addr: position for position, addr in enumerate(userBalances.addresses)
+        }
+        return userBalances
 
-    def __post_init__(self):
-        if len(self.userBalances) > 0:
-            self.userBalances = {u.address: u for u in self.userBalances}
+    def set_user(self, address, balance, token, type):
+        position = self.index.get(address)
+        if position is None:
+            self.index[address] = len(self.addresses)
+            self.addresses.append(address)
+            self.balances.append(balance)
+            self.tokens.append(token)
+            self.types.append(type)
         else:
-            self.userBalances = {}
+            self.balances[position] = balance
+            self.tokens[position] = token
+            self.types[position] = type
+        self.invalidate_total()
+
+    @property
+    def userBalances(self):
+        return {addr: self[addr] for addr in self.addresses}
+
+    def invalidate_total(self):
+        self._total = None
 
     def total_balance(self):
-        return sum([u.balance for u in self.userBalances.values()])
+        if self._total is None:
+            self._total = sum(self.balances)
+        return self._total
 
     def percentage_of_total(self, addr):
         return self[addr].balance / self.total_balance()
 
+    def apply_boosts(self, boosts):
+        """
+        Multiply each balance by its boost (1 for users without one).
+        Returns each user's share of the total after boosting relative to
+        their share before, {address: postShare / preShare}.
+        """
+        preTotal = self.total_balance()
+        preBalances = self.balances
+        self.balances = [
+            balance * boosts.get(addr, 1)
+            for addr, balance in zip(self.addresses, preBalances)
+        ]
+        self.invalidate_total()
+        postTotal = self.total_balance()
+
+        shareRatios = {}
+        for addr, preBalance, balance in zip(
+            self.addresses, preBalances, self.balances
+        ):
+            preShare = preBalance / preTotal
+            if preShare == 0:
+                shareRatios[addr] = 1
+            else:
+                shareRatios[addr] = (balance / postTotal) / preShare
+        return shareRatios
+
     def __getitem__(self, key):
-        return self.userBalances.get(key, None)
+        position = self.index.get(key)
+        if position is None:
+            return None
+        return UserBalanceRow(self, position)
 
     def __setitem__(self, key, value):
-        self.userBalances[key] = value
+        self.set_user(key, value.balance, value.token, value.type)
 
     def __contains__(self, key):
-        return key in self.userBalances
+        return key in self.index
 
     def __add__(self, other):
-        newUserBalances = self.userBalances
-        for user in other.userBalances.values():
-            if user.address in newUserBalances:
-                newUserBalances[user.address].balance += user.balance
+        merged = UserBalances(self)
+        for user in other:
+            position = merged.index.get(user.address)
+            if position is None:
+                merged.set_user(user.address, user.balance, user.token, user.type)
             else:
-                newUserBalances[user.address] = user
-        return UserBalances(newUserBalances.values())
+                merged.balances[position] += user.balance
+        merged.invalidate_total()
+        return merged
 
     def __iter__(self):
-        for user in self.userBalances.values():
-            yield user
+        for position in range(len(self.addresses)):
+            yield UserBalanceRow(self, position)
 
     def __len__(self):
-        return len(self.userBalances)
+        return len(self.addresses)
@@ -0,0 +1,50 @@
+import numpy as np
+from config.rewards_config import rewards_config
+
+
+def distribute_exact(amount, balances):
+    """
+    Split an integer amount between balances pro rata, in exact integer math.
+    Each share is amount * balance // total. The few units lost to flooring
+    (always fewer than the number of balances) go one each to the largest
+    remainders, ties to the earliest balance, so shares always sum to amount.
+    Float balances (e.g. boosted ones) are floored to whole units first.
+    """
+    amount = int(amount)
+    weights = np.array([max(int(b), 0) for b in balances], dtype=object)
+    total = int(weights.sum()) if len(weights) > 0 else 0
+    if amount <= 0 or total == 0:
+        return [0] * len(weights)
+
+    scaled = weights * amount
+    shares = scaled // total
+    leftover = amount - int(shares.sum())
+    if leftover > 0:
+        remainders = scaled % total
+        # Stable sort keeps ties in balance order
+        order = np.argsort(-remainders, kind="stable")[:leftover]
+        shares[order] += 1
+    return [int(s) for s in shares]
+
+
+def distribute_float(amount, balances):
+    """
+    The old float split, amount / total * balance truncated to an int.
+    Loses precision at 1e18 scale, kept behind rewards_config.exactDistribution
+    for comparing against past cycles.
+    """
+    total = sum(balances)
+    if amount <= 0 or total <= 0:
+        return [0] * len(balances)
+    rewardsUnit = amount / total
+    return [int(b * rewardsUnit) for b in balances]
+
+
+def distribute(amount, balances):
+    """
+    Split amount between balances pro rata, returning one int share per balance
+    """
+    balances = list(balances)
+    if rewards_config.exactDistribution:
+        return distribute_exact(amount, balances)
+    return distribute_float(amount, balances)
@@ -0,0 +1,62 @@
+from rich.console import Console
+from config.rewards_config import rewards_config
+
+console = Console()
+
+"""
+Leveled logging for the rewards assistant.
+
+Messages are format strings, only formatted and rendered when their level
+is enabled by rewards_config.logLevel. Loops over users, events or schedules
+log per item messages at debug and a Summary of the loop at info, so the
+default output does not grow with the number of users.
+"""
+
+LOG_LEVELS = {"debug": 10, "info": 20, "warning": 30}
+
+
+def enabled(level):
+    return LOG_LEVELS[level] >= LOG_LEVELS[rewards_config.logLevel]
+
+
+def emit(level, message, args):
+    if enabled(level):
+        # Report the line that called debug() / info() / warning()
+        console.log(message.format(*args) if args else message, _stack_offset=3)
+
+
+def debug(message, *args):
+    emit("debug", message, args)
+
+
+def info(message, *args):
+    emit("info", message, args)
+
+
+def warning(message, *args):
+    emit("warning", message, args)
+
+
+class Summary:
+    """
+    Counts and totals gathered in a loop, logged as one line
+    """
+
+    def __init__(self, title, *args):
+        self.title = title
+        self.args = args
+        self.totals = {}
+
+    def add(self, key, amount=1):
+        self.totals[key] = self.totals.get(key, 0) + amount
+
+    def log(self, level="info"):
+        if enabled(level):
+            totals = ", ".join(
+                "{}: {}".format(
+                    key, round(total, 6) if isinstance(total, float) else total
+                )
+                for key, total in self.totals.items()
+            )
+            title = self.title.format(*self.args)
+            emit(level, "{} ({})", (title, totals))
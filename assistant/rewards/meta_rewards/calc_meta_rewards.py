@@ -2,10 +2,9 @@ from tqdm import tqdm
 from brownie import *
 from assistant.rewards.classes.RewardsList import RewardsList
 from assistant.rewards.classes.RewardsLog import rewardsLog
-from assistant.rewards.rewards_utils import calculate_sett_balances
-from rich.console import Console
-
-console = Console()
+from assistant.rewards.distribution import distribute
+from assistant.rewards.classes.SettBalanceIndex import balances_lookup
+from assistant.rewards import log
 
 
 def calc_rewards(badger, start, end, nextCycle, events, name, token):
@@ -15,51 +14,55 @@ def calc_rewards(badger, start, end, nextCycle, events, name, token):
     filteredEvents = list(filter(filter_events, events))
     rewards = RewardsList(nextCycle, badger.badgerTree)
     if len(filteredEvents) > 0:
-        console.log(filteredEvents)
-        console.log("{} events to process for {}".format(len(filteredEvents), name))
+        log.debug("{}", filteredEvents)
+        log.info("{} events to process for {}", len(filteredEvents), name)
         rewards = process_rewards(badger, filteredEvents, name, nextCycle, token)
     else:
-        console.log("No events to process for {}".format(name))
+        log.info("No events to process for {}", name)
     return rewards
 
 
 def process_rewards(badger, events, name, nextCycle, token):
     totalFromEvents = sum([int(e["rewardAmount"]) for e in events]) / 1e18
     rewards = RewardsList(nextCycle, badger.badgerTree)
+    token = web3.toChecksumAddress(token)
     total = 0
+    balancesAt = balances_lookup(
+        badger, {name: [int(e["blockNumber"]) for e in events]}
+    )
+    summary = log.Summary("Processed {} harvests for {}", len(events), name)
     for event in events:
-        userState = calc_meta_farm_rewards(badger, name, event["blockNumber"])
-        totalBalance = sum([u.balance for u in userState])
+        log.debug(
+            "Calculating rewards for {} harvest at {}", name, event["blockNumber"]
+        )
+        userState = balancesAt(name, event["blockNumber"])
         total += int(event["rewardAmount"])
-        console.log("{} total {} processed".format(total / 1e18, token))
-        rewardsUnit = int(event["rewardAmount"]) / totalBalance
-        for user in userState:
+        log.debug("{} total {} processed", total / 1e18, token)
+        summary.add("users", len(userState))
+        rewardAmounts = distribute(
+            int(event["rewardAmount"]), [user.balance for user in userState]
+        )
+        for user, rewardAmount in zip(userState, rewardAmounts):
             rewards.increase_user_rewards(
                 web3.toChecksumAddress(user.address),
-                web3.toChecksumAddress(token),
-                rewardsUnit * user.balance,
+                token,
+                rewardAmount,
             )
 
-    totalFromRewards = sum(
-        [list(v.values())[0] / 1e18 for v in list(rewards.claims.values())]
-    )
+    summary.add(token, total / 1e18)
+    summary.log()
+
+    totalFromRewards = rewards.totals.get(token, 0) / 1e18
     rewardsLog.add_total_token_dist(name, token, totalFromRewards)
     # Calc diff of rewardsTotal and add assertion for checking rewards
     rewardsDiff = abs(totalFromRewards - totalFromRewards) * 1e18
-    console.log(
-        "Total from Rewards: {} \nTotal from Events: {}\n Diff: {}".format(
-            totalFromRewards, totalFromEvents, rewardsDiff
-        )
+    log.info(
+        "Total from Rewards: {} \nTotal from Events: {}\n Diff: {}",
+        totalFromRewards,
+        totalFromEvents,
+        rewardsDiff,
     )
     if abs(totalFromEvents - totalFromRewards) > 100000:
         assert False, "Incorrect total rewards"
 
     return rewards
-
-
-def calc_meta_farm_rewards(badger, name, harvestBlock):
-    console.log("Calculating rewards for {} harvest at {}".format(name, harvestBlock))
-    harvestBlock = int(harvestBlock)
-    sett = badger.getSett(name)
-    balances = calculate_sett_balances(badger, name, harvestBlock)
-    return balances
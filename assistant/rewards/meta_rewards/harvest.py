@@ -8,7 +8,7 @@ farmTokenAddress = "0xa0246c9032bC3A600820415aE600c6388619A14D"
 
 
 def calc_farm_rewards(badger, startBlock, endBlock, nextCycle, retroactive):
-    farmEvents = fetch_farm_harvest_events()
+    farmEvents = fetch_farm_harvest_events(startBlock, endBlock)
 
     return calc_rewards(
         badger,
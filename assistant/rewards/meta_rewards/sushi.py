@@ -8,7 +8,7 @@ xSushiTokenAddress = "0x8798249c2e607446efb7ad49ec89dd1865ff4272"
 
 
 def calc_all_sushi_rewards(badger, startBlock, endBlock, nextCycle):
-    allSushiEvents = fetch_sushi_harvest_events()
+    allSushiEvents = fetch_sushi_harvest_events(startBlock, endBlock)
 
     wbtcEthRewards = calc_sushi_rewards(
         badger,
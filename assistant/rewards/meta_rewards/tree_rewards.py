@@ -1,14 +1,13 @@
 from helpers.constants import PEAK_ADDRESSES
 from assistant.subgraph.client import fetch_tree_distributions
 from assistant.subgraph.client import fetch_wallet_balances
-from assistant.rewards.rewards_utils import calculate_sett_balances
-from rich.console import Console
+from assistant.rewards.classes.SettBalanceIndex import balances_lookup
+from assistant.rewards import log
 from assistant.rewards.classes.RewardsList import RewardsList
 from assistant.rewards.classes.RewardsLog import rewardsLog
+from assistant.rewards.distribution import distribute
 from brownie import web3
 
-console = Console()
-
 
 def calc_tree_rewards(badger, startBlock, endBlock, nextCycle):
 
@@ -16,11 +15,25 @@ def calc_tree_rewards(badger, startBlock, endBlock, nextCycle):
     # _, _2, ibbtc_balances = fetch_wallet_balances(sharesPerFragment, endBlock)
 
     treeDists = fetch_tree_distributions(startBlock, endBlock)
-    console.log(
-        "Calculating rewards for {} harvests between {} and {}".format(
-            len(treeDists), startBlock, endBlock
-        )
+    log.info(
+        "Calculating rewards for {} harvests between {} and {}",
+        len(treeDists),
+        startBlock,
+        endBlock,
     )
+    blocksBySett = {}
+    for dist in treeDists:
+        settName = badger.getSettFromStrategy(dist["id"].split("-")[0])
+        blocksBySett.setdefault(settName, []).append(int(dist["blockNumber"]))
+    balancesAt = balances_lookup(badger, blocksBySett)
+    return distribute_tree_rewards(badger, treeDists, balancesAt, nextCycle)
+
+
+def distribute_tree_rewards(badger, treeDists, balancesAt, nextCycle):
+    """
+    Split each tree distribution among the sett's holders at its block,
+    balancesAt(settName, block) giving their UserBalances
+    """
     rewards = RewardsList(nextCycle, badger.badgerTree)
     rewardsData = {}
     for dist in treeDists:
@@ -30,24 +43,22 @@ def calc_tree_rewards(badger, startBlock, endBlock, nextCycle):
         symbol = dist["token"]["symbol"]
         amountToDistribute = int(dist["amount"])
 
-        console.log("Processing harvest...")
-        console.log("Token:{}".format(symbol))
-        console.log("Amount:{} \n".format(amountToDistribute / 1e18))
+        log.debug("Processing harvest...")
+        log.debug("Token:{}", symbol)
+        log.debug("Amount:{} \n", amountToDistribute / 1e18)
 
         if symbol not in rewardsData:
             rewardsData[symbol] = 0
 
         rewardsData[symbol] += amountToDistribute / 1e18
         settName = badger.getSettFromStrategy(strategy)
-        balances = calculate_sett_balances(badger, settName, int(blockNumber))
-        totalBalance = sum([u.balance for u in balances])
-        rewardsUnit = amountToDistribute / totalBalance
+        balances = balancesAt(settName, int(blockNumber))
+        rewardAmounts = distribute(amountToDistribute, [u.balance for u in balances])
         rewardsLog.add_total_token_dist(
             settName, web3.toChecksumAddress(token), amountToDistribute / 1e18
         )
         # totalIbbtcBalance = sum(ibbtc_balances.values())
-        for user in balances:
-            userReward = rewardsUnit * user.balance
+        for user, userReward in zip(balances, rewardAmounts):
             # if user.address in [a.lower() for a in PEAK_ADDRESSES]:
             #     ibbtcRewardsUnit = userReward / totalIbbtcBalance
 
@@ -69,9 +80,9 @@ def calc_tree_rewards(badger, startBlock, endBlock, nextCycle):
             rewards.increase_user_rewards(
                 web3.toChecksumAddress(user.address),
                 web3.toChecksumAddress(token),
-                int(userReward),
+                userReward,
             )
 
-    console.log(rewardsData)
+    log.info("Tree rewards distributed: {}", rewardsData)
 
     return rewards
@@ -1,5 +1,8 @@
 from assistant.subgraph.client import fetch_wallet_balances
+from assistant.subgraph.prefetch import prefetch_sett_balances
 import json
+import os
+import tempfile
 from brownie import *
 from brownie.network.gas.strategies import GasNowStrategy
 from config.rewards_config import rewards_config
@@ -11,9 +14,12 @@ from assistant.rewards.twap import digg_btc_twap, calculate_digg_allocation
 from assistant.rewards.aws_utils import (
     download_latest_tree,
     download_tree,
+    download_tree_to_file,
     upload,
     upload_boosts,
 )
+from assistant.rewards.tree_stream import dump_tree
+from assistant.rewards.classes.LazyTree import LazyTree
 from assistant.rewards.calc_snapshot import calc_snapshot
 from assistant.rewards.meta_rewards.harvest import calc_farm_rewards
 from assistant.rewards.meta_rewards.sushi import calc_all_sushi_rewards
@@ -25,16 +31,23 @@ from assistant.rewards.rewards_utils import (
     combine_rewards,
 )
 from assistant.rewards.classes.MerkleTree import rewards_to_merkle_tree
+from assistant.rewards.classes.IncrementalMerkleBuilder import (
+    IncrementalMerkleBuilder,
+)
 from assistant.rewards.classes.RewardsList import RewardsList
 from assistant.rewards.classes.RewardsLog import rewardsLog
+from assistant.rewards.classes.CycleTrace import (
+    cycleTrace,
+    install_rpc_counter,
+    install_subgraph_counter,
+)
+from assistant.rewards.classes.CycleReads import cycleReads
 
 from assistant.rewards.rewards_checker import compare_rewards, verify_rewards
 from scripts.systems.badger_system import BadgerSystem
 from helpers.gas_utils import gas_strategies
 from helpers.constants import BCVX, BCVXCRV
 
-gas_strategies.set_default(gas_strategies.exponentialScalingFast)
-gas_strategy = gas_strategies.exponentialScalingFast
 console = Console()
 
 
@@ -46,16 +59,27 @@ def calc_sett_rewards(badger, periodStartBlock, endBlock, cycle, unclaimedReward
     # diggAllocation = calculate_digg_allocation(ratio)
     rewardsBySett = {}
     noRewards = ["native.digg", "experimental.digg"]
-    boosts, boostInfo = badger_boost(badger, endBlock)
+    # Boost and every sett snapshot read balances at endBlock
+    with cycleTrace.stage("prefetch_balances"):
+        prefetch_sett_balances(badger, endBlock, skip=["experimental.digg"])
+    with cycleTrace.stage("boost"):
+        boosts, boostInfo = badger_boost(badger, endBlock)
     apyBoosts = {}
     multiplierData = {}
     for key, sett in badger.sett_system.vaults.items():
         if key in noRewards:
             continue
 
-        settRewards, apyBoost = calc_snapshot(
-            badger, key, periodStartBlock, endBlock, cycle, boosts, unclaimedRewards
-        )
+        with cycleTrace.stage(key):
+            settRewards, apyBoost = calc_snapshot(
+                badger,
+                key,
+                periodStartBlock,
+                endBlock,
+                cycle,
+                boosts,
+                unclaimedRewards,
+            )
         if len(apyBoost) > 0:
             minimum = min(apyBoost.values())
             maximum = max(apyBoost.values())
@@ -67,7 +91,10 @@ def calc_sett_rewards(badger, periodStartBlock, endBlock, cycle, unclaimedReward
 
         rewardsBySett[key] = settRewards
 
-    rewards = combine_rewards(list(rewardsBySett.values()), cycle, badger.badgerTree)
+    with cycleTrace.stage("combine_rewards"):
+        rewards = combine_rewards(
+            list(rewardsBySett.values()), cycle, badger.badgerTree
+        )
     boostsMetadata = {"multiplierData": multiplierData, "userData": {}}
 
     for addr, multipliers in apyBoosts.items():
@@ -82,7 +109,8 @@ def calc_sett_rewards(badger, periodStartBlock, endBlock, cycle, unclaimedReward
     with open("badger-boosts.json", "w") as fp:
         json.dump(boostsMetadata, fp)
 
-    upload_boosts(test=False)
+    with cycleTrace.stage("upload_boosts"):
+        upload_boosts(test=False)
 
     return rewards
 
@@ -143,7 +171,10 @@ def fetch_pending_rewards_tree(badger, print_output=False):
             "[green]===== Loading Pending Rewards " + pastFile + " =====[/green]"
         )
 
-    currentTree = json.loads(download_tree(pastFile))
+    if rewards_config.streamTrees:
+        currentTree = LazyTree(download_tree_to_file(pastFile, pastFile))
+    else:
+        currentTree = json.loads(download_tree(pastFile))
 
     # Invariant: File shoulld have same root as latest
     assert currentTree["merkleRoot"] == merkle["root"]
@@ -175,7 +206,10 @@ def fetch_current_rewards_tree(badger, print_output=False):
         "[bold yellow]===== Loading Past Rewards " + pastFile + " =====[/bold yellow]"
     )
 
-    currentTree = json.loads(download_tree(pastFile))
+    if rewards_config.streamTrees:
+        currentTree = LazyTree(download_tree_to_file(pastFile, pastFile))
+    else:
+        currentTree = json.loads(download_tree(pastFile))
 
     # Invariant: File shoulld have same root as latest
     console.print(merkle)
@@ -197,10 +231,27 @@ def fetch_current_rewards_tree(badger, print_output=False):
 
 
 def generate_rewards_in_range(badger, startBlock, endBlock, pastRewards, saveLocalFile):
+    nextCycle = getNextCycle(badger)
+    install_rpc_counter(web3)
+    install_subgraph_counter()
+    cycleTrace.start(nextCycle)
+    try:
+        return calc_rewards_in_range(
+            badger, startBlock, endBlock, pastRewards, saveLocalFile, nextCycle
+        )
+    finally:
+        # Failed cycles stop their profiler and upload their trace too
+        cycleTrace.save()
+
+
+def calc_rewards_in_range(
+    badger, startBlock, endBlock, pastRewards, saveLocalFile, nextCycle
+):
     endBlock = endBlock
     blockDuration = endBlock - startBlock
 
-    nextCycle = getNextCycle(badger)
+    with cycleTrace.stage("prefetch_reads"):
+        cycleReads.prefetch(badger, [startBlock, endBlock])
 
     currentMerkleData = fetchCurrentMerkleData(badger)
     # farmRewards = fetch_current_harvest_rewards(badger,startBlock, endBlock,nextCycle)
@@ -210,24 +261,41 @@ def generate_rewards_in_range(badger, startBlock, endBlock, pastRewards, saveLoc
         if BCVX in tokens or BCVXCRV in tokens:
             unclaimedAddresses.append(addr)
 
-    sushiRewards = calc_all_sushi_rewards(badger, startBlock, endBlock, nextCycle)
-    treeRewards = calc_tree_rewards(badger, startBlock, endBlock, nextCycle)
-    settRewards = calc_sett_rewards(
-        badger,
-        startBlock,
-        endBlock,
-        nextCycle,
-        get_unclaimed_rewards(unclaimedAddresses),
-    )
+    with cycleTrace.stage("sushi_rewards"):
+        sushiRewards = calc_all_sushi_rewards(badger, startBlock, endBlock, nextCycle)
+    with cycleTrace.stage("tree_rewards"):
+        treeRewards = calc_tree_rewards(badger, startBlock, endBlock, nextCycle)
+    with cycleTrace.stage("unclaimed_rewards"):
+        unclaimedRewards = get_unclaimed_rewards(unclaimedAddresses)
+    with cycleTrace.stage("sett_rewards"):
+        settRewards = calc_sett_rewards(
+            badger, startBlock, endBlock, nextCycle, unclaimedRewards
+        )
 
-    newRewards = combine_rewards(
-        [settRewards, treeRewards, sushiRewards], nextCycle, badger.badgerTree
-    )
-    cumulativeRewards = process_cumulative_rewards(pastRewards, newRewards)
+    with cycleTrace.stage("combine_rewards"):
+        newRewards = combine_rewards(
+            [settRewards, treeRewards, sushiRewards], nextCycle, badger.badgerTree
+        )
+    with cycleTrace.stage("cumulative_rewards"):
+        cumulativeRewards = process_cumulative_rewards(pastRewards, newRewards)
 
     # Take metadata from geyserRewards
     console.print("Processing to merkle tree")
-    merkleTree = rewards_to_merkle_tree(cumulativeRewards, startBlock, endBlock, {})
+    with cycleTrace.stage("merkle_tree") as stage:
+        builder = None
+        if rewards_config.incrementalMerkle:
+            builder = IncrementalMerkleBuilder(merkle_cache_filename())
+        merkleTree = rewards_to_merkle_tree(
+            cumulativeRewards,
+            startBlock,
+            endBlock,
+            {},
+            builder=builder,
+            stream=rewards_config.streamTrees,
+        )
+        if builder:
+            builder.save()
+        stage["claims"] = len(cumulativeRewards.claims)
 
     # Publish data
     rootHash = keccak(merkleTree["merkleRoot"])
@@ -252,20 +320,57 @@ def generate_rewards_in_range(badger, startBlock, endBlock, pastRewards, saveLoc
 
     rewardsLog.save(nextCycle)
     # TODO: Upload file to AWS & serve from server
-    if saveLocalFile:
-        with open(contentFileName, "w") as outfile:
-            json.dump(merkleTree, outfile, indent=4)
-
-    # Sanity check new rewards file
-
-    verify_rewards(badger, startBlock, endBlock, pastRewards, merkleTree)
-
-    return {
+    tempFileName = None
+    with cycleTrace.stage("write_tree"):
+        if rewards_config.streamTrees:
+            # Claims are written as they are generated and read back lazily.
+            # The temp file is what gets uploaded, compact like json.dumps
+            with tempfile.NamedTemporaryFile(
+                "w", suffix=".json", delete=False
+            ) as outfile:
+                tempFileName = outfile.name
+                dump_tree(merkleTree, outfile)
+            merkleTree = LazyTree(tempFileName)
+            if saveLocalFile:
+                with open(contentFileName, "w") as outfile:
+                    # Same layout as json.dump(merkleTree, outfile, indent=4)
+                    dump_tree(merkleTree, outfile, indent=4)
+        elif saveLocalFile:
+            with open(contentFileName, "w") as outfile:
+                json.dump(merkleTree, outfile, indent=4)
+
+    rewards_data = {
         "contentFileName": contentFileName,
         "merkleTree": merkleTree,
         "rootHash": rootHash,
+        "tempFileName": tempFileName,
     }
 
+    # Sanity check new rewards file
+    try:
+        with cycleTrace.stage("verify"):
+            verify_rewards(badger, startBlock, endBlock, pastRewards, merkleTree)
+    except BaseException:
+        release_tree(rewards_data)
+        raise
+
+    return rewards_data
+
+
+def release_tree(rewards_data):
+    """
+    Close a streamed tree and delete its temp file. rewards_data keeps only
+    the tree's header (merkleRoot, cycle, ...), the claims are in
+    contentFileName when it was saved locally
+    """
+    merkleTree = rewards_data["merkleTree"]
+    if isinstance(merkleTree, LazyTree):
+        merkleTree.close()
+        rewards_data["merkleTree"] = dict(merkleTree.header)
+    if rewards_data["tempFileName"]:
+        os.remove(rewards_data["tempFileName"])
+        rewards_data["tempFileName"] = None
+
 
 def rootUpdater(badger, startBlock, endBlock, pastRewards, saveLocalFile, test=False):
     """
@@ -305,19 +410,27 @@ def rootUpdater(badger, startBlock, endBlock, pastRewards, saveLocalFile, test=F
     )
 
     console.print("===== Root Updater Complete =====")
-    if not test:
-
-        badgerTree.proposeRoot(
-            rewards_data["merkleTree"]["merkleRoot"],
-            rewards_data["rootHash"],
-            rewards_data["merkleTree"]["cycle"],
-            rewards_data["merkleTree"]["startBlock"],
-            rewards_data["merkleTree"]["endBlock"],
-            {"from": badger.root_proposer, "gas_price": gas_strategy},
-        )
-        upload(
-            rewards_data["contentFileName"], rewards_data["merkleTree"], publish=False
-        )
+    try:
+        if not test:
+
+            badgerTree.proposeRoot(
+                rewards_data["merkleTree"]["merkleRoot"],
+                rewards_data["rootHash"],
+                rewards_data["merkleTree"]["cycle"],
+                rewards_data["merkleTree"]["startBlock"],
+                rewards_data["merkleTree"]["endBlock"],
+                {
+                    "from": badger.root_proposer,
+                    "gas_price": gas_strategies.exponentialScalingFast,
+                },
+            )
+            upload(
+                rewards_data["contentFileName"],
+                rewards_data["merkleTree"],
+                publish=False,
+            )
+    finally:
+        release_tree(rewards_data)
 
     return rewards_data
 
@@ -354,16 +467,22 @@ def guardian(
 
     console.print("===== Guardian Complete =====")
 
-    if not test:
-        badgerTree.approveRoot(
-            rewards_data["merkleTree"]["merkleRoot"],
-            rewards_data["rootHash"],
-            rewards_data["merkleTree"]["cycle"],
-            rewards_data["merkleTree"]["startBlock"],
-            rewards_data["merkleTree"]["endBlock"],
-            {"from": badger.guardian, "gas_price": gas_strategy},
-        )
-        upload(rewards_data["contentFileName"], rewards_data["merkleTree"]),
+    try:
+        if not test:
+            badgerTree.approveRoot(
+                rewards_data["merkleTree"]["merkleRoot"],
+                rewards_data["rootHash"],
+                rewards_data["merkleTree"]["cycle"],
+                rewards_data["merkleTree"]["startBlock"],
+                rewards_data["merkleTree"]["endBlock"],
+                {
+                    "from": badger.guardian,
+                    "gas_price": gas_strategies.exponentialScalingFast,
+                },
+            )
+            upload(rewards_data["contentFileName"], rewards_data["merkleTree"]),
+    finally:
+        release_tree(rewards_data)
 
 
 def run_action(badger, args, test, saveLocalFile=True):
@@ -390,3 +509,7 @@ def run_action(badger, args, test, saveLocalFile=True):
 
 def content_hash_to_filename(contentHash):
     return "rewards-" + str(chain.id) + "-" + str(contentHash) + ".json"
+
+
+def merkle_cache_filename():
+    return "merkle-cache-" + str(chain.id) + ".bin"
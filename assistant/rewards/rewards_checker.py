@@ -6,6 +6,13 @@ from tabulate import tabulate
 from scripts.systems.badger_system import BadgerSystem
 from brownie import *
 from rich.console import Console
+from assistant.rewards import log
+from assistant.rewards.classes.CycleReads import cycleReads
+from assistant.rewards.classes.ClaimsDiff import (
+    ClaimsDiff,
+    claim_totals,
+    format_users,
+)
 from assistant.rewards.aws_utils import upload
 import json
 from helpers.utils import val
@@ -27,8 +34,8 @@ def sec(amount):
 
 
 def get_distributed_in_range(key, geyser, startBlock, endBlock):
-    periodEndTime = web3.eth.getBlock(endBlock)["timestamp"]
-    periodStartTime = web3.eth.getBlock(startBlock)["timestamp"]
+    periodEndTime = cycleReads.block_timestamp(endBlock)
+    periodStartTime = cycleReads.block_timestamp(startBlock)
 
     geyserMock = BadgerGeyserMock(key)
     distributionTokenss = geyser.getDistributionTokenss()
@@ -36,7 +43,7 @@ def get_distributed_in_range(key, geyser, startBlock, endBlock):
         geyserMock.add_distribution_token(token)
         unlockSchedules = geyser.getUnlockSchedulesFor(token)
         for schedule in unlockSchedules:
-            console.log("get_distributed_in_range", schedule)
+            log.debug("get_distributed_in_range {}", schedule)
             geyserMock.add_unlock_schedule(token, schedule)
 
     tokenDistributions = geyserMock.calc_token_distributions_in_range(
@@ -67,19 +74,8 @@ def getExpectedDistributionInRange(badger: BadgerSystem, startBlock, endBlock):
     return totals
 
 
-def sum_claims(claims):
-    total = 0
-    for user, claim in claims.items():
-        total += int(claim["cumulativeAmounts"][0])
-    return total
-
-
-def sum_digg_claims(claims):
-    total = 0
-    for user, claim in claims.items():
-        # print(claim["cumulativeAmounts"])
-        total += int(claim["cumulativeAmounts"][1])
-    return total
+def sum_claims(claims, token=BADGER):
+    return claim_totals(claims).get(token, 0)
 
 
 def diff_rewards(
@@ -87,36 +83,14 @@ def diff_rewards(
     before_file,
     after_file,
 ):
-    a = before_file["claims"]
-    b = after_file["claims"]
-
-    table = []
-    # Each users' cumulative claims must only increase
-    for user, claim in b.items():
-        afterClaim = int(b[user]["cumulativeAmounts"][0])
-        beforeClaim = 0
-        if user in a:
-            beforeClaim = int(a[user]["cumulativeAmounts"][0])
-        diff = afterClaim - beforeClaim
-
-        proportionGained = afterClaim / beforeClaim
-        assert proportionGained > 0.98
-        assert proportionGained < 1.25
-
-        table.append(
-            [
-                user,
-                val(beforeClaim),
-                val(afterClaim),
-                val(diff),
-                proportionGained,
-            ]
-        )
-    print(
-        tabulate(
-            table,
-            headers=["user", "a", "b", "diff", "% gained"],
-        )
+    """
+    Each users' cumulative badger claims must only increase, by less than 25%
+    """
+    diff = ClaimsDiff(before_file["claims"], after_file["claims"])
+    diff.assert_valid()
+    rows = diff.growth_outside(BADGER, 0.98, 1.25)
+    assert len(rows) == 0, "{} users' badger claims grew out of bounds: {}".format(
+        len(rows), format_users(*diff.offenders(BADGER, rows))
     )
 
 
@@ -137,69 +111,60 @@ def get_expected_total_rewards(periodEndTime):
     }
 
 
-def print_token_diff_table(name, before, after, sanity_diff, decimals=18):
-    diff = after - before
-
-    console.print("Diff for {}".format(name))
-    table = []
-    table.append(["{} before".format(name), val(before, decimals=decimals)])
-    table.append(["{} after".format(name), val(after, decimals=decimals)])
-    table.append(["{} diff".format(name), val(diff, decimals=decimals)])
-    print(tabulate(table, headers=["key", "value"]))
-
-    assert diff <= sanity_diff
-
-
 def verify_rewards(badger: BadgerSystem, startBlock, endBlock, before_data, after_data):
-    before = before_data["claims"]
-    after = after_data["claims"]
+    periodStartTime = cycleReads.block_timestamp(startBlock)
+    periodEndTime = cycleReads.block_timestamp(endBlock)
 
-    print(startBlock, endBlock)
-
-    periodStartTime = web3.eth.getBlock(int(startBlock))["timestamp"]
-    periodEndTime = web3.eth.getBlock(int(endBlock))["timestamp"]
-
-    digg_contract = get_digg_contract()
-    spf = digg_contract._initialSharesPerFragment()
+    spf = cycleReads.initial_shares_per_fragment()
 
     expected_totals = get_expected_total_rewards(periodEndTime)
 
     sanity_badger = expected_totals["badger"]
-    sanity_digg = expected_totals["digg"] * digg_contract._initialSharesPerFragment()
-    total_before_badger = int(before_data["tokenTotals"].get(BADGER, 0))
-    total_after_badger = int(after_data["tokenTotals"].get(BADGER, 0))
-    total_before_digg = int(before_data["tokenTotals"].get(DIGG, 0))
-    total_after_digg = int(after_data["tokenTotals"].get(DIGG, 0))
+    sanity_digg = expected_totals["digg"] * spf
+
+    diff = ClaimsDiff(before_data["claims"], after_data["claims"])
+    log.info(
+        "Verifying {} claims over blocks {} -> {} ({} hours)",
+        len(diff.users),
+        startBlock,
+        endBlock,
+        hours(periodEndTime - periodStartTime),
+    )
+    print_claims_table(diff, {DIGG: spf})
+
+    maxDeltas = {
+        token: 20000 * 10 ** 18
+        for name, token in TOKENS_TO_CHECK.items()
+        if name not in ["Digg", "Badger"]
+    }
+    diff.assert_valid(
+        maxTotals={BADGER: sanity_badger, DIGG: sanity_digg}, maxDeltas=maxDeltas
+    )
 
-    diff_badger = total_after_badger - total_before_badger
-    diff_digg = total_after_digg - total_before_digg
 
+def print_claims_table(diff, divisors=None):
+    """
+    Before, after and change of each checked token's total claims, divided
+    by divisors[token] when given (digg shares per fragment)
+    """
+    divisors = divisors or {}
+    before = diff.totals_before()
+    after = diff.totals_after()
     table = []
-    table.append(["block range", startBlock, endBlock])
-    table.append(["block duration", int(endBlock) - int(startBlock), "-"])
-    table.append(["duration", hours(periodEndTime - periodStartTime), "-"])
-    table.append(["badger before", val(total_before_badger), "-"])
-    table.append(["badger after", val(total_after_badger), "-"])
-    table.append(["badger diff", val(diff_badger), "-"])
-    table.append(["badger sanity ", val(sanity_badger), "-"])
-    table.append(["digg before", val(total_before_digg // spf, decimals=9), "-"])
-    table.append(["digg after", val(total_after_digg // spf, decimals=9), "-"])
-    table.append(["digg diff", val(diff_digg // spf, decimals=9), "-"])
-    table.append(["digg sanity", val(sanity_digg // spf, decimals=9), "-"])
-
-    print(tabulate(table, headers=["key", "value", "scaled"]))
-
     for name, token in TOKENS_TO_CHECK.items():
-        if name in ["Digg", "Badger"]:
+        if token not in diff.tokens:
             continue
-        total_before_token = int(before_data["tokenTotals"].get(token, 0))
-        total_after_token = int(after_data["tokenTotals"].get(token, 0))
-        print_token_diff_table(
-            name, total_before_token, total_after_token, 20000 * 1e18
+        divisor = divisors.get(token, 1)
+        decimals = 9 if token == DIGG else 18
+        table.append(
+            [
+                name,
+                val(before[token] // divisor, decimals=decimals),
+                val(after[token] // divisor, decimals=decimals),
+                val((after[token] - before[token]) // divisor, decimals=decimals),
+            ]
         )
-
-    assert total_after_digg < sanity_digg
-    assert total_after_badger < sanity_badger
+    print(tabulate(table, headers=["token", "before", "after", "diff"]))
 
 
 def compare_rewards(
@@ -215,8 +180,6 @@ def compare_rewards(
 
     print(startBlock, endBlock, beforeContentHash)
 
-    metadata = after_file["metadata"]
-
     root = badger.badgerTree.merkleRoot()
     contentHash = badger.badgerTree.merkleContentHash()
     lastUpdateTime = badger.badgerTree.lastPublishTimestamp()
@@ -226,8 +189,8 @@ def compare_rewards(
 
     assert beforeContentHash == expectedContentHash
 
-    periodStartTime = web3.eth.getBlock(startBlock)["timestamp"]
-    periodEndTime = web3.eth.getBlock(endBlock)["timestamp"]
+    periodStartTime = cycleReads.block_timestamp(startBlock)
+    periodEndTime = cycleReads.block_timestamp(endBlock)
 
     duration = periodEndTime - periodStartTime
 
@@ -236,99 +199,12 @@ def compare_rewards(
     # Expected gains must match up with the distributions from various rewards programs
     expectedGains = getExpectedDistributionInRange(badger, startBlock, endBlock)
 
-    # Total claims must only increase
-    sum_before = sum_claims(before)
-    sum_after = sum_claims(after)
-    sanitySum = Wei("5000000 ether")
-
-    sum_digg_after = sum_digg_claims(after)
-    digg_contract = interface.IDigg(DIGG)
+    # Each users' and the total claims must only increase
+    diff = ClaimsDiff(before, after)
+    print_claims_table(diff, {DIGG: cycleReads.shares_per_fragment()})
 
-    table = []
-    table.append(["block range", startBlock, endBlock])
-    table.append(["duration", periodEndTime - periodStartTime, "-"])
-    table.append(["sum before", sum_before, val(sum_before)])
-    table.append(["sum after", sum_after, val(sum_after)])
-    table.append(["digg shares after", sum_digg_after, val(sum_digg_after)])
-    table.append(
-        [
-            "digg tokens after",
-            digg_contract.sharesToFragments(sum_digg_after),
-            val(digg_contract.sharesToFragments(sum_digg_after)),
-        ]
-    )
-    table.append(
-        [
-            "From last period",
-            sum_after - sum_before,
-            val(sum_after - sum_before),
-        ]
-    )
-    table.append(
-        [
-            "Sanity Sum",
-            sanitySum,
-            "-",
-        ]
-    )
-    print(tabulate(table, headers=["key", "value", "scaled"]))
-
-    assert sum_after >= sum_before
-    assert sum_after <= sanitySum
+    diff.assert_valid(maxTotals={BADGER: Wei("5000000 ether")})
     # assert sum_after - (sum_before + expectedGains[Token.badger]) < 10000
-    table = []
-    # Each users' cumulative claims must only increase
-    for user, claim in after.items():
-        afterClaim = int(after[user]["cumulativeAmounts"][0])
-        beforeClaim = 0
-
-        if user in before:
-            beforeClaim = int(before[user]["cumulativeAmounts"][0])
-        diff = afterClaim - beforeClaim
-
-        assert afterClaim >= beforeClaim
-        assert diff >= 0
-
-        if beforeClaim == 0:
-            proportionGained = 1
-        elif diff > 0:
-            proportionGained = afterClaim / beforeClaim
-        else:
-            proportionGained = "+"
-
-        if user in metadata:
-            shareSeconds = metadata[user]["shareSeconds"]
-            # shareSecondsInRange = metadata[user]["shareSecondsInRange"]
-            # shareSecondsBefore = shareSeconds - shareSecondsInRange
-            # proportionInRange = shareSecondsInRange / shareSeconds
-        else:
-            shareSeconds = 0
-            # shareSecondsInRange = 0
-            # shareSecondsBefore = 0
-            # proportionInRange = 0
-
-        table.append(
-            [
-                user,
-                val(beforeClaim),
-                val(afterClaim),
-                val(diff),
-                proportionGained,
-            ]
-        )
-        assert afterClaim >= beforeClaim
-    # print(
-    #     tabulate(
-    #         table,
-    #         headers=[
-    #             "user",
-    #             "before gains",
-    #             "after gains",
-    #             "diff",
-    #             "% gained"
-    #         ],
-    #     )
-    # )
 
 
 def push_rewards(badger: BadgerSystem, afterContentHash):
@@ -375,8 +251,10 @@ def test_claims(badger: BadgerSystem, startBlock, endBlock, before_file, after_f
         web3.toChecksumAddress("0x264571c538137922c6e8aF4927C3D3F681399E50"),
         web3.toChecksumAddress("0x57ef012861c4937a76b5d6061be800199a2b9100"),
     ]
-    for user, claim in claims.items():
-        if not user in users:
+    for user in users:
+        # Look the few users up rather than scanning every claim
+        claim = claims.get(user)
+        if claim is None:
             continue
 
         claimed = badger.badgerTree.getClaimedFor(user, [badger.token.address])[1][0]
@@ -1,13 +1,13 @@
 from helpers.constants import NO_GEYSERS, CONVEX_SETTS
 from brownie import *
 from rich.console import Console
-from collections import Counter
+from assistant.rewards import log
 from assistant.subgraph.client import (
     fetch_sett_balances,
     fetch_geyser_events,
 )
 from assistant.rewards.classes.RewardsList import RewardsList
-from assistant.rewards.classes.UserBalance import UserBalance, UserBalances
+from assistant.rewards.classes.UserBalance import UserBalances
 from helpers.constants import NO_GEYSERS
 from functools import lru_cache
 
@@ -24,6 +24,7 @@ blacklist = [
     "0x88128580ACdD9c04Ce47AFcE196875747bF2A9f6",
     "0x7e7E112A68d8D2E221E11047a72fFC1065c38e1a",
 ]
+blacklistSet = set(blacklist)
 
 cream_addresses = {"native.badger": "0x8b950f43fcac4931d408f1fcda55c6cb6cbf3096"}
 console = Console()
@@ -33,7 +34,7 @@ def get_cumulative_claimable_for_token(claim, token):
     tokens = claim["tokens"]
     amounts = claim["cumulativeAmounts"]
 
-    console.log(tokens, amounts)
+    log.debug("{} {}", tokens, amounts)
 
     for i in range(len(tokens)):
         address = tokens[i]
@@ -183,11 +184,7 @@ def combine_balances(balances):
     return allBalances
 
 
-@lru_cache(maxsize=None)
-def calculate_sett_balances(badger, name, currentBlock):
-    console.log("Fetching {} sett balances".format(name))
-    sett = badger.getSett(name)
-    underlyingToken = sett.address
+def sett_type(name):
     settType = ["", ""]
     if "uni" in name or "sushi" in name:
         settType[0] = "halfLP"
@@ -197,31 +194,57 @@ def calculate_sett_balances(badger, name, currentBlock):
         settType[1] = "nonNative"
     else:
         settType[1] = "native"
+    return settType
+
+
+@lru_cache(maxsize=None)
+def calculate_sett_balances(badger, name, currentBlock):
+    console.log("Fetching {} sett balances".format(name))
+    sett = badger.getSett(name)
+    underlyingToken = sett.address
 
     settBalances = fetch_sett_balances(name, underlyingToken.lower(), currentBlock)
     geyserBalances = {}
-    creamBalances = {}
 
     if name not in NO_GEYSERS:
 
         geyserAddr = badger.getGeyser(name).address.lower()
         geyserEvents = fetch_geyser_events(geyserAddr, currentBlock)
         geyserBalances = calc_balances_from_geyser_events(geyserEvents)
-        settBalances[geyserAddr] = 0
 
-    balances = {}
-    for b in [settBalances, geyserBalances, creamBalances]:
-        balances = dict(Counter(balances) + Counter(b))
+    return merge_sett_balances(badger, name, settBalances, geyserBalances)
+
+
+def merge_sett_balances(badger, name, settBalances, geyserBalances):
+    """
+    Combine a sett's share balances with its geyser stakes into UserBalances.
+    Only positive, non blacklisted balances are kept, sett holders first
+    followed by stakers without shares.
+    """
+    underlyingToken = badger.getSett(name).address
+    settType = sett_type(name)
+    # Shares held by the geyser are counted through its stakers
+    geyserAddr = None
+    if name not in NO_GEYSERS:
+        geyserAddr = badger.getGeyser(name).address.lower()
+
+    balances = {
+        addr: balance
+        for addr, balance in settBalances.items()
+        if balance > 0 and addr != geyserAddr
+    }
+    for addr, balance in geyserBalances.items():
+        if addr in balances:
+            balances[addr] += balance
+        elif balance > 0:
+            balances[addr] = balance
+
     # Get rid of blacklisted and negative balances
+    addresses = []
+    amounts = []
     for addr, balance in balances.items():
-        if addr in blacklist or balance < 0:
-            del balances[addr]
-
-    # Testing for peak address
-    # balances["0x41671BA1abcbA387b9b2B752c205e22e916BE6e3".lower()] = 10000
-    userBalances = [
-        UserBalance(addr, bal, underlyingToken, settType)
-        for addr, bal in balances.items()
-    ]
-    console.log("\n")
-    return UserBalances(userBalances)
+        if balance > 0 and addr not in blacklistSet:
+            addresses.append(addr)
+            amounts.append(balance)
+
+    return UserBalances.from_columns(addresses, amounts, underlyingToken, settType)
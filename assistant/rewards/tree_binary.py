@@ -0,0 +1,159 @@
+import json
+import struct
+
+from eth_utils import to_checksum_address
+from assistant.rewards.classes.BinaryTree import (
+    BinaryTree,
+    CLAIM_KEYS,
+    INDEX_ENTRY,
+    MAGIC,
+    PREAMBLE,
+    RECORD_HEAD,
+    USER_CHECKSUM,
+    VERBATIM,
+    WORD_SIZE,
+    address_bytes,
+    decode_claim,
+)
+from assistant.rewards.classes.LazyTree import LazyTree
+from assistant.rewards.tree_stream import dump_tree, walk_tree
+
+"""
+Convert rewards trees between the json layout and the binary layout read by
+classes/BinaryTree.py
+"""
+
+
+def encode_claim(user, claim, tokenIds):
+    """
+    Pack one claim, or return None if it can't be packed losslessly
+    """
+    if claim.get("user") != user or list(claim.keys()) != CLAIM_KEYS:
+        return None
+    if user == to_checksum_address(user):
+        flags = USER_CHECKSUM
+    elif user == user.lower():
+        flags = 0
+    else:
+        return None
+
+    try:
+        index = int(claim["index"], 16)
+        cycle = int(claim["cycle"], 16)
+        amounts = [int(a) for a in claim["cumulativeAmounts"]]
+        proof = [bytes.fromhex(p[2:]) for p in claim["proof"]]
+    except ValueError:
+        return None
+    tokens = claim["tokens"]
+    if len(tokens) != len(amounts) or len(tokens) > 255 or len(proof) > 255:
+        return None
+    if index >= 2**64 or cycle >= 2**64:
+        return None
+
+    for token in tokens:
+        if token not in tokenIds:
+            tokenIds[token] = len(tokenIds)
+
+    packed = b"".join(
+        [
+            RECORD_HEAD.pack(flags, index, cycle, len(tokens)),
+            address_bytes(user),
+            struct.pack("<{}H".format(len(tokens)), *[tokenIds[t] for t in tokens]),
+            b"".join(a.to_bytes(WORD_SIZE, "big") for a in amounts),
+            struct.pack("<B", len(proof)),
+            b"".join(proof),
+        ]
+    )
+    return packed
+
+
+def round_trips(packed, claim, tokenIds):
+    try:
+        (_, decoded, _) = decode_claim(packed, 0, list(tokenIds.keys()))
+    except Exception:
+        return False
+    return json.dumps(decoded) == json.dumps(claim)
+
+
+def write_binary_tree(items, out):
+    """
+    Write (key, value) pairs of a tree to the binary file object out.
+    Claims are given one at a time as ("claims", (user, claim)), as yielded
+    by tree_stream.walk_tree.
+    """
+    out.write(PREAMBLE.pack(MAGIC, 0, 0, 0, 0, 0))
+    recordsOffset = out.tell()
+
+    header = {}
+    keys = []
+    tokenIds = {}
+    index = []
+    for key, value in items:
+        if key != "claims":
+            header[key] = value
+            keys.append(key)
+            continue
+        if key not in keys:
+            keys.append(key)
+
+        (user, claim) = value
+        packed = encode_claim(user, claim, tokenIds)
+        if packed is not None and not round_trips(packed, claim, tokenIds):
+            packed = None
+        if packed is None:
+            verbatim = json.dumps([user, claim]).encode()
+            packed = RECORD_HEAD.pack(VERBATIM, 0, 0, 0) + struct.pack(
+                "<Q", len(verbatim)
+            )
+            packed += verbatim
+
+        index.append((address_bytes(user.lower()), out.tell()))
+        out.write(packed)
+
+    index.sort()
+    indexOffset = out.tell()
+    for (address, offset) in index:
+        out.write(INDEX_ENTRY.pack(address, offset))
+
+    headerOffset = out.tell()
+    out.write(
+        json.dumps(
+            {"header": header, "keys": keys, "tokens": list(tokenIds.keys())}
+        ).encode()
+    )
+    headerSize = out.tell() - headerOffset
+
+    out.seek(0)
+    out.write(
+        PREAMBLE.pack(
+            MAGIC, recordsOffset, indexOffset, len(index), headerOffset, headerSize
+        )
+    )
+
+
+def json_to_binary(jsonPath, binaryPath):
+    with open(jsonPath, "rb") as src, open(binaryPath, "wb") as out:
+        write_binary_tree(
+            ((key, value) for key, value, _ in walk_tree(src)),
+            out,
+        )
+    return binaryPath
+
+
+def binary_to_json(binaryPath, jsonPath, indent=None):
+    tree = BinaryTree(binaryPath)
+    with open(jsonPath, "w") as out:
+        dump_tree(tree, out, indent)
+    tree.close()
+    return jsonPath
+
+
+def load_tree(path):
+    """
+    Open a rewards tree file without parsing all of it, binary or json
+    """
+    with open(path, "rb") as f:
+        magic = f.read(len(MAGIC))
+    if magic == MAGIC:
+        return BinaryTree(path)
+    return LazyTree(path)
@@ -0,0 +1,167 @@
+import json
+
+"""
+Stream rewards trees to and from disk one claim at a time, so the claims map
+never has to be held as a single document.
+
+Trees written by json.dump / json.dumps are pure ASCII (ensure_ascii), so files
+are read as latin-1: every byte is one character and parser offsets are byte
+offsets that can be seeked to directly.
+"""
+
+CHUNK_SIZE = 1 << 20
+# Single claims are small, don't pull a whole chunk in for a lookup
+LOOKUP_CHUNK_SIZE = 1 << 12
+WHITESPACE = " \t\n\r"
+
+decoder = json.JSONDecoder()
+
+
+def dumps_at(value, indent, level):
+    text = json.dumps(value, indent=indent)
+    if indent is None:
+        return text
+    # json escapes newlines inside strings, so every raw newline is layout
+    return text.replace("\n", "\n" + " " * (indent * level))
+
+
+def dump_tree(tree, fp, indent=None):
+    """
+    Write tree to fp with the same layout as json.dump(tree, fp, indent=indent).
+    tree["claims"] may be a dict or an iterable of (user, claim) pairs, which is
+    consumed and written one claim at a time.
+    """
+    if indent is None:
+        itemSep, open1, close1, open2, close2 = ", ", "", "", "", ""
+    else:
+        itemSep = ","
+        open1 = "\n" + " " * indent
+        close1 = "\n"
+        open2 = "\n" + " " * (indent * 2)
+        close2 = "\n" + " " * indent
+
+    fp.write("{")
+    for keyIdx, (key, value) in enumerate(tree.items()):
+        if keyIdx > 0:
+            fp.write(itemSep)
+        fp.write(open1 + json.dumps(key) + ": ")
+        if key != "claims":
+            fp.write(dumps_at(value, indent, 1))
+            continue
+
+        claims = value.items() if hasattr(value, "items") else value
+        fp.write("{")
+        count = 0
+        for user, claim in claims:
+            if count > 0:
+                fp.write(itemSep)
+            fp.write(open2 + json.dumps(user) + ": " + dumps_at(claim, indent, 2))
+            count += 1
+        fp.write((close2 if count > 0 else "") + "}")
+    fp.write(close1 + "}")
+
+
+class TreeReader:
+    """
+    Minimal incremental parser over a binary file object, decoding one json
+    value at a time from a sliding buffer
+    """
+
+    def __init__(self, fp, offset=0, chunkSize=None):
+        self.fp = fp
+        self.chunkSize = chunkSize or CHUNK_SIZE
+        self.buf = ""
+        self.pos = 0
+        # absolute file offset of buf[0]
+        self.base = offset
+        self.eof = False
+
+    def fill(self):
+        chunk = self.fp.read(max(self.chunkSize, len(self.buf)))
+        if not chunk:
+            self.eof = True
+        self.base += self.pos
+        self.buf = self.buf[self.pos :] + chunk.decode("latin-1")
+        self.pos = 0
+
+    def offset(self):
+        return self.base + self.pos
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos : self.pos + 1]
+            self.fill()
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(
+                "Expected {} at offset {}, found {!r}".format(
+                    char, self.offset(), found
+                )
+            )
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buf, self.pos)
+                # A number cut off at the end of the buffer still decodes
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+
+def walk_tree(fp):
+    """
+    Yield (key, value, offset) for each top level key of the tree. The claims
+    map is not decoded as a whole: it yields ("claims", (user, claim), offset)
+    per claim instead, offset pointing at the claim value.
+    """
+    reader = TreeReader(fp)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if key == "claims":
+            reader.expect("{")
+            if reader.peek() != "}":
+                while True:
+                    user = reader.value()
+                    reader.expect(":")
+                    reader.peek()
+                    offset = reader.offset()
+                    yield (key, (user, reader.value()), offset)
+                    if reader.peek() != ",":
+                        break
+                    reader.expect(",")
+            reader.expect("}")
+        else:
+            reader.peek()
+            offset = reader.offset()
+            yield (key, reader.value(), offset)
+        if reader.peek() != ",":
+            break
+        reader.expect(",")
+    reader.expect("}")
+
+
+def iter_claims(fp):
+    for key, value, _ in walk_tree(fp):
+        if key == "claims":
+            yield value
+
+
+def read_value_at(fp, offset):
+    fp.seek(offset)
+    return TreeReader(fp, offset, LOOKUP_CHUNK_SIZE).value()
@@ -1,6 +1,7 @@
 from brownie import *
 from rich.console import Console
 from statistics import mean
+from assistant.rewards.classes.CycleReads import cycleReads
 
 diggBTCOracleContract = "0xe49ca29a3ad94713fc14f065125e74906a6503bb"
 console = Console()
@@ -14,8 +15,8 @@ TARGET = 1.0
 
 
 def digg_btc_twap(start, end):
-    startTimestamp = web3.eth.getBlock(start)["timestamp"]
-    endTimestamp = web3.eth.getBlock(end)["timestamp"]
+    startTimestamp = cycleReads.block_timestamp(start)
+    endTimestamp = cycleReads.block_timestamp(end)
     diggBTCOracle = Contract.from_explorer(diggBTCOracleContract)
     latestRound = diggBTCOracle.latestRound()
     ratios = []
@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from graphql import print_ast
+from rich.console import Console
+from config.rewards_config import rewards_config
+
+console = Console()
+
+"""
+Persistent cache for subgraph queries.
+
+A query run against a fixed block always returns the same data, so responses
+are stored in a sqlite file keyed by endpoint, query text and variables and
+reused across processes (rootUpdater, guardian, re-runs).
+
+Modes (rewards_config.subgraphCacheMode):
+- "off": every query goes to the subgraph
+- "readwrite": block pinned queries are served from the cache when present,
+  every response is written to it
+- "replay": nothing goes to the subgraph, misses raise SubgraphCacheMiss.
+  Queries without a block are served too, whatever they returned when recorded
+"""
+
+CACHE_MODES = ["off", "readwrite", "replay"]
+
+# Called with "subgraphRequests" or "subgraphCacheHits" for every query
+requestCounters = []
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    block INTEGER,
+    size INTEGER NOT NULL,
+    lastUsed REAL NOT NULL,
+    response BLOB NOT NULL
+)
+"""
+
+
+class SubgraphCacheMiss(Exception):
+    pass
+
+
+def query_block(variables):
+    """
+    Block number a query is pinned to, from a Block_height variable
+    ({"number": n}), or None if it runs against the latest block
+    """
+    for value in (variables or {}).values():
+        if isinstance(value, dict) and set(value.keys()) == {"number"}:
+            return int(value["number"])
+    return None
+
+
+def cache_key(endpoint, queryText, variables):
+    keyData = json.dumps(
+        [endpoint, queryText, variables or {}], sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(keyData.encode()).hexdigest()
+
+
+class SubgraphCache:
+    def __init__(self, path, maxBytes):
+        self.path = path
+        self.maxBytes = maxBytes
+        self.lock = threading.Lock()
+        self.conn = None
+        self.totalBytes = 0
+
+    def connect(self):
+        if self.conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute(SCHEMA)
+            self.conn.commit()
+            self.totalBytes = self.conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+        return self.conn
+
+    def get(self, key):
+        with self.lock:
+            conn = self.connect()
+            row = conn.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE responses SET lastUsed = ? WHERE key = ?", (time.time(), key)
+            )
+            conn.commit()
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key, endpoint, block, response):
+        data = zlib.compress(json.dumps(response, separators=(",", ":")).encode())
+        with self.lock:
+            conn = self.connect()
+            previous = conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, block, len(data), time.time(), data),
+            )
+            self.totalBytes += len(data) - (previous[0] if previous else 0)
+            self.evict(conn)
+            conn.commit()
+
+    def evict(self, conn):
+        """
+        Drop least recently used responses until the cache fits in maxBytes
+        """
+        if self.maxBytes is None or self.totalBytes <= self.maxBytes:
+            return
+        excess = self.totalBytes - self.maxBytes
+        stale = []
+        freed = 0
+        for key, size in conn.execute(
+            "SELECT key, size FROM responses ORDER BY lastUsed"
+        ):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+        self.totalBytes -= freed
+        console.log("Evicted {} cached subgraph responses".format(len(stale)))
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+_caches = {}
+
+
+def get_subgraph_cache():
+    path = rewards_config.subgraphCachePath
+    if path not in _caches:
+        _caches[path] = SubgraphCache(path, rewards_config.subgraphCacheMaxBytes)
+    return _caches[path]
+
+
+def cached_response(endpoint, document, variables):
+    """
+    Look a query up in the cache for the current mode.
+    Returns (cached, store) where cached is the stored response or None and
+    store(result) records a fresh response, None when the cache is off.
+    """
+    mode = rewards_config.subgraphCacheMode
+    assert mode in CACHE_MODES, "Unknown subgraph cache mode {}".format(mode)
+    if mode == "off":
+        return (None, None)
+
+    cache = get_subgraph_cache()
+    key = cache_key(endpoint, print_ast(document), variables)
+    block = query_block(variables)
+
+    if mode == "replay" or block is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return (cached, None)
+        if mode == "replay":
+            raise SubgraphCacheMiss(
+                "No cached response from {} for {}".format(endpoint, variables)
+            )
+
+    return (None, lambda result: cache.put(key, endpoint, block, result))
+
+
+def add_request_counter(counter):
+    if counter not in requestCounters:
+        requestCounters.append(counter)
+
+
+def count_request(name):
+    for counter in requestCounters:
+        counter(name)
+
+
+class CachedClient:
+    """
+    Wraps a gql Client, answering execute() from the subgraph cache when it can
+    """
+
+    def __init__(self, client, endpoint):
+        self.client = client
+        self.endpoint = endpoint
+
+    def execute(self, document, variable_values=None, **kwargs):
+        (cached, store) = cached_response(self.endpoint, document, variable_values)
+        if cached is not None:
+            count_request("subgraphCacheHits")
+            return cached
+        count_request("subgraphRequests")
+        result = self.client.execute(
+            document, variable_values=variable_values, **kwargs
+        )
+        if store is not None:
+            store(result)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+class CachedSession:
+    """
+    Async counterpart of CachedClient, wrapping a gql async session
+    """
+
+    def __init__(self, session, endpoint):
+        self.session = session
+        self.endpoint = endpoint
+        # Queries that went to the subgraph
+        self.requests = 0
+
+    async def execute(self, document, variable_values=None, **kwargs):
+        # sqlite reads and writes run in threads, not blocking other shards
+        loop = asyncio.get_running_loop()
+        (cached, store) = await loop.run_in_executor(
+            None, cached_response, self.endpoint, document, variable_values
+        )
+        if cached is not None:
+            count_request("subgraphCacheHits")
+            return cached
+        self.requests += 1
+        count_request("subgraphRequests")
+        result = await self.session.execute(
+            document, variable_values=variable_values, **kwargs
+        )
+        if store is not None:
+            await loop.run_in_executor(None, store, result)
+        return result
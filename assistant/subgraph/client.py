@@ -1,5 +1,7 @@
 from assistant.subgraph.config import subgraph_config
 from assistant.subgraph.utils import make_gql_client
+from assistant.subgraph.cache import CachedClient
+from assistant.subgraph.paginator import PAGE_SIZE, Listing, collect, paginate
 from brownie import interface
 from rich.console import Console
 from gql import gql, Client
@@ -11,7 +13,6 @@ from functools import lru_cache
 getcontext().prec = 20
 console = Console()
 
-tokens_client = make_gql_client("tokens")
 sett_client = make_gql_client("setts")
 harvests_client = make_gql_client("harvests")
 
@@ -19,7 +20,34 @@ harvests_client = make_gql_client("harvests")
 
 harvest_subgraph_url = subgraph_config["harvests"]
 harvests_transport = AIOHTTPTransport(url=harvest_subgraph_url)
-harvests_client = Client(transport=harvests_transport)
+harvests_client = CachedClient(
+    Client(transport=harvests_transport), harvest_subgraph_url
+)
+
+
+def fetch_block_window(client, query, entity, startBlock, endBlock):
+    """
+    Page through every entity with startBlock < blockNumber <= endBlock, as of
+    endBlock, using the last id of each page as the cursor.
+    query takes $blockHeight and $where and must request first: PAGE_SIZE
+    """
+    lastId = ""
+    entities = []
+    while True:
+        variables = {
+            "blockHeight": {"number": int(endBlock)},
+            "where": {
+                "id_gt": lastId,
+                "blockNumber_gt": str(startBlock),
+                "blockNumber_lte": str(endBlock),
+            },
+        }
+        page = client.execute(query, variable_values=variables)[entity]
+        entities.extend(page)
+        if len(page) < PAGE_SIZE:
+            break
+        lastId = page[-1]["id"]
+    return entities
 
 
 def fetch_tree_distributions(startBlock, endBlock):
@@ -27,9 +55,9 @@ def fetch_tree_distributions(startBlock, endBlock):
         """
         query tree_distributions(
             $blockHeight: Block_height
-            $lastDistId: TreeDistribution_filter
+            $where: TreeDistribution_filter
             ) {
-            treeDistributions(block: $blockHeight, where: $lastDistId) {
+            treeDistributions(first: 1000, block: $blockHeight, where: $where, orderBy: id, orderDirection: asc) {
                 id
                 token {
                     address
@@ -41,125 +69,113 @@ def fetch_tree_distributions(startBlock, endBlock):
             }
         """
     )
-    lastDistId = "0x0000000000000000000000000000000000000000"
-    variables = {"blockHeight": {"number": endBlock}}
-    treeDistributions = []
-    while True:
-        variables["lastDistId"] = {"id_gt": lastDistId}
-        results = harvests_client.execute(query, variable_values=variables)
-        distData = results["treeDistributions"]
-        if len(distData) == 0:
-            break
-        else:
-            treeDistributions = [*treeDistributions, *distData]
-        if len(distData) > 0:
-            lastDistId = distData[-1]["id"]
-    return [td for td in treeDistributions if int(td["blockNumber"]) > int(startBlock)]
+    return fetch_block_window(
+        harvests_client, query, "treeDistributions", startBlock, endBlock
+    )
 
 
-@lru_cache(maxsize=None)
-def fetch_sett_balances(key, settId, startBlock):
-    query = gql(
-        """
-        query balances_and_events($vaultID: Vault_filter, $blockHeight: Block_height,$lastBalanceId:AccountVaultBalance_filter) {
-            vaults(block: $blockHeight, where: $vaultID) {
-                balances(first:1000,where: $lastBalanceId) {
+SETT_BALANCES_QUERY = gql(
+    """
+    query balances_and_events($vaultID: Vault_filter, $blockHeight: Block_height, $first: Int, $lastBalanceId: AccountVaultBalance_filter) {
+        vaults(block: $blockHeight, where: $vaultID) {
+            balances(first: $first, where: $lastBalanceId) {
+                id
+                account {
                     id
-                    account {
-                        id
-                    }
-                    shareBalanceRaw
-                  }
                 }
+                shareBalanceRaw
+              }
             }
-        """
+        }
+    """
+)
+
+
+def sett_balances_listing(settId, startBlock):
+    return Listing(
+        SETT_BALANCES_QUERY,
+        {"blockHeight": {"number": startBlock}, "vaultID": {"id": settId}},
+        {"lastBalanceId": ("vaults", 0, "balances")},
     )
-    lastBalanceId = ""
-    variables = {"blockHeight": {"number": startBlock}, "vaultID": {"id": settId}}
-    balances = {}
-    while True:
-        variables["lastBalanceId"] = {"id_gt": lastBalanceId}
-
-        results = sett_client.execute(query, variable_values=variables)
-        if len(results["vaults"]) == 0:
-            return {}
-        newBalances = {}
-        balance_data = results["vaults"][0]["balances"]
-        for result in balance_data:
-            account = result["id"].split("-")[0]
-            newBalances[account] = int(result["shareBalanceRaw"])
 
-        if len(balance_data) == 0:
-            break
 
-        if len(balance_data) > 0:
-            lastBalanceId = balance_data[-1]["id"]
+@lru_cache(maxsize=None)
+def fetch_sett_balances(key, settId, startBlock):
+    pages = paginate(
+        subgraph_config["setts"], sett_balances_listing(settId, startBlock)
+    )
+    balance_data = collect(pages, ("vaults", 0, "balances"))
 
-        balances = {**newBalances, **balances}
+    # Serial pagination prepended every page of PAGE_SIZE balances to the
+    # ones before it, keep that order
+    balances = {}
+    for start in reversed(range(0, len(balance_data), PAGE_SIZE)):
+        for result in balance_data[start : start + PAGE_SIZE]:
+            account = result["id"].split("-")[0]
+            balances[account] = int(result["shareBalanceRaw"])
     console.log("Processing {} balances".format(len(balances)))
     return balances
 
 
+GEYSER_EVENTS_QUERY = gql(
+    """query($geyserID: Geyser_filter, $blockHeight: Block_height, $first: Int, $lastStakedId: StakedEvent_filter, $lastUnstakedId: UnstakedEvent_filter)
+{
+  geysers(where: $geyserID,block: $blockHeight) {
+      id
+      totalStaked
+      stakeEvents(first: $first, where: $lastStakedId) {
+          id
+          user,
+          amount
+          timestamp,
+          total
+      }
+      unstakeEvents(first: $first, where: $lastUnstakedId) {
+          id
+          user,
+          amount
+          timestamp,
+          total
+      }
+  }
+}
+"""
+)
+
+
+def geyser_events_listing(geyserId, startBlock):
+    return Listing(
+        GEYSER_EVENTS_QUERY,
+        {"geyserID": {"id": geyserId}, "blockHeight": {"number": startBlock}},
+        {
+            "lastStakedId": ("geysers", 0, "stakeEvents"),
+            "lastUnstakedId": ("geysers", 0, "unstakeEvents"),
+        },
+    )
+
+
 @lru_cache(maxsize=None)
 def fetch_geyser_events(geyserId, startBlock):
     console.print(
         "[bold green] Fetching Geyser Events {}[/bold green]".format(geyserId)
     )
 
-    query = gql(
-        """query($geyserID: Geyser_filter,$blockHeight: Block_height,$lastStakedId: StakedEvent_filter,$lastUnstakedId: UnstakedEvent_filter)
-    {
-      geysers(where: $geyserID,block: $blockHeight) {
-          id
-          totalStaked
-          stakeEvents(first:1000,where: $lastStakedId) {
-              id
-              user,
-              amount
-              timestamp,
-              total
-          }
-          unstakeEvents(first:1000,where: $lastUnstakedId) {
-              id
-              user,
-              amount
-              timestamp,
-              total
-          }
-      }
-    }
-    """
+    pages = paginate(
+        subgraph_config["setts"], geyser_events_listing(geyserId, startBlock)
     )
-
-    stakes = []
-    unstakes = []
-    totalStaked = 0
-    lastStakedId = ""
-    lastUnstakedId = ""
-    variables = {"geyserID": {"id": geyserId}, "blockHeight": {"number": startBlock}}
-    while True:
-        variables["lastStakedId"] = {"id_gt": lastStakedId}
-        variables["lastUnstakedId"] = {"id_gt": lastUnstakedId}
-        result = sett_client.execute(query, variable_values=variables)
-
-        if len(result["geysers"]) == 0:
-            return {"stakes": [], "unstakes": [], "totalStaked": 0}
-        newStakes = result["geysers"][0]["stakeEvents"]
-        newUnstakes = result["geysers"][0]["unstakeEvents"]
-        if len(newStakes) == 0 and len(newUnstakes) == 0:
-            break
-        if len(newStakes) > 0:
-            lastStakedId = newStakes[-1]["id"]
-        if len(newUnstakes) > 0:
-            lastUnstakedId = newUnstakes[-1]["id"]
-
-        stakes.extend(newStakes)
-        unstakes.extend(newUnstakes)
-        totalStaked = result["geysers"][0]["unstakeEvents"]
+    geysers = collect(pages, ("geysers",))
+    if len(geysers) == 0:
+        return {"stakes": [], "unstakes": [], "totalStaked": 0}
+    stakes = collect(pages, ("geysers", 0, "stakeEvents"))
+    unstakes = collect(pages, ("geysers", 0, "unstakeEvents"))
 
     console.log("Processing {} stakes".format(len(stakes)))
     console.log("Processing {} unstakes".format(len(unstakes)))
-    return {"stakes": stakes, "unstakes": unstakes, "totalStaked": totalStaked}
+    return {
+        "stakes": stakes,
+        "unstakes": unstakes,
+        "totalStaked": geysers[0]["totalStaked"],
+    }
 
 
 @lru_cache(maxsize=None)
@@ -232,11 +248,15 @@ def fetch_sett_transfers(settID, startBlock, endBlock):
     )
 
 
-def fetch_farm_harvest_events():
+def by_block_number(events):
+    return sorted(events, key=lambda e: (int(e["blockNumber"]), e["id"]))
+
+
+def fetch_farm_harvest_events(startBlock, endBlock):
     query = gql(
         """
-        query fetch_harvest_events {
-            farmHarvestEvents(first:1000,orderBy: blockNumber,orderDirection:asc) {
+        query fetch_harvest_events($blockHeight: Block_height, $where: FarmHarvestEvent_filter) {
+            farmHarvestEvents(first: 1000, block: $blockHeight, where: $where, orderBy: id, orderDirection: asc) {
                 id
                 farmToRewards
                 blockNumber
@@ -247,18 +267,22 @@ def fetch_farm_harvest_events():
 
     """
     )
-    results = harvests_client.execute(query)
-    for event in results["farmHarvestEvents"]:
+    events = by_block_number(
+        fetch_block_window(
+            harvests_client, query, "farmHarvestEvents", startBlock, endBlock
+        )
+    )
+    for event in events:
         event["rewardAmount"] = event.pop("farmToRewards")
 
-    return results["farmHarvestEvents"]
+    return events
 
 
-def fetch_sushi_harvest_events():
+def fetch_sushi_harvest_events(startBlock, endBlock):
     query = gql(
         """
-        query fetch_harvest_events {
-            sushiHarvestEvents(first:1000,orderBy:blockNumber,orderDirection:asc) {
+        query fetch_harvest_events($blockHeight: Block_height, $where: SushiHarvestEvent_filter) {
+            sushiHarvestEvents(first: 1000, block: $blockHeight, where: $where, orderBy: id, orderDirection: asc) {
                 id
                 xSushiHarvested
                 totalxSushi
@@ -271,12 +295,16 @@ def fetch_sushi_harvest_events():
         }
     """
     )
-    results = harvests_client.execute(query)
+    events = by_block_number(
+        fetch_block_window(
+            harvests_client, query, "sushiHarvestEvents", startBlock, endBlock
+        )
+    )
     wbtcEthEvents = []
     wbtcBadgerEvents = []
     wbtcDiggEvents = []
     iBbtcWbtcEvents = []
-    for event in results["sushiHarvestEvents"]:
+    for event in events:
         event["rewardAmount"] = event.pop("toBadgerTree")
         strategy = event["id"].split("-")[0]
         if strategy == "0x7a56d65254705b4def63c68488c0182968c452ce":
@@ -298,11 +326,10 @@ def fetch_sushi_harvest_events():
 
 @lru_cache(maxsize=None)
 def fetch_wallet_balances(sharesPerFragment, blockNumber):
-    increment = 1000
     query = gql(
         """
-        query fetchWalletBalance($firstAmount: Int, $lastID: ID,$blockNumber:Block_height) {
-            tokenBalances(first: $firstAmount, where: { id_gt: $lastID  },block: $blockNumber) {
+        query fetchWalletBalance($first: Int, $where: TokenBalance_filter, $blockNumber: Block_height) {
+            tokenBalances(first: $first, where: $where, block: $blockNumber) {
                 id
                 balance
                 token {
@@ -313,71 +340,48 @@ def fetch_wallet_balances(sharesPerFragment, blockNumber):
     """
     )
 
-    ## Paginate this for more than 1000 balances
-    continueFetching = True
-    lastID = "0x0000000000000000000000000000000000000000"
-
     badger_balances = {}
     digg_balances = {}
     ibbtc_balances = {}
     console.log(sharesPerFragment)
-    while continueFetching:
-        variables = {
-            "firstAmount": increment,
-            "lastID": lastID,
-            "blockNumber": {"number": blockNumber},
-        }
-        nextPage = tokens_client.execute(query, variable_values=variables)
-        if len(nextPage["tokenBalances"]) == 0:
-            continueFetching = False
-        else:
-            lastID = nextPage["tokenBalances"][-1]["id"]
-            console.log(
-                "Fetching {} token balances".format(len(nextPage["tokenBalances"]))
-            )
-            for entry in nextPage["tokenBalances"]:
-                address = entry["id"].split("-")[0]
-                amount = float(entry["balance"])
-                if amount > 0:
-                    if entry["token"]["symbol"] == "BADGER":
-                        badger_balances[address] = amount / 1e18
-                    if entry["token"]["symbol"] == "DIGG":
-                        # Speed this up
-                        if entry["balance"] == 0:
-                            fragmentBalance = 0
-                        else:
-                            fragmentBalance = sharesPerFragment / amount
-                        digg_balances[address] = float(fragmentBalance) / 1e9
-                    if entry["token"]["symbol"] == "ibBTC":
-                        if (
-                            address
-                            == "0x18d98D452072Ac2EB7b74ce3DB723374360539f1".lower()
-                        ):
-                            # Ignore sushiswap pool
-                            ibbtc_balances[address] = 0
-                        else:
-                            ibbtc_balances[address] = amount / 1e18
+    pages = paginate(
+        subgraph_config["tokens"],
+        Listing(
+            query,
+            {"blockNumber": {"number": blockNumber}},
+            {"where": ("tokenBalances",)},
+        ),
+    )
+    entries = collect(pages, ("tokenBalances",))
+    console.log("Fetched {} token balances".format(len(entries)))
+    for entry in entries:
+        address = entry["id"].split("-")[0]
+        amount = float(entry["balance"])
+        if amount > 0:
+            if entry["token"]["symbol"] == "BADGER":
+                badger_balances[address] = amount / 1e18
+            if entry["token"]["symbol"] == "DIGG":
+                # Speed this up
+                if entry["balance"] == 0:
+                    fragmentBalance = 0
+                else:
+                    fragmentBalance = sharesPerFragment / amount
+                digg_balances[address] = float(fragmentBalance) / 1e9
+            if entry["token"]["symbol"] == "ibBTC":
+                if address == "0x18d98D452072Ac2EB7b74ce3DB723374360539f1".lower():
+                    # Ignore sushiswap pool
+                    ibbtc_balances[address] = 0
+                else:
+                    ibbtc_balances[address] = amount / 1e18
 
     return badger_balances, digg_balances, ibbtc_balances
 
 
 def fetch_cream_balances(tokenSymbol, blockNumber):
-    cream_transport = AIOHTTPTransport(url=subgraph_config["cream_url"])
-    cream_sett_client = Client(
-        transport=cream_transport, fetch_schema_from_transport=True
-    )
-    increment = 1000
-
     query = gql(
         """
-        query fetchCreambBadgerDeposits($firstAmount: Int, $lastID: ID, $symbol: String,$blockNumber: Block_height) {
-            accountCTokens(first: $firstAmount,block:$blockNumber
-                where: {
-                    id_gt: $lastID
-                    symbol: $symbol
-                    enteredMarket: true
-                }
-            ) {
+        query fetchCreambBadgerDeposits($first: Int, $where: AccountCToken_filter, $symbol: String, $blockNumber: Block_height) {
+            accountCTokens(first: $first, block: $blockNumber, where: $where) {
                 id
                 totalUnderlyingBorrowed
                 totalUnderlyingSupplied
@@ -395,28 +399,24 @@ def fetch_cream_balances(tokenSymbol, blockNumber):
     """
     )
 
-    ## Paginate this for more than 1000 balances
-    results = []
-    continueFetching = True
-    lastID = "0x0000000000000000000000000000000000000000"
-
-    while continueFetching:
-        variables = {
-            "firstAmount": increment,
-            "lastID": lastID,
-            "symbol": tokenSymbol,
-            "blockNumber": {"number": blockNumber},
-        }
-        nextPage = cream_sett_client.execute(query, variable_values=variables)
-        if len(nextPage["accountCTokens"]) == 0:
-            if len(nextPage["markets"]) == 0:
-                console.log("No Cream deposits found for {}".format(tokenSymbol))
-                return {}
-            exchangeRate = nextPage["markets"][0]["exchangeRate"]
-            continueFetching = False
-        else:
-            lastID = nextPage["accountCTokens"][-1]["id"]
-            results += nextPage["accountCTokens"]
+    pages = paginate(
+        subgraph_config["cream_url"],
+        Listing(
+            query,
+            {
+                "symbol": tokenSymbol,
+                "blockNumber": {"number": blockNumber},
+                "where": {"symbol": tokenSymbol, "enteredMarket": True},
+            },
+            {"where": ("accountCTokens",)},
+        ),
+    )
+    markets = collect(pages[:1], ("markets",))
+    if len(markets) == 0:
+        console.log("No Cream deposits found for {}".format(tokenSymbol))
+        return {}
+    exchangeRate = markets[0]["exchangeRate"]
+    results = collect(pages, ("accountCTokens",))
 
     retVal = {}
     console.log("Queried {} cream balances\n".format(len(results)))
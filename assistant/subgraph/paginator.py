@@ -0,0 +1,225 @@
+import asyncio
+import random
+from contextlib import asynccontextmanager
+
+from aiohttp import ClientError
+from gql import Client
+from gql.transport.aiohttp import AIOHTTPTransport
+from gql.transport.exceptions import (
+    TransportProtocolError,
+    TransportQueryError,
+    TransportServerError,
+)
+from rich.console import Console
+from assistant.subgraph.cache import CachedSession
+from config.rewards_config import rewards_config
+
+console = Console()
+
+"""
+Sharded, concurrent pagination of subgraph queries.
+
+Walking a large entity set with a single id_gt cursor takes one round trip
+per page, one after another. Here the id space is split into shards by the
+leading hex digits of the ids ("0x00" - "0x0f", "0x10" - "0x1f", ...) and
+every shard is paged with its own cursor at the same time over one aiohttp
+session. Pages come back in id order (shard by shard, page by page), the
+same entities a serial walk returns.
+
+Failed requests are retried with exponential backoff. Server errors and
+timeouts also halve the page size of that shard, which grows back once
+requests succeed again.
+"""
+
+# Largest page the subgraph serves
+PAGE_SIZE = 1000
+MIN_PAGE_SIZE = 100
+# Shards split the range of the first two hex digits of an id
+SHARD_PREFIXES = 16**2
+
+RETRYABLE_ERRORS = (
+    TransportServerError,
+    TransportProtocolError,
+    TransportQueryError,
+    ClientError,
+    asyncio.TimeoutError,
+)
+# Query errors worth another try, anything else is a bad query
+RETRYABLE_MESSAGES = ["timeout", "timed out", "rate limit", "bad indexers"]
+
+
+class Listing:
+    """
+    A paginated query.
+    query takes $first and one filter variable per list it pages through,
+    cursors maps each of those variables to the path of its list in the
+    response, e.g. {"lastBalanceId": ("vaults", 0, "balances")}.
+    variables holds everything else, including filters to combine with the
+    cursor.
+    """
+
+    def __init__(self, query, variables, cursors):
+        self.query = query
+        self.variables = variables
+        self.cursors = cursors
+
+    def page_variables(self, cursors, upper, first):
+        variables = {**self.variables, "first": first}
+        for name, cursor in cursors.items():
+            where = {**self.variables.get(name, {}), "id_gt": cursor}
+            if upper is not None:
+                where["id_lt"] = upper
+            variables[name] = where
+        return variables
+
+
+def id_shards(numShards):
+    """
+    (lower, upper) id bounds splitting the id space into numShards ranges,
+    the first open below and the last open above
+    """
+    numShards = max(1, min(int(numShards), SHARD_PREFIXES))
+    bounds = [
+        "0x{:02x}".format(SHARD_PREFIXES * i // numShards) for i in range(numShards)
+    ]
+    lowers = [""] + bounds[1:]
+    uppers = bounds[1:] + [None]
+    return list(zip(lowers, uppers))
+
+
+def entities_at(result, path):
+    entities = result
+    for key in path:
+        try:
+            entities = entities[key]
+        except (IndexError, KeyError):
+            return []
+    return entities
+
+
+def collect(pages, path):
+    """
+    Entities of one list across pages, in order
+    """
+    entities = []
+    for page in pages:
+        entities.extend(entities_at(page, path))
+    return entities
+
+
+def status_code(error):
+    return getattr(error, "code", None) or getattr(error.__cause__, "status", None)
+
+
+def is_rate_limited(error):
+    message = str(error).lower()
+    return (
+        status_code(error) == 429
+        or "too many requests" in message
+        or "rate limit" in message
+    )
+
+
+def is_retryable(error):
+    if isinstance(error, TransportQueryError):
+        message = str(error).lower()
+        return any(m in message for m in RETRYABLE_MESSAGES)
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+def backoff_delay(attempt):
+    delay = rewards_config.subgraphBackoff * 2 ** (attempt - 1)
+    return delay * (1 + random.random())
+
+
+async def fetch_shard(session, semaphore, listing, lower, upper):
+    """
+    Every page of listing with lower < id < upper
+    """
+    cursors = {name: lower for name in listing.cursors}
+    exhausted = set()
+    pageSize = PAGE_SIZE
+    pages = []
+    while len(exhausted) < len(listing.cursors):
+        attempt = 0
+        while True:
+            variables = listing.page_variables(cursors, upper, pageSize)
+            try:
+                async with semaphore:
+                    result = await session.execute(
+                        listing.query, variable_values=variables
+                    )
+                break
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                if not is_retryable(e) or attempt > rewards_config.subgraphRetries:
+                    raise
+                if not is_rate_limited(e):
+                    pageSize = max(MIN_PAGE_SIZE, pageSize // 2)
+                delay = backoff_delay(attempt)
+                console.log(
+                    "Subgraph request failed ({}), retrying in {:.1f}s".format(e, delay)
+                )
+                await asyncio.sleep(delay)
+
+        pages.append(result)
+        for name, path in listing.cursors.items():
+            entities = entities_at(result, path)
+            if len(entities) > 0:
+                cursors[name] = entities[-1]["id"]
+            if len(entities) < pageSize:
+                exhausted.add(name)
+        pageSize = min(PAGE_SIZE, pageSize * 2)
+    return pages
+
+
+async def fetch_pages(session, listings, numShards):
+    """
+    Pages of each listing, in id order
+    """
+    semaphore = asyncio.Semaphore(rewards_config.subgraphConcurrency)
+    shards = id_shards(numShards)
+    shardPages = await asyncio.gather(
+        *[
+            fetch_shard(session, semaphore, listing, lower, upper)
+            for listing in listings
+            for (lower, upper) in shards
+        ]
+    )
+    pages = []
+    for i in range(len(listings)):
+        listingPages = []
+        for shard in shardPages[i * len(shards) : (i + 1) * len(shards)]:
+            listingPages.extend(shard)
+        pages.append(listingPages)
+    return pages
+
+
+@asynccontextmanager
+async def open_session(endpoint):
+    transport = AIOHTTPTransport(url=endpoint)
+    async with Client(transport=transport) as session:
+        yield CachedSession(session, endpoint)
+
+
+async def paginate_async(endpoint, listings, numShards):
+    async with open_session(endpoint) as session:
+        pages = await fetch_pages(session, listings, numShards)
+    if session.requests > 0:
+        console.log(
+            "Fetched {} subgraph pages from {}".format(session.requests, endpoint)
+        )
+    return pages
+
+
+def paginate_all(endpoint, listings, numShards=None):
+    """
+    Pages of each listing, fetching the shards of every listing concurrently
+    """
+    if numShards is None:
+        numShards = rewards_config.subgraphShards
+    return asyncio.run(paginate_async(endpoint, listings, numShards))
+
+
+def paginate(endpoint, listing, numShards=None):
+    return paginate_all(endpoint, [listing], numShards)[0]
@@ -0,0 +1,46 @@
+from rich.console import Console
+from assistant.subgraph.client import geyser_events_listing, sett_balances_listing
+from assistant.subgraph.config import subgraph_config
+from assistant.subgraph.paginator import paginate_all
+from config.rewards_config import rewards_config
+from helpers.constants import NO_GEYSERS
+
+console = Console()
+
+"""
+Concurrent prefetch of the sett balance and geyser event queries.
+
+calculate_sett_balances fetches one sett after another. This pages through
+the same listings for every sett at once over a single aiohttp session and
+stores each page in the subgraph cache, so the per-sett calculations
+afterwards only read from disk.
+"""
+
+
+def prefetch_sett_balances(badger, block, skip=[]):
+    """
+    Warm the subgraph cache with every balance and geyser event page
+    calculate_sett_balances will request for the setts at block
+    """
+    if rewards_config.subgraphCacheMode != "readwrite":
+        return
+
+    listings = []
+    for name, sett in badger.sett_system.vaults.items():
+        if name in skip:
+            continue
+        listings.append(sett_balances_listing(sett.address.lower(), block))
+        if name not in NO_GEYSERS:
+            geyserId = badger.getGeyser(name).address.lower()
+            listings.append(geyser_events_listing(geyserId, block))
+
+    console.log(
+        "Prefetching {} sett balance and geyser queries at {}".format(
+            len(listings), block
+        )
+    )
+    try:
+        paginate_all(subgraph_config["setts"], listings)
+    except Exception as e:
+        # Anything missing is fetched again when the balances are calculated
+        console.log("Subgraph prefetch failed: {}".format(e))
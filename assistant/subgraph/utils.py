@@ -1,4 +1,5 @@
 from assistant.subgraph.config import subgraph_config
+from assistant.subgraph.cache import CachedClient
 from gql import Client
 from gql.transport.aiohttp import AIOHTTPTransport
 
@@ -6,4 +7,5 @@ from gql.transport.aiohttp import AIOHTTPTransport
 def make_gql_client(name):
     subgraph_url = subgraph_config[name]
     transport = AIOHTTPTransport(url=subgraph_url)
-    return Client(transport=transport, fetch_schema_from_transport=True)
+    client = Client(transport=transport, fetch_schema_from_transport=True)
+    return CachedClient(client, subgraph_url)
@@ -7,6 +7,74 @@ class RewardsConfig:
         self.rootUpdateMinInterval = hours(0.9)
         self.maxStartBlockAge = 3200
         self.debug = False
+        # Contract reads prefetched at the start of a cycle are batched into
+        # Multicall calls of this size
+        self.multicallBatchSize = 50
+        # "debug" logs every user, event and schedule processed, "info" only
+        # per sett summaries (see assistant/rewards/log.py)
+        self.logLevel = "info"
+        # Process pool used to encode and hash merkle leaves, 1 forces the serial path
+        self.merkleEncodingWorkers = 4
+        self.merkleEncodingBatchSize = 5000
+        # Reuse encoded leaves and layer hashes from the previous tree build,
+        # cached on disk between runs
+        self.incrementalMerkle = False
+        # Write / read rewards trees one claim at a time instead of whole documents
+        self.streamTrees = False
+        # Split rewards with integer math so each distribution sums exactly
+        self.exactDistribution = True
+        # Persistent cache of subgraph responses, "off", "readwrite" or "replay".
+        # Off for live cycles, fixture bundles turn it on to record and replay
+        self.subgraphCacheMode = "off"
+        self.subgraphCachePath = "subgraph-cache.sqlite"
+        self.subgraphCacheMaxBytes = 2 * 1024**3
+        # Paginated subgraph queries are split into this many id ranges, fetched
+        # with at most subgraphConcurrency requests in flight
+        self.subgraphShards = 16
+        self.subgraphConcurrency = 8
+        # Failed subgraph requests are retried after subgraphBackoff seconds,
+        # doubling on every attempt
+        self.subgraphRetries = 5
+        self.subgraphBackoff = 1
+        # Rebuild balances at each harvest block from one snapshot plus
+        # transfer / stake logs, fetched this many blocks per request
+        self.balanceIndex = True
+        self.balanceIndexLogRange = 2000
+        # Record external responses to, or replay them from, a fixture bundle:
+        # "off", "record" or "replay" (see assistant/fixtures/bundle.py)
+        self.fixtureMode = "off"
+        self.fixturePath = "fixtures/cycle"
+        # Trees are published as plain JSON. "gzip" compresses them
+        # (Content-Encoding: gzip), only for readers known to decode it
+        self.publishEncoding = None
+        # Uploads over s3MultipartChunkSize are sent in parts of that size,
+        # s3MaxConcurrency at a time per target
+        self.s3MultipartChunkSize = 8 * 1024**2
+        self.s3MaxConcurrency = 10
+        self.s3MaxPoolConnections = 32
+        # Past tree versions are kept compressed here, keyed by s3 VersionId,
+        # and downloaded treeDownloadWorkers at a time
+        self.treeCachePath = "tree-cache"
+        self.treeDownloadWorkers = 8
+        # Badger api requests share a keep-alive pool of badgerApiConcurrency
+        # connections, time out after badgerApiTimeout seconds and are retried
+        # with backoff. Account lookups use badgerApiBulkAccountsPath, when
+        # set, for badgerApiBulkSize addresses per request.
+        self.badgerApiConcurrency = 32
+        self.badgerApiTimeout = 10
+        self.badgerApiRetries = 5
+        self.badgerApiBackoff = 0.5
+        self.badgerApiBulkAccountsPath = None
+        self.badgerApiBulkSize = 100
+        # Token prices are fetched on first use and kept for priceTtl seconds,
+        # or read from the priceSnapshot file for reproducible runs
+        self.priceTtl = 300
+        self.priceSnapshot = None
+        # Upload a trace of stage timings, subgraph / RPC call counts and peak
+        # memory with each cycle's analytics log, and optionally profile the
+        # whole cycle with "cprofile" or "pyinstrument"
+        self.cycleTrace = True
+        self.cycleProfiler = None
 
 
 rewards_config = RewardsConfig()
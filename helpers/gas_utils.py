@@ -7,9 +7,12 @@ from brownie.network.gas.strategies import (
 from brownie.network import gas_price
 from brownie import Wei
 from helpers.network import network_manager
-from scripts.view.gas_intelligence import analyze_gas
+from helpers.ttl_cache import TTLCache
+from rich.console import Console
 from web3 import Web3
 
+console = Console()
+
 exponential_scaling_config = {
     "initial_gas_price": "100 gwei",
     "max_gas_price": "1000 gwei",
@@ -17,6 +20,9 @@ exponential_scaling_config = {
 
 bsc_static_price = Wei("10 gwei")
 
+# Seconds a fetched gas price is used for
+GAS_PRICE_TTL = 60
+
 
 class StaticGasStrategy(SimpleGasStrategy):
     def __init__(self, price) -> None:
@@ -28,31 +34,78 @@ class StaticGasStrategy(SimpleGasStrategy):
 
 
 class GasStrategies:
+    """
+    Gas price strategies, created on first use: nothing is fetched from
+    GasNow or Elasticsearch until a price is needed. Fetched prices are kept
+    for GAS_PRICE_TTL seconds. pin() replaces the GasNow and exponential
+    scaling strategies with a static one at the pinned price.
+    """
+
     def __init__(self):
-        self.standard = GasNowStrategy("standard")
-        self.fast = GasNowStrategy("fast")
-        self.rapid = GasNowStrategy("rapid")
+        self.cache = TTLCache()
         self.bsc_static = StaticGasStrategy(bsc_static_price)
-        self.analyzed = analyze_gas({"timeframe": "minutes", "periods": 15})
 
-        print(
-            "gas prices - fast:",
-            self.fast.get_gas_price(),
-            "recent average:",
-            self.analyzed.mode,
-        )
+    def pin(self, price):
+        self.cache.pin("price", Wei(price))
 
-        self.exponentialScaling = ExponentialScalingStrategy(
-            initial_gas_price=self.standard.get_gas_price(),
-            max_gas_price=Wei(exponential_scaling_config["max_gas_price"]),
-            time_duration=120,
-        )
+    def unpin(self):
+        self.cache.unpin("price")
 
-        self.exponentialScalingFast = ExponentialScalingStrategy(
-            initial_gas_price=self.fast.get_gas_price(),
-            max_gas_price=Wei(exponential_scaling_config["max_gas_price"]),
-            time_duration=60,
-        )
+    def pinned_price(self):
+        return self.cache.pinned.get("price")
+
+    def gas_now(self, speed):
+        if self.pinned_price() is not None:
+            return StaticGasStrategy(self.pinned_price())
+        return self.cache.get(speed, lambda: GasNowStrategy(speed))
+
+    @property
+    def standard(self):
+        return self.gas_now("standard")
+
+    @property
+    def fast(self):
+        return self.gas_now("fast")
+
+    @property
+    def rapid(self):
+        return self.gas_now("rapid")
+
+    @property
+    def analyzed(self):
+        def fetch():
+            # Elasticsearch is only imported when gas history is needed
+            from scripts.view.gas_intelligence import analyze_gas
+
+            analyzed = analyze_gas({"timeframe": "minutes", "periods": 15})
+            console.log(
+                "gas prices - fast: {} recent average: {}".format(
+                    self.fast.get_gas_price(), analyzed.mode
+                )
+            )
+            return analyzed
+
+        return self.cache.get("analyzed", fetch, GAS_PRICE_TTL)
+
+    def exponential_scaling(self, speed, time_duration):
+        def fetch():
+            return ExponentialScalingStrategy(
+                initial_gas_price=self.gas_now(speed).get_gas_price(),
+                max_gas_price=Wei(exponential_scaling_config["max_gas_price"]),
+                time_duration=time_duration,
+            )
+
+        if self.pinned_price() is not None:
+            return StaticGasStrategy(self.pinned_price())
+        return self.cache.get(("exponentialScaling", speed), fetch, GAS_PRICE_TTL)
+
+    @property
+    def exponentialScaling(self):
+        return self.exponential_scaling("standard", 120)
+
+    @property
+    def exponentialScalingFast(self):
+        return self.exponential_scaling("fast", 60)
 
     def set_default(self, strategy):
         gas_price(strategy)
@@ -73,6 +126,8 @@ class GasStrategies:
             self.set_default(self.bsc_static)
 
     def optimal_price(self):
+        if self.pinned_price() is not None:
+            return self.pinned_price()
         return min(self.fast.get_gas_price(), self.analyzed.mode)
 
 
@@ -0,0 +1,38 @@
+import threading
+import time
+
+
+class TTLCache:
+    """
+    Values fetched on first use and kept for ttl seconds (forever when ttl is
+    None). A pinned value is returned as is and never refetched. fetch may
+    read other keys of the same cache.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.values = {}
+        self.pinned = {}
+
+    def get(self, key, fetch, ttl=None):
+        with self.lock:
+            if key in self.pinned:
+                return self.pinned[key]
+            now = time.monotonic()
+            entry = self.values.get(key)
+            if entry is None or (ttl is not None and now - entry[0] >= ttl):
+                entry = (now, fetch())
+                self.values[key] = entry
+            return entry[1]
+
+    def pin(self, key, value):
+        with self.lock:
+            self.pinned[key] = value
+
+    def unpin(self, key):
+        with self.lock:
+            self.pinned.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.values = {}
@@ -0,0 +1,50 @@
+import time
+
+from assistant.rewards.boost_engine import calc_boosts
+from rich.console import Console
+from tabulate import tabulate
+from scripts.benchmarks.boost_reference import legacy_calc_boosts, synthetic_parts
+
+console = Console()
+
+"""
+Time the array based boost against the UserBalances one it replaced.
+
+brownie run scripts/benchmarks/boost.py main 100000
+"""
+
+
+def bench(numAddresses):
+    parts = synthetic_parts(numAddresses)
+
+    start = time.perf_counter()
+    result = calc_boosts(*parts)
+    arrayTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy = legacy_calc_boosts(*parts)
+    legacyTime = time.perf_counter() - start
+
+    assert result == legacy
+
+    return [
+        numAddresses,
+        len(result[0]),
+        "{:.2f}s".format(legacyTime),
+        "{:.2f}s".format(arrayTime),
+        "{:.1f}x".format(legacyTime / arrayTime),
+    ]
+
+
+def main(*sizes):
+    sizes = [int(s) for s in sizes] or [100000]
+    table = []
+    for size in sizes:
+        console.log("Benchmarking boost for {} addresses".format(size))
+        table.append(bench(size))
+    print(
+        tabulate(
+            table,
+            headers=["addresses", "boosted", "UserBalances", "arrays", "speedup"],
+        )
+    )
@@ -0,0 +1,111 @@
+import random
+from collections import OrderedDict
+
+from assistant.rewards.classes.UserBalance import UserBalance, UserBalances
+from helpers.constants import MAX_BOOST
+
+"""
+Reference badger boost, computed with UserBalances the way it was before the
+array engine, and synthetic sett balances to compare the two on.
+"""
+
+NUM_DIGG_SETTS = 3
+NUM_BADGER_SETTS = 3
+NUM_NON_NATIVE_SETTS = 12
+
+
+def legacy_calc_boosts(diggParts, badgerParts, nonNativeParts):
+    """
+    badger_boost as it was before the array engine, starting from the same
+    (addresses, usdBalances) parts
+    """
+
+    def to_user_balances(parts):
+        merged = UserBalances()
+        for addresses, balances in parts:
+            merged = merged + UserBalances(
+                [
+                    UserBalance(addr, float(bal), "")
+                    for addr, bal in zip(addresses, balances)
+                ]
+            )
+        return merged
+
+    def filter_dust(balances):
+        return UserBalances(list(filter(lambda user: user.balance > 1, balances)))
+
+    def calc_stake_ratio(address, diggSetts, badgerSetts, nonNativeSetts):
+        diggBalance = getattr(diggSetts[address], "balance", 0)
+        badgerBalance = getattr(badgerSetts[address], "balance", 0)
+        nonNativeBalance = getattr(nonNativeSetts[address], "balance", 0)
+        if nonNativeBalance == 0:
+            return 0
+        return (diggBalance + badgerBalance) / nonNativeBalance
+
+    diggSetts = filter_dust(to_user_balances(diggParts))
+    badgerSetts = filter_dust(to_user_balances(badgerParts))
+    nonNativeSetts = to_user_balances(nonNativeParts)
+    allAddresses = set.union(
+        {user.address for user in diggSetts},
+        {user.address for user in badgerSetts},
+        {user.address for user in nonNativeSetts},
+    )
+    nonNativeSetts = filter_dust(nonNativeSetts)
+
+    stakeRatios = {
+        addr: calc_stake_ratio(addr, diggSetts, badgerSetts, nonNativeSetts)
+        for addr in allAddresses
+    }
+    stakeRatios = OrderedDict(
+        sorted(stakeRatios.items(), key=lambda t: t[1], reverse=True)
+    )
+
+    boostInfo = {}
+    for addr in allAddresses:
+        boostInfo[addr.lower()] = {
+            "nativeBalance": 0,
+            "nonNativeBalance": 0,
+            "stakeRatio": 0,
+        }
+    for user in badgerSetts:
+        boostInfo[user.address.lower()]["nativeBalance"] += user.balance
+    for user in diggSetts:
+        boostInfo[user.address.lower()]["nativeBalance"] += user.balance
+    for user in nonNativeSetts:
+        boostInfo[user.address.lower()]["nonNativeBalance"] += user.balance
+    for addr, ratio in stakeRatios.items():
+        boostInfo[addr.lower()]["stakeRatio"] = ratio
+
+    sortedNonNative = UserBalances(
+        sorted(
+            nonNativeSetts.userBalances.values(),
+            key=lambda u: stakeRatios[u.address],
+            reverse=True,
+        )
+    )
+    nonNativeTotal = sortedNonNative.total_balance()
+    badgerBoost = {}
+    cumulative = 0
+    for user in sortedNonNative:
+        cumulative += user.balance / nonNativeTotal
+        boost = MAX_BOOST - (cumulative * (MAX_BOOST - 1))
+        if boost < 1 or stakeRatios[user.address] == 0:
+            boost = 1
+        badgerBoost[user.address] = boost
+
+    return (badgerBoost, boostInfo)
+
+
+def synthetic_parts(numAddresses, seed=0):
+    rng = random.Random(seed)
+    addresses = ["0x{:040x}".format(rng.getrandbits(160)) for _ in range(numAddresses)]
+
+    def sett(holders):
+        members = rng.sample(addresses, holders)
+        # Log-uniform USD balances, some of them dust
+        return (members, [10 ** rng.uniform(-1, 6) for _ in members])
+
+    diggParts = [sett(numAddresses // 20) for _ in range(NUM_DIGG_SETTS)]
+    badgerParts = [sett(numAddresses // 5) for _ in range(NUM_BADGER_SETTS)]
+    nonNativeParts = [sett(numAddresses // 8) for _ in range(NUM_NON_NATIVE_SETTS)]
+    return (diggParts, badgerParts, nonNativeParts)
@@ -0,0 +1,77 @@
+import random
+import time
+
+from brownie import web3
+from assistant.rewards.classes.MerkleTree import MerkleTree
+from assistant.rewards.classes.RewardsList import RewardsList
+from helpers.constants import BADGER, DIGG
+from rich.console import Console
+from tabulate import tabulate
+
+console = Console()
+
+"""
+Time merkle proof generation for synthetic claimant sets.
+
+brownie run scripts/benchmarks/merkle_proofs.py main 10000 100000 500000
+"""
+
+# Per-claimant get_proof is quadratic, only time it on a sample and extrapolate
+LEGACY_SAMPLE = 200
+
+
+def random_address(rng):
+    return "0x{:040x}".format(rng.getrandbits(160))
+
+
+def synthetic_rewards(numClaimants, cycle=1, seed=0):
+    rng = random.Random(seed)
+    rewards = RewardsList(cycle, None)
+    for _ in range(numClaimants):
+        user = random_address(rng)
+        rewards.increase_user_rewards(user, BADGER, rng.getrandbits(80))
+        if rng.random() < 0.3:
+            rewards.increase_user_rewards(user, DIGG, rng.getrandbits(60))
+    return rewards
+
+
+def bench(numClaimants):
+    rewards = synthetic_rewards(numClaimants)
+    (nodes, encodedNodes, entries) = rewards.to_merkle_format()
+
+    start = time.perf_counter()
+    tree = MerkleTree(encodedNodes)
+    buildTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    proofs = tree.get_all_proofs()
+    proofsTime = time.perf_counter() - start
+
+    sample = random.Random(1).sample(range(len(encodedNodes)), LEGACY_SAMPLE)
+    start = time.perf_counter()
+    for idx in sample:
+        # The old lookup: re-hash the node and scan the sorted leaves
+        position = tree.elements.index(web3.keccak(hexstr=encodedNodes[idx]))
+        assert tree.get_proof_at(position) == proofs[idx]
+    legacyTime = (time.perf_counter() - start) / LEGACY_SAMPLE * len(encodedNodes)
+
+    return [
+        numClaimants,
+        "{:.2f}s".format(buildTime),
+        "{:.2f}s".format(proofsTime),
+        "~{:.0f}s".format(legacyTime),
+    ]
+
+
+def main(*sizes):
+    sizes = [int(s) for s in sizes] or [10000, 100000, 500000]
+    table = []
+    for size in sizes:
+        console.log("Benchmarking merkle proofs for {} claimants".format(size))
+        table.append(bench(size))
+    print(
+        tabulate(
+            table,
+            headers=["claimants", "tree build", "all proofs", "per-claim get_proof"],
+        )
+    )
@@ -0,0 +1,334 @@
+import json
+import random
+import subprocess
+import time
+
+import numpy as np
+from brownie import web3
+from assistant.rewards.boost_engine import calc_boosts
+from assistant.rewards.calc_snapshot import distribute_schedules
+from assistant.rewards.classes.ClaimsDiff import ClaimsDiff
+from assistant.rewards.classes.MerkleTree import rewards_to_merkle_tree
+from assistant.rewards.classes.RewardsList import RewardsList
+from assistant.rewards.classes.Schedule import Schedule
+from assistant.rewards.meta_rewards.tree_rewards import distribute_tree_rewards
+from assistant.rewards.rewards_utils import (
+    calc_balances_from_geyser_events,
+    combine_rewards,
+    merge_sett_balances,
+    process_cumulative_rewards,
+)
+from helpers.constants import (
+    BADGER,
+    BADGER_SETTS,
+    DIGG_SETTS,
+    FARM,
+    NO_GEYSERS,
+    NON_NATIVE_SETTS,
+)
+from helpers.time_utils import days
+from rich.console import Console
+from tabulate import tabulate
+
+console = Console()
+
+"""
+Time each stage of a rewards cycle on synthetic populations.
+
+Every population is "users:setts". Sett balances, geyser events, unlock
+schedules, tree distributions and the previous cycle's tree are generated
+up front, then each stage of generate_rewards_in_range runs on them with
+the chain and subgraph reads left out.
+
+Results are appended as one JSON line per run to RESULTS_FILE.
+
+brownie run scripts/benchmarks/rewards_cycle.py main 1000:10 100000:30 1000000:50
+"""
+
+RESULTS_FILE = "rewards-cycle-benchmark.jsonl"
+DEFAULT_POPULATIONS = ["1000:10", "10000:20", "100000:30"]
+STAGES = [
+    "balances",
+    "boost",
+    "calc_snapshot",
+    "tree_rewards",
+    "combine_rewards",
+    "process_cumulative_rewards",
+    "rewards_to_merkle_tree",
+    "verification",
+]
+
+(START_BLOCK, END_BLOCK) = (13000000, 13000300)
+END_TIME = 1630000000
+CYCLE_DURATION = 3600
+# Share of a sett's holders staked in its geyser
+STAKED_SHARE = 0.3
+NUM_TREE_DISTRIBUTIONS = 2
+
+
+class Contract:
+    def __init__(self, address):
+        self.address = address
+
+
+class SyntheticBadger:
+    """
+    The parts of BadgerSystem the stages read, for synthetic setts
+    """
+
+    def __init__(self, names, rng):
+        self.badgerTree = None
+        self.setts = {name: Contract(random_address(rng)) for name in names}
+        self.geysers = {name: Contract(random_address(rng)) for name in names}
+        self.strategies = {random_address(rng): name for name in names}
+
+    def getSett(self, name):
+        return self.setts[name]
+
+    def getGeyser(self, name):
+        return self.geysers[name]
+
+    def getSettFromStrategy(self, strategy):
+        return self.strategies[strategy]
+
+
+def random_address(rng):
+    return "0x{:040x}".format(rng.getrandbits(160))
+
+
+def sett_names(numSetts):
+    names = BADGER_SETTS + DIGG_SETTS[:2] + NON_NATIVE_SETTS
+    names += ["synthetic.crv{}".format(i) for i in range(max(0, numSetts - len(names)))]
+    return names[:numSetts]
+
+
+def synthetic_cycle(numUsers, numSetts, seed=0):
+    """
+    Inputs of one rewards cycle for numUsers users spread across numSetts setts
+    """
+    rng = random.Random(seed)
+    users = [random_address(rng) for _ in range(numUsers)]
+    names = sett_names(numSetts)
+    badger = SyntheticBadger(names, rng)
+    holdersPerSett = min(numUsers, max(100, numUsers * 2 // numSetts))
+
+    settBalances = {}
+    geyserEvents = {}
+    for name in names:
+        holders = rng.sample(users, holdersPerSett)
+        settBalances[name] = {u: rng.getrandbits(72) for u in holders}
+        stakes = []
+        if name not in NO_GEYSERS:
+            for u in rng.sample(holders, int(len(holders) * STAKED_SHARE)):
+                stakes.append(
+                    {
+                        "user": u,
+                        "total": str(rng.getrandbits(72)),
+                        "timestamp": str(END_TIME - rng.randrange(days(30))),
+                    }
+                )
+        geyserEvents[name] = {"stakes": stakes, "unstakes": [], "totalStaked": 0}
+
+    schedules = {}
+    for name in names:
+        schedules[name] = {
+            token: [
+                Schedule(
+                    name,
+                    token,
+                    rng.getrandbits(80),
+                    END_TIME - days(7) + i * days(1),
+                    END_TIME + days(7) + i * days(1),
+                    days(14),
+                )
+                for i in range(3)
+            ]
+            for token in [BADGER, FARM]
+        }
+
+    treeDists = []
+    strategies = list(badger.strategies.keys())
+    for i in range(NUM_TREE_DISTRIBUTIONS * numSetts):
+        treeDists.append(
+            {
+                "id": "{}-{}".format(strategies[i % numSetts], i),
+                "blockNumber": str(rng.randrange(START_BLOCK + 1, END_BLOCK + 1)),
+                "token": {"address": BADGER, "symbol": "BADGER"},
+                "amount": str(rng.getrandbits(70)),
+            }
+        )
+
+    walletBalances = {u: rng.random() * 1000 for u in rng.sample(users, numUsers // 4)}
+
+    pastClaims = {}
+    for u in rng.sample(users, numUsers * 4 // 5):
+        pastClaims[web3.toChecksumAddress(u)] = {
+            "tokens": [BADGER],
+            "cumulativeAmounts": [str(rng.getrandbits(80))],
+        }
+
+    return {
+        "badger": badger,
+        "names": names,
+        "settBalances": settBalances,
+        "geyserEvents": geyserEvents,
+        "schedules": schedules,
+        "treeDists": treeDists,
+        "walletBalances": walletBalances,
+        "pastRewards": {"claims": pastClaims},
+    }
+
+
+class StageTimer:
+    def __init__(self):
+        self.timings = {}
+
+    def run(self, stage, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        self.timings[stage] = self.timings.get(stage, 0) + time.perf_counter() - start
+        return result
+
+
+def run_cycle(inputs, cycle=2):
+    badger = inputs["badger"]
+    names = inputs["names"]
+    timer = StageTimer()
+
+    def balances():
+        return {
+            name: merge_sett_balances(
+                badger,
+                name,
+                inputs["settBalances"][name],
+                calc_balances_from_geyser_events(inputs["geyserEvents"][name]),
+            )
+            for name in names
+        }
+
+    userBalances = timer.run("balances", balances)
+
+    def boost():
+        parts = {"digg": [], "badger": [], "nonNative": []}
+        for name in names:
+            part = (
+                userBalances[name].addresses,
+                np.array(userBalances[name].balances, dtype=float) / 1e18,
+            )
+            if name in DIGG_SETTS:
+                parts["digg"].append(part)
+            elif name in BADGER_SETTS:
+                parts["badger"].append(part)
+            else:
+                parts["nonNative"].append(part)
+        wallets = inputs["walletBalances"]
+        parts["badger"].append((list(wallets.keys()), np.array(list(wallets.values()))))
+        return calc_boosts(parts["digg"], parts["badger"], parts["nonNative"])
+
+    (boosts, _) = timer.run("boost", boost)
+
+    def snapshot():
+        rewardsBySett = {}
+        unclaimed = {"bCvx": {}, "bCvxCrv": {}}
+        for name in names:
+            if name not in BADGER_SETTS + DIGG_SETTS:
+                userBalances[name].apply_boosts(boosts)
+            rewards = RewardsList(cycle, badger.badgerTree)
+            distribute_schedules(
+                rewards,
+                name,
+                userBalances[name],
+                inputs["schedules"][name],
+                END_TIME - CYCLE_DURATION,
+                END_TIME,
+                unclaimed,
+            )
+            rewardsBySett[name] = rewards
+        return rewardsBySett
+
+    rewardsBySett = timer.run("calc_snapshot", snapshot)
+    treeRewards = timer.run(
+        "tree_rewards",
+        distribute_tree_rewards,
+        badger,
+        inputs["treeDists"],
+        lambda name, block: userBalances[name],
+        cycle,
+    )
+
+    def combine():
+        settRewards = combine_rewards(
+            list(rewardsBySett.values()), cycle, badger.badgerTree
+        )
+        return combine_rewards([settRewards, treeRewards], cycle, badger.badgerTree)
+
+    newRewards = timer.run("combine_rewards", combine)
+    cumulativeRewards = timer.run(
+        "process_cumulative_rewards",
+        process_cumulative_rewards,
+        inputs["pastRewards"],
+        newRewards,
+    )
+    tree = timer.run(
+        "rewards_to_merkle_tree",
+        rewards_to_merkle_tree,
+        cumulativeRewards,
+        START_BLOCK,
+        END_BLOCK,
+        {},
+    )
+
+    def verify():
+        ClaimsDiff(inputs["pastRewards"]["claims"], tree["claims"]).assert_valid()
+
+    timer.run("verification", verify)
+    return (timer.timings, len(tree["claims"]))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(*populations):
+    populations = list(populations) or DEFAULT_POPULATIONS
+    results = []
+    for population in populations:
+        (numUsers, numSetts) = [int(n) for n in population.split(":")]
+        console.log("Generating {} users across {} setts".format(numUsers, numSetts))
+        inputs = synthetic_cycle(numUsers, numSetts)
+        (timings, numClaims) = run_cycle(inputs)
+        results.append(
+            {
+                "users": numUsers,
+                "setts": numSetts,
+                "claims": numClaims,
+                "stages": {stage: round(timings[stage], 4) for stage in STAGES},
+                "total": round(sum(timings.values()), 4),
+            }
+        )
+
+    print(
+        tabulate(
+            [
+                [r["users"], r["setts"]]
+                + ["{:.2f}s".format(r["stages"][s]) for s in STAGES]
+                + ["{:.2f}s".format(r["total"])]
+                for r in results
+            ],
+            headers=["users", "setts"] + STAGES + ["total"],
+        )
+    )
+    run = {
+        "benchmark": "rewards_cycle",
+        "timestamp": int(time.time()),
+        "commit": git_commit(),
+        "results": results,
+    }
+    with open(RESULTS_FILE, "a") as f:
+        f.write(json.dumps(run) + "\n")
+    console.log("Results appended to {}".format(RESULTS_FILE))
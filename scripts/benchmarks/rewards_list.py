@@ -0,0 +1,91 @@
+import random
+import time
+
+from dotmap import DotMap
+from assistant.rewards.classes.RewardsList import RewardsList
+from rich.console import Console
+from tabulate import tabulate
+
+console = Console()
+
+"""
+Time the RewardsList accumulation path against the old nested DotMap one.
+
+brownie run scripts/benchmarks/rewards_list.py main 100000 1000000
+"""
+
+NUM_TOKENS = 8
+
+
+class DotMapAccumulator:
+    """
+    The accumulation path RewardsList used before it was made dense
+    """
+
+    def __init__(self):
+        self.claims = DotMap()
+        self.totals = DotMap()
+
+    def increase_user_rewards(self, user, token, toAdd):
+        if user in self.claims and token in self.claims[user]:
+            self.claims[user][token] += toAdd
+        else:
+            self.claims[user][token] = toAdd
+
+        if token in self.totals:
+            self.totals[token] += toAdd
+        else:
+            self.totals[token] = toAdd
+
+
+def synthetic_increases(numIncreases, seed=0):
+    rng = random.Random(seed)
+    users = [
+        "0x{:040x}".format(rng.getrandbits(160))
+        for _ in range(max(numIncreases // 10, 1))
+    ]
+    tokens = ["0x{:040x}".format(rng.getrandbits(160)) for _ in range(NUM_TOKENS)]
+    return [
+        (rng.choice(users), rng.choice(tokens), rng.getrandbits(80))
+        for _ in range(numIncreases)
+    ]
+
+
+def time_accumulation(rewards, increases):
+    start = time.perf_counter()
+    for user, token, amount in increases:
+        rewards.increase_user_rewards(user, token, amount)
+    return time.perf_counter() - start
+
+
+def bench(numIncreases):
+    increases = synthetic_increases(numIncreases)
+    dense = RewardsList(1, None)
+    denseTime = time_accumulation(dense, increases)
+    legacy = DotMapAccumulator()
+    legacyTime = time_accumulation(legacy, increases)
+
+    assert dense.claims.toDict() == legacy.claims.toDict()
+    assert dense.totals.toDict() == legacy.totals.toDict()
+
+    return [
+        numIncreases,
+        len(dense.users),
+        "{:.2f}s".format(legacyTime),
+        "{:.2f}s".format(denseTime),
+        "{:.1f}x".format(legacyTime / denseTime),
+    ]
+
+
+def main(*sizes):
+    sizes = [int(s) for s in sizes] or [100000, 1000000]
+    table = []
+    for size in sizes:
+        console.log("Benchmarking {} reward increases".format(size))
+        table.append(bench(size))
+    print(
+        tabulate(
+            table,
+            headers=["increases", "users", "DotMap", "dense", "speedup"],
+        )
+    )
@@ -0,0 +1,101 @@
+import json
+import os
+import random
+import tempfile
+import time
+
+from assistant.rewards.classes.BinaryTree import BinaryTree
+from assistant.rewards.classes.LazyTree import LazyTree
+from assistant.rewards.classes.MerkleTree import rewards_to_merkle_tree
+from assistant.rewards.tree_binary import binary_to_json, json_to_binary
+from rich.console import Console
+from scripts.benchmarks.merkle_proofs import synthetic_rewards
+from tabulate import tabulate
+
+console = Console()
+
+"""
+Compare json and binary rewards trees: file size, time to open and time to
+look up a single claim.
+
+brownie run scripts/benchmarks/tree_formats.py main 10000 100000
+"""
+
+LOOKUPS = 1000
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def bench(numClaimants, workdir):
+    tree = rewards_to_merkle_tree(synthetic_rewards(numClaimants), 1, 2, {})
+    users = random.Random(2).sample(list(tree["claims"].keys()), LOOKUPS)
+
+    jsonPath = os.path.join(workdir, "tree-{}.json".format(numClaimants))
+    binaryPath = os.path.join(workdir, "tree-{}.bin".format(numClaimants))
+    with open(jsonPath, "w") as f:
+        json.dump(tree, f)
+    _, convertTime = timed(lambda: json_to_binary(jsonPath, binaryPath))
+
+    # Lossless: converting back gives the same bytes
+    roundTripPath = binary_to_json(binaryPath, jsonPath + ".roundtrip")
+    with open(jsonPath) as a, open(roundTripPath) as b:
+        assert a.read() == b.read()
+
+    def load_json():
+        with open(jsonPath) as f:
+            return json.load(f)
+
+    loaded, jsonOpen = timed(load_json)
+    _, jsonLookup = timed(lambda: [loaded["claims"][u] for u in users])
+    lazy, lazyOpen = timed(lambda: LazyTree(jsonPath))
+    _, lazyLookup = timed(lambda: [lazy["claims"][u] for u in users])
+    binary, binaryOpen = timed(lambda: BinaryTree(binaryPath))
+    found, binaryLookup = timed(lambda: [binary["claims"][u] for u in users])
+    assert found == [tree["claims"][u] for u in users]
+    binary.close()
+
+    def ms(seconds):
+        return "{:.3f}ms".format(seconds * 1000)
+
+    return [
+        numClaimants,
+        "{:.1f}MB".format(os.path.getsize(jsonPath) / 1e6),
+        "{:.1f}MB".format(os.path.getsize(binaryPath) / 1e6),
+        "{:.2f}s".format(convertTime),
+        "{:.2f}s".format(jsonOpen),
+        ms(jsonLookup / LOOKUPS),
+        "{:.2f}s".format(lazyOpen),
+        ms(lazyLookup / LOOKUPS),
+        ms(binaryOpen),
+        ms(binaryLookup / LOOKUPS),
+    ]
+
+
+def main(*sizes):
+    sizes = [int(s) for s in sizes] or [10000, 100000]
+    table = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            console.log("Benchmarking tree formats for {} claimants".format(size))
+            table.append(bench(size, workdir))
+    print(
+        tabulate(
+            table,
+            headers=[
+                "claimants",
+                "json size",
+                "binary size",
+                "convert",
+                "json.load",
+                "json lookup",
+                "lazy open",
+                "lazy lookup",
+                "binary open",
+                "binary lookup",
+            ],
+        )
+    )
@@ -0,0 +1,68 @@
+from brownie import *
+from rich.console import Console
+from assistant.fixtures.bundle import read_manifest, use_fixtures, write_manifest
+from assistant.fixtures.rpc import install_rpc_recorder
+
+console = Console()
+
+"""
+Record a rootUpdater cycle into a fixture bundle, or re-run one offline.
+
+Record against a live node (nothing is proposed or uploaded):
+    brownie run scripts/rewards/fixture_cycle.py record fixtures/cycle --network mainnet
+
+Replay, with brownie pointed at the bundle's JSON-RPC stand in:
+    python -m assistant.fixtures.server fixtures/cycle --port 8545
+    brownie networks add Ethereum replay host=http://127.0.0.1:8545/rpc chainid=1
+    brownie run scripts/rewards/fixture_cycle.py replay fixtures/cycle --network replay
+"""
+
+
+def run_cycle():
+    # Imported once fixtures are set up, these modules fetch on import
+    from assistant.rewards.rewards_assistant import run_action
+    from scripts.rewards.rewards_utils import calc_next_cycle_range
+    from scripts.systems.badger_system import connect_badger
+
+    badger = connect_badger()
+    (currentRewards, startBlock, endBlock) = calc_next_cycle_range(badger)
+    console.log("Cycle range {} - {}".format(startBlock, endBlock))
+    rewardsData = run_action(
+        badger,
+        {
+            "action": "rootUpdater",
+            "startBlock": startBlock,
+            "endBlock": endBlock,
+            "pastRewards": currentRewards,
+        },
+        test=True,
+        saveLocalFile=False,
+    )
+    return (startBlock, endBlock, rewardsData)
+
+
+def record(path="fixtures/cycle"):
+    use_fixtures("record", path)
+    install_rpc_recorder(web3)
+    (startBlock, endBlock, rewardsData) = run_cycle()
+    write_manifest(
+        startBlock=startBlock,
+        endBlock=endBlock,
+        merkleRoot=rewardsData["merkleTree"]["merkleRoot"],
+    )
+
+
+def replay(path="fixtures/cycle"):
+    use_fixtures("replay", path)
+    manifest = read_manifest()
+    (startBlock, endBlock, rewardsData) = run_cycle()
+    assert (startBlock, endBlock) == (manifest["startBlock"], manifest["endBlock"])
+    merkleRoot = rewardsData["merkleTree"]["merkleRoot"]
+    if merkleRoot == manifest["merkleRoot"]:
+        console.print("[green]Replayed root matches the recording[/green]")
+    else:
+        console.print(
+            "[red]Replayed root {} differs from recorded {}[/red]".format(
+                merkleRoot, manifest["merkleRoot"]
+            )
+        )
@@ -6,7 +6,7 @@ from brownie import *
 from config.badger_config import badger_config
 from rich.console import Console
 from scripts.systems.badger_system import connect_badger
-from assistant.rewards.aws_utils import download_past_trees
+from assistant.rewards.aws_utils import cache_past_trees, tree_cache
 from assistant.rewards.rewards_assistant import run_action
 from helpers.constants import BADGER, DIGG, FARM, XSUSHI
 
@@ -21,9 +21,9 @@ tokens = {
 
 
 def main():
-    trees = download_past_trees(2)
-    pastRewards = json.loads(trees[1])
-    lastTree = json.loads(trees[0])
+    versions = cache_past_trees(2)
+    pastRewards = tree_cache().load(versions[1])
+    lastTree = tree_cache().load(versions[0])
 
     badger = connect_badger(
         badger_config.prod_json, load_keeper=False, load_deployer=False
@@ -1,4 +1,5 @@
 from assistant.rewards.rewards_assistant import fetch_current_rewards_tree
+from assistant.rewards.tree_binary import load_tree
 import json
 import secrets
 import random
@@ -212,8 +213,8 @@ def test_rewards_flow():
     )
     retroactive_file_name = "rewards-1-" + retroactive_content_hash + ".json"
 
-    with open(retroactive_file_name) as f:
-        rewards = json.load(f)
+    # Binary or json tree, claims are read lazily
+    rewards = load_tree(retroactive_file_name)
 
     # Update to new root with xSushi and FARM
     rootProposer = accounts.at(tree.getRoleMember(ROOT_PROPOSER_ROLE, 0), force=True)
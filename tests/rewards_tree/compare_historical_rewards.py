@@ -10,7 +10,7 @@ from brownie import *
 from config.badger_config import badger_config
 from rich.console import Console
 from scripts.systems.badger_system import connect_badger
-from assistant.rewards.aws_utils import download_past_trees
+from assistant.rewards.aws_utils import cache_past_trees, tree_cache
 from assistant.rewards.rewards_assistant import run_action
 
 
@@ -19,9 +19,9 @@ console = Console()
 
 @pytest.fixture(scope="function", autouse="True")
 def setup():
-    trees = download_past_trees(2)
-    pastRewards = json.load(trees[1])
-    lastTree = json.loads(trees[0])
+    versions = cache_past_trees(2)
+    pastRewards = tree_cache().load(versions[1])
+    lastTree = tree_cache().load(versions[0])
 
     badger = connect_badger(
         badger_config.prod_json, load_keeper=False, load_deployer=False
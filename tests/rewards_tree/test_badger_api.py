@@ -0,0 +1,107 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from assistant.badger_api import account, client
+from assistant.badger_api.config import urls
+from config.rewards_config import rewards_config
+
+BCVX = "0xfd05D3C7fe2924020620A8bE4961bBaA747e6305"
+
+
+def account_data(addr):
+    return {"claimableBalances": [{"address": BCVX, "balance": str(int(addr, 16))}]}
+
+
+class AccountsHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in badger api: /accounts/<address> and a bulk /accounts?addresses=.
+    Fails the first request for every address in server.flaky with a 503.
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.ports.add(self.client_address[1])
+        url = urlparse(self.path)
+        if url.path.endswith("/accounts"):
+            addresses = parse_qs(url.query)["addresses"][0].split(",")
+            body = {addr: account_data(addr) for addr in addresses}
+        else:
+            addr = url.path.split("/")[-1]
+            with server.lock:
+                if addr in server.flaky:
+                    server.flaky.remove(addr)
+                    return self.reply(503, {})
+            body = account_data(addr)
+        self.reply(200, body)
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), AccountsHandler)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.ports = set()
+    server.flaky = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setitem(
+        urls, "staging", "http://127.0.0.1:{}".format(server.server_port)
+    )
+    monkeypatch.setattr(rewards_config, "fixtureMode", "off")
+    monkeypatch.setattr(rewards_config, "badgerApiConcurrency", 8)
+    monkeypatch.setattr(rewards_config, "badgerApiBackoff", 0)
+    monkeypatch.setattr(client, "sessions", {})
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def addresses(n):
+    return ["0x{:040x}".format(i + 1) for i in range(n)]
+
+
+def test_accounts_share_pooled_connections(api):
+    addrs = addresses(2000)
+    api.flaky = set(addrs[::100])
+    balances = account.fetch_claimable_balances(addrs)
+
+    assert balances == {addr: account_data(addr)["claimableBalances"] for addr in addrs}
+    assert api.requests == len(addrs) + len(addrs[::100])
+    # Keep-alive: connections are reused instead of opened per request
+    assert len(api.ports) <= rewards_config.badgerApiConcurrency
+
+
+def test_results_stream_before_all_are_fetched(api):
+    stream = account.iter_claimable_balances(addresses(1000))
+    next(stream)
+    assert api.requests < 1000
+    stream.close()
+
+
+def test_bulk_endpoint(api, monkeypatch):
+    monkeypatch.setattr(rewards_config, "badgerApiBulkAccountsPath", "/accounts")
+    monkeypatch.setattr(rewards_config, "badgerApiBulkSize", 100)
+    addrs = addresses(250)
+    balances = account.fetch_claimable_balances(addrs)
+    assert balances == {addr: account_data(addr)["claimableBalances"] for addr in addrs}
+    assert api.requests == 3
@@ -0,0 +1,98 @@
+import random
+
+from assistant.rewards.classes import SettBalanceIndex as balanceIndex
+from assistant.rewards.classes.SettBalanceIndex import SettBalanceIndex
+from helpers.constants import AddressZero
+
+SETT = "0x" + "5e" * 20
+GEYSER = "0x" + "9e" * 20
+
+
+class Contract:
+    def __init__(self, address):
+        self.address = address
+
+
+class Badger:
+    def getSett(self, name):
+        return Contract(SETT)
+
+    def getGeyser(self, name):
+        return Contract(GEYSER)
+
+
+def word(value):
+    return value.to_bytes(32, "big")
+
+
+def topic(address):
+    return bytes(12) + bytes.fromhex(address[2:])
+
+
+def test_balances_are_replayed_from_logs(monkeypatch):
+    rng = random.Random(5)
+    users = ["0x{:040x}".format(i + 1) for i in range(20)]
+    (startBlock, endBlock) = (1000, 1100)
+
+    # Ground truth, updated block by block
+    shares = {u: rng.randrange(1, 10**20) for u in users[:10]}
+    shares[GEYSER] = 10**21
+    stakes = {u: rng.randrange(1, 10**20) for u in users[5:15]}
+    snapshots = {startBlock: (dict(shares), dict(stakes))}
+    transferLogs = []
+    stakeLogs = []
+    for block in range(startBlock + 1, endBlock + 1):
+        for _ in range(rng.randrange(3)):
+            (sender, recipient) = rng.sample([AddressZero, GEYSER] + users, 2)
+            value = rng.randrange(10**18)
+            if sender != AddressZero:
+                shares[sender] = shares.get(sender, 0) - value
+            if recipient != AddressZero:
+                shares[recipient] = shares.get(recipient, 0) + value
+            transferLogs.append(
+                {
+                    "blockNumber": block,
+                    "topics": ["0x", topic(sender), topic(recipient)],
+                    "data": "0x" + word(value).hex(),
+                }
+            )
+        if rng.random() < 0.3:
+            user = rng.choice(users)
+            stakes[user] = rng.randrange(10**20)
+            stakeLogs.append(
+                {
+                    "blockNumber": block,
+                    "topics": ["0x", topic(user)],
+                    "data": word(5) + word(stakes[user]) + word(96) + word(0),
+                }
+            )
+        snapshots[block] = (dict(shares), dict(stakes))
+
+    monkeypatch.setattr(
+        balanceIndex,
+        "fetch_sett_balances",
+        lambda name, settId, block: dict(snapshots[block][0]),
+    )
+    monkeypatch.setattr(balanceIndex, "fetch_geyser_events", lambda g, b: snapshots[b])
+    monkeypatch.setattr(
+        balanceIndex, "calc_balances_from_geyser_events", lambda events: events[1]
+    )
+    monkeypatch.setattr(
+        balanceIndex,
+        "fetch_logs",
+        lambda address, topics, fromBlock, toBlock: transferLogs
+        if address == SETT
+        else stakeLogs,
+    )
+
+    badger = Badger()
+    index = SettBalanceIndex(badger, "native.renCrv", startBlock, endBlock)
+    for block in [1000, 1003, 1050, 1050, 1020, 1100]:
+        (expectedShares, expectedStakes) = snapshots[block]
+        expected = balanceIndex.merge_sett_balances(
+            badger, "native.renCrv", expectedShares, expectedStakes
+        )
+        actual = index.balances_at(block)
+        assert {u.address: u.balance for u in actual} == {
+            u.address: u.balance for u in expected
+        }
@@ -0,0 +1,72 @@
+import random
+
+from assistant.rewards.boost_engine import calc_boosts
+from assistant.rewards.classes.UserBalance import UserBalance, UserBalances
+from scripts.benchmarks.boost_reference import legacy_calc_boosts, synthetic_parts
+
+
+def test_array_boost_matches_user_balances_boost():
+    for seed in range(3):
+        parts = synthetic_parts(3000, seed=seed)
+        (badgerBoost, boostInfo) = calc_boosts(*parts)
+        (legacyBoost, legacyInfo) = legacy_calc_boosts(*parts)
+
+        assert list(badgerBoost.items()) == list(legacyBoost.items())
+        assert boostInfo == legacyInfo
+        for addr, info in legacyInfo.items():
+            for key, value in info.items():
+                assert type(boostInfo[addr][key]) == type(value)
+
+
+def test_boost_ranks_by_stake_ratio():
+    (a, b, c, d) = ["0x" + ch * 40 for ch in "abcd"]
+    badgerParts = [([a, b, d], [300.0, 50.0, 0.5])]
+    diggParts = [([b], [50.0])]
+    nonNativeParts = [([a, b, c], [100.0, 100.0, 200.0]), ([d], [0.5])]
+
+    (badgerBoost, boostInfo) = calc_boosts(diggParts, badgerParts, nonNativeParts)
+
+    # a has the highest stake ratio, c has no native balance at all
+    assert list(badgerBoost) == [a, b, c]
+    assert badgerBoost[a] == 3 - 0.25 * 2
+    assert badgerBoost[b] == 3 - 0.5 * 2
+    assert badgerBoost[c] == 1
+    assert boostInfo[b] == {
+        "nativeBalance": 100.0,
+        "nonNativeBalance": 100.0,
+        "stakeRatio": 1.0,
+    }
+    # Dust holders are listed but get no boost
+    assert boostInfo[d] == {"nativeBalance": 0, "nonNativeBalance": 0, "stakeRatio": 0}
+    assert d not in badgerBoost
+
+
+def test_apply_boosts_matches_per_user_shares():
+    rng = random.Random(3)
+    users = [
+        UserBalance("0x{:040x}".format(i), rng.getrandbits(70), "") for i in range(500)
+    ]
+    boosts = {u.address: rng.uniform(1, 3) for u in users[::2]}
+
+    expected = UserBalances([UserBalance(u.address, u.balance, "") for u in users])
+    preBoost = {u.address: expected.percentage_of_total(u.address) for u in expected}
+    for user in expected:
+        user.boost_balance(boosts.get(user.address, 1))
+    expectedRatios = {
+        u.address: expected.percentage_of_total(u.address) / preBoost[u.address]
+        for u in expected
+    }
+
+    userBalances = UserBalances(users)
+    assert userBalances.apply_boosts(boosts) == expectedRatios
+    assert [u.balance for u in userBalances] == [u.balance for u in expected]
+    assert userBalances.total_balance() == sum(u.balance for u in expected)
+
+
+def test_total_balance_is_invalidated_on_boost():
+    userBalances = UserBalances([UserBalance("a", 10, ""), UserBalance("b", 30, "")])
+    assert userBalances.percentage_of_total("a") == 0.25
+    userBalances["a"].boost_balance(3)
+    assert userBalances.total_balance() == 60
+    userBalances["c"] = UserBalance("c", 40, "")
+    assert userBalances.percentage_of_total("c") == 0.4
@@ -0,0 +1,72 @@
+import pytest
+
+from assistant.rewards.classes.ClaimsDiff import (
+    REPORT_USERS,
+    ClaimsDiff,
+    claim_totals,
+)
+
+BADGER = "0x3472A5A71965499acd81997a54BBA8D852C6E53d"
+DIGG = "0x798D1bE841a82a273720CE31c822C61a67a601C3"
+# Digg shares are far above 2 ** 128
+SHARES = 2 ** 200
+
+
+def claim(amounts):
+    return {
+        "tokens": list(amounts.keys()),
+        "cumulativeAmounts": [str(amount) for amount in amounts.values()],
+    }
+
+
+def test_columns_are_keyed_by_token_not_position():
+    before = {"0xa": claim({BADGER: 10, DIGG: SHARES})}
+    after = {
+        "0xa": claim({DIGG: SHARES + 1, BADGER: 15}),
+        "0xb": claim({BADGER: 5}),
+    }
+    diff = ClaimsDiff(before, after)
+
+    assert diff.totals_after() == {BADGER: 20, DIGG: SHARES + 1}
+    assert diff.deltas() == {BADGER: 10, DIGG: 1}
+    assert diff.check() == []
+    assert claim_totals(after) == {BADGER: 20, DIGG: SHARES + 1}
+
+
+def test_decreased_claims_are_reported_compactly():
+    numUsers = REPORT_USERS + 3
+    before = {
+        "0x{}".format(i): claim({BADGER: 100, DIGG: SHARES}) for i in range(numUsers)
+    }
+    after = {
+        "0x{}".format(i): claim({BADGER: 100 - i, DIGG: SHARES})
+        for i in range(1, numUsers)
+    }
+    diff = ClaimsDiff(before, after)
+
+    problems = diff.check()
+    # 0x0 lost its claim entirely, 0x1... decreased
+    assert problems[0].startswith("{} users' claims of {}".format(numUsers, BADGER))
+    assert "0x0 (-100)" in problems[0]
+    assert problems[0].endswith("and 3 more")
+    # Digg shares of 0x0 went to 0 too, down by exactly SHARES
+    assert "0x0 (-{})".format(SHARES) in problems[2]
+    with pytest.raises(AssertionError):
+        diff.assert_valid()
+
+
+def test_bounds_and_growth():
+    before = {"0xa": claim({BADGER: 100}), "0xb": claim({BADGER: 100})}
+    after = {
+        "0xa": claim({BADGER: 124}),
+        "0xb": claim({BADGER: 125}),
+        "0xc": claim({BADGER: 1000}),
+    }
+    diff = ClaimsDiff(before, after)
+
+    assert diff.check(maxTotals={BADGER: 1249}, maxDeltas={BADGER: 1049}) == []
+    assert len(diff.check(maxTotals={BADGER: 1248}, maxDeltas={BADGER: 1048})) == 2
+    # New users have nothing to grow from
+    assert [diff.users[row] for row in diff.growth_outside(BADGER, 0.98, 1.25)] == [
+        "0xb"
+    ]
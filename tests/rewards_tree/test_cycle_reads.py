@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+from eth_abi import encode_single
+
+from assistant.rewards.classes import CycleReads as cycleReadsModule
+from assistant.rewards.classes.CycleReads import CycleReads, UNLOCK_SCHEDULES
+from helpers.constants import BADGER, DIGG
+from helpers.multicall import Signature
+
+SETT = "0x19D97D8fA813EE2f51aD4B4e04EA08bAf4DFfC28"
+LOGGER = "0x0A4F4e92C3334821EbB523324D09E321a6B0d8ec"
+SCHEDULE = (SETT, BADGER, 10**18, 100, 200, 100)
+
+
+class RewardsLogger:
+    address = LOGGER
+
+    def __init__(self):
+        self.calls = 0
+
+    def getAllUnlockSchedulesFor(self, sett):
+        self.calls += 1
+        return [SCHEDULE]
+
+
+def make_badger():
+    return SimpleNamespace(
+        rewardsLogger=RewardsLogger(),
+        sett_system=SimpleNamespace(
+            vaults={"native.test": SimpleNamespace(address=SETT)}
+        ),
+    )
+
+
+def encoded_output(call):
+    if call.function.startswith("getAllUnlockSchedulesFor"):
+        return encode_single(Signature(UNLOCK_SCHEDULES).output_types, [[SCHEDULE]])
+    if call.function.startswith("decimals"):
+        return encode_single("(uint8)", [18])
+    return encode_single("(uint256)", [7 * 10**9])
+
+
+class FakeMulticall:
+    """
+    Answers every call the way the contracts would, through each call's decoder
+    """
+
+    batches = []
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    def __call__(self):
+        FakeMulticall.batches.append(len(self.calls))
+        result = {}
+        for call in self.calls:
+            result.update(call.decode_output(encoded_output(call)))
+        return result
+
+
+class FailingMulticall(FakeMulticall):
+    def __call__(self):
+        raise KeyError(1337)
+
+
+def test_prefetch_serves_reads(monkeypatch):
+    monkeypatch.setattr(cycleReadsModule, "Multicall", FakeMulticall)
+    FakeMulticall.batches = []
+    reads = CycleReads()
+    badger = make_badger()
+    reads.prefetch(badger, [])
+
+    sett = badger.sett_system.vaults["native.test"]
+    assert reads.unlock_schedules(badger, sett) == [SCHEDULE]
+    assert reads.decimals(SETT) == 18
+    assert reads.shares_to_fragments(7 * 10**18) == 10**9
+    assert reads.shares_to_fragments(0) == 0
+    assert badger.rewardsLogger.calls == 0
+    assert FakeMulticall.batches == [4]
+
+
+def test_failed_prefetch_reads_on_first_use(monkeypatch):
+    monkeypatch.setattr(cycleReadsModule, "Multicall", FailingMulticall)
+    reads = CycleReads()
+    badger = make_badger()
+    reads.prefetch(badger, [])
+
+    sett = badger.sett_system.vaults["native.test"]
+    assert reads.unlock_schedules(badger, sett) == [SCHEDULE]
+    assert reads.unlock_schedules(badger, sett) == [SCHEDULE]
+    assert badger.rewardsLogger.calls == 1
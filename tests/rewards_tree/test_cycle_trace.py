@@ -0,0 +1,107 @@
+import os
+import pstats
+
+from assistant.rewards.classes import CycleTrace as CycleTraceModule
+from assistant.rewards.classes.CycleTrace import CycleTrace
+from assistant.subgraph import cache
+from config.rewards_config import rewards_config
+
+
+def test_stages_nest_and_count():
+    trace = CycleTrace()
+    trace.start(7)
+    with trace.stage("sett_rewards"):
+        trace.count("subgraphRequests", 3)
+        with trace.stage("native.badger") as stage:
+            trace.count("rpcCalls")
+            stage["users"] = 2
+    with trace.stage("verify"):
+        pass
+
+    data = trace.data()
+    assert data["cycle"] == 7
+    assert data["counts"] == {"subgraphRequests": 3, "rpcCalls": 1}
+    assert [s["stage"] for s in data["stages"]] == [
+        "sett_rewards",
+        "sett_rewards/native.badger",
+        "verify",
+    ]
+    (settRewards, snapshot, verify) = data["stages"]
+    assert settRewards["counts"] == {"subgraphRequests": 3, "rpcCalls": 1}
+    assert snapshot["counts"] == {"rpcCalls": 1}
+    assert snapshot["depth"] == 1
+    assert snapshot["users"] == 2
+    assert verify["counts"] == {}
+    assert settRewards["seconds"] >= snapshot["seconds"]
+    assert snapshot["rssStartMb"] > 0
+    assert snapshot["rssEndMb"] > 0
+    assert snapshot["maxRssGrowthMb"] >= 0
+
+
+def test_stage_memory_is_its_own():
+    trace = CycleTrace()
+    trace.start(2)
+    with trace.stage("allocate"):
+        block = bytearray(64 * 1024**2)
+        block[::4096] = b"x" * len(block[::4096])
+    del block
+    with trace.stage("idle"):
+        pass
+
+    (allocate, idle) = trace.data()["stages"]
+    assert allocate["rssEndMb"] - allocate["rssStartMb"] > 32
+    assert allocate["maxRssGrowthMb"] > 32
+    assert idle["maxRssGrowthMb"] == 0
+
+
+def test_failed_stage_is_recorded():
+    trace = CycleTrace()
+    trace.start(1)
+    try:
+        with trace.stage("boost"):
+            raise ValueError()
+    except ValueError:
+        pass
+    with trace.stage("verify"):
+        pass
+    assert [s["stage"] for s in trace.data()["stages"]] == ["boost", "verify"]
+    assert "seconds" in trace.data()["stages"][0]
+
+
+def test_cycle_profile_dump(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(rewards_config, "cycleTrace", False)
+    monkeypatch.setattr(rewards_config, "cycleProfiler", "cprofile")
+    trace = CycleTrace()
+    trace.start(3)
+    with trace.stage("merkle_tree"):
+        sorted(range(1000), key=lambda i: -i)
+    data = trace.save()
+
+    assert data["profile"] == "cycle-profile-3.prof"
+    assert os.path.exists(tmp_path / data["profile"])
+    stats = pstats.Stats(str(tmp_path / data["profile"]))
+    assert stats.total_calls > 0
+
+
+def test_trace_upload_failure_is_not_raised(monkeypatch):
+    monkeypatch.setattr(rewards_config, "cycleTrace", True)
+    monkeypatch.setattr(rewards_config, "cycleProfiler", None)
+
+    def upload_trace(cycle, data):
+        raise ConnectionError("s3 down")
+
+    monkeypatch.setattr(CycleTraceModule, "upload_trace", upload_trace)
+    trace = CycleTrace()
+    trace.start(4)
+    assert trace.save()["cycle"] == 4
+
+
+def test_subgraph_requests_are_counted(monkeypatch):
+    monkeypatch.setattr(cache, "requestCounters", [])
+    trace = CycleTrace()
+    trace.start(5)
+    cache.add_request_counter(trace.count)
+    cache.add_request_counter(trace.count)
+    cache.count_request("subgraphRequests")
+    assert trace.data()["counts"] == {"subgraphRequests": 1}
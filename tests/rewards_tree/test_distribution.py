@@ -0,0 +1,39 @@
+import random
+
+from assistant.rewards.distribution import distribute_exact, distribute_float
+
+
+def test_exact_shares_sum_to_amount():
+    rng = random.Random(7)
+    for _ in range(50):
+        amount = rng.getrandbits(90)
+        balances = [rng.getrandbits(rng.choice([1, 40, 80])) for _ in range(301)]
+        shares = distribute_exact(amount, balances)
+        assert sum(shares) == amount
+        total = sum(balances)
+        for share, balance in zip(shares, balances):
+            assert balance * amount // total <= share <= balance * amount // total + 1
+
+
+def test_exact_remainder_is_deterministic():
+    # 10 / 3 each floors to 3, the leftover unit goes to the first of the tied balances
+    assert distribute_exact(10, [1, 1, 1]) == [4, 3, 3]
+    # Largest remainder wins over position
+    assert distribute_exact(10, [1, 2, 4]) == [1, 3, 6]
+    assert distribute_exact(10**18, [3 * 10**17, 0, 7.5e17]) == distribute_exact(
+        10**18, [3 * 10**17, 0, 750000000000000000]
+    )
+
+
+def test_nothing_to_distribute():
+    assert distribute_exact(0, [1, 2]) == [0, 0]
+    assert distribute_exact(100, [0, 0]) == [0, 0]
+    assert distribute_exact(100, []) == []
+    assert distribute_float(100, [0, 0]) == [0, 0]
+
+
+def test_float_split_loses_dust():
+    amount = 123456789123456789123
+    balances = [10**18 + i for i in range(1000)]
+    assert sum(distribute_float(amount, balances)) != amount
+    assert sum(distribute_exact(amount, balances)) == amount
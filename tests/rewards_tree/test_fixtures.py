@@ -0,0 +1,160 @@
+import io
+import json
+import os
+import urllib.request
+
+import pytest
+from gql import gql
+
+from assistant.fixtures.bundle import FixtureMiss, fixture_response, use_fixtures
+from assistant.fixtures.rpc import rpc_recorder
+from assistant.fixtures.s3 import FixtureS3, RecordingS3
+from assistant.fixtures.server import ReplayServer
+from assistant.subgraph.cache import CachedClient
+from assistant.subgraph.config import subgraph_config
+from config.rewards_config import rewards_config
+
+QUERY = gql(
+    """
+    query vaults($blockHeight: Block_height) {
+        vaults(block: $blockHeight) {
+            id
+        }
+    }
+    """
+)
+
+
+@pytest.fixture
+def bundle(tmp_path):
+    names = [
+        "fixtureMode",
+        "fixturePath",
+        "subgraphCacheMode",
+        "subgraphCachePath",
+        "subgraphCacheMaxBytes",
+    ]
+    saved = {name: getattr(rewards_config, name) for name in names}
+    use_fixtures("record", str(tmp_path / "bundle"))
+    yield str(tmp_path / "bundle")
+    for name, value in saved.items():
+        setattr(rewards_config, name, value)
+
+
+class S3Client:
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO("{}/{}".format(Bucket, Key).encode())}
+
+
+class WriteGuardClient:
+    """
+    s3 client recording every call made to it
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append(name)
+
+
+class LiveClient:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self, document, variable_values=None):
+        return self.response
+
+
+def post(url, body):
+    request = urllib.request.Request(
+        url, json.dumps(body).encode(), {"Content-Type": "application/json"}
+    )
+    return json.loads(urllib.request.urlopen(request).read())
+
+
+def test_responses_are_replayed_from_the_bundle(bundle):
+    assert fixture_response("badger_api", "/prices", lambda: {"0xb": 1.5}) == {
+        "0xb": 1.5
+    }
+    RecordingS3(S3Client()).get_object(Bucket="trees", Key="rewards/tree.json")
+
+    use_fixtures("replay", bundle)
+    assert fixture_response("badger_api", "/prices", None) == {"0xb": 1.5}
+    with pytest.raises(FixtureMiss):
+        fixture_response("badger_api", "/setts", None)
+
+    s3 = FixtureS3()
+    body = s3.get_object(Bucket="trees", Key="rewards/tree.json")["Body"].read()
+    assert body == b"trees/rewards/tree.json"
+    with pytest.raises(FixtureMiss):
+        s3.get_object(Bucket="trees", Key="badger-tree.json")
+    s3.put_object(Body="{}", Bucket="trees", Key="badger-tree.json")
+    with open("{}/published/trees/badger-tree.json".format(bundle)) as f:
+        assert f.read() == "{}"
+
+
+def test_recording_never_writes_to_s3(bundle, tmp_path, monkeypatch):
+    from assistant.rewards import aws_utils
+
+    client = WriteGuardClient()
+    monkeypatch.setattr(aws_utils, "s3_clients", {"record": RecordingS3(client)})
+    monkeypatch.chdir(tmp_path)
+    with open("badger-boosts.json", "w") as f:
+        json.dump({}, f)
+
+    aws_utils.upload_boosts(test=False)
+    aws_utils.upload_analytics(5, {"cycle": 5})
+    aws_utils.upload_trace(5, {"cycle": 5})
+    aws_utils.upload("rewards-1-0x5.json", {"merkleRoot": "0x5", "claims": {}})
+
+    assert client.calls == []
+    for path in [
+        "badger-merkle-proofs/badger-boosts.json",
+        "badger-analytics/logs/5.json",
+        "badger-analytics/logs/5-trace.json",
+        "badger-staging-merkle-proofs/badger-tree.json",
+        "badger-merkle-proofs/badger-tree.json",
+    ]:
+        assert os.path.exists(os.path.join(bundle, "published", path))
+
+
+def test_replay_server_serves_recorded_responses(bundle):
+    endpoint = subgraph_config["setts"]
+    variables = {"blockHeight": {"number": 100}}
+    vaults = {"vaults": [{"id": "0xsett"}]}
+    CachedClient(LiveClient(vaults), endpoint).execute(QUERY, variable_values=variables)
+    fixture_response("badger_api", "/prices", lambda: {"0xb": 1.5})
+
+    block = {"jsonrpc": "2.0", "id": 7, "result": "0x10"}
+    recorder = rpc_recorder(lambda method, params: block, None)
+    assert recorder("eth_blockNumber", []) == block
+    with open("{}/manifest.json".format(bundle)) as f:
+        manifest = json.load(f)
+    with open("{}/manifest.json".format(bundle), "w") as f:
+        json.dump({**manifest, "chainId": 1}, f)
+
+    server = ReplayServer(bundle).start()
+    try:
+        endpoints = server.endpoints()
+        rpc = endpoints["rpc"]
+        assert post(rpc, {"id": 1, "method": "eth_blockNumber", "params": []}) == {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "result": "0x10",
+        }
+        assert post(rpc, {"id": 2, "method": "eth_chainId"})["result"] == "0x1"
+        assert "error" in post(rpc, {"id": 3, "method": "eth_call", "params": []})
+
+        queryText = "query vaults($blockHeight: Block_height) { vaults(block: $blockHeight) { id } }"
+        response = post(
+            endpoints["subgraphs"]["setts"],
+            {"query": queryText, "variables": variables},
+        )
+        assert response == {"data": vaults}
+
+        with urllib.request.urlopen(endpoints["badgerApi"] + "/prices") as r:
+            assert json.loads(r.read()) == {"0xb": 1.5}
+        assert len(server.misses) == 1
+    finally:
+        server.stop()
@@ -0,0 +1,50 @@
+import io
+
+import pytest
+from rich.console import Console
+
+from assistant.rewards import log
+from config.rewards_config import rewards_config
+
+
+class Rendered:
+    def __init__(self):
+        self.renders = 0
+
+    def __str__(self):
+        self.renders += 1
+        return "rendered"
+
+
+@pytest.fixture
+def output(monkeypatch):
+    out = io.StringIO()
+    monkeypatch.setattr(log, "console", Console(file=out, width=200))
+    return out
+
+
+def test_debug_is_not_formatted_at_info(output, monkeypatch):
+    monkeypatch.setattr(rewards_config, "logLevel", "info")
+    value = Rendered()
+    log.debug("per user {}", value)
+    log.info("per sett {}", 1)
+    assert value.renders == 0
+    assert "per user" not in output.getvalue()
+    assert "per sett 1" in output.getvalue()
+
+
+def test_debug_level_logs_everything(output, monkeypatch):
+    monkeypatch.setattr(rewards_config, "logLevel", "debug")
+    log.debug("per user {}", Rendered())
+    assert "per user rendered" in output.getvalue()
+
+
+def test_summary_is_one_line(output, monkeypatch):
+    monkeypatch.setattr(rewards_config, "logLevel", "info")
+    summary = log.Summary("Processed {} harvests", 3)
+    for users in [10, 20, 30]:
+        summary.add("users", users)
+        summary.add("BADGER", 0.5)
+    summary.log()
+    assert "Processed 3 harvests (users: 60, BADGER: 1.5)" in output.getvalue()
+    assert output.getvalue().count("Processed") == 1
@@ -0,0 +1,110 @@
+import random
+
+from brownie import web3
+from assistant.rewards.classes import IncrementalMerkleBuilder as builder_module
+from assistant.rewards.classes.IncrementalMerkleBuilder import (
+    IncrementalMerkleBuilder,
+)
+from assistant.rewards.classes.MerkleTree import MerkleTree, rewards_to_merkle_tree
+from assistant.rewards.classes.RewardsList import RewardsList
+from config.rewards_config import rewards_config
+from helpers.constants import BADGER, DIGG
+
+
+def build_rewards(numClaimants, cycle=1):
+    rng = random.Random(numClaimants)
+    rewards = RewardsList(cycle, None)
+    for _ in range(numClaimants):
+        user = web3.toChecksumAddress("0x{:040x}".format(rng.getrandbits(160)))
+        rewards.increase_user_rewards(user, BADGER, rng.getrandbits(80))
+        if rng.random() < 0.5:
+            rewards.increase_user_rewards(user, DIGG, rng.getrandbits(60))
+    return rewards
+
+
+def verify_proof(root, encoded, proof):
+    node = web3.keccak(hexstr=encoded)
+    for sibling in proof:
+        node = MerkleTree.combined_hash(node, bytes.fromhex(sibling[2:]))
+    return node == root
+
+
+def test_all_proofs_match_single_proofs():
+    for numClaimants in [1, 2, 3, 17, 256, 1001]:
+        (nodes, encodedNodes, entries) = build_rewards(numClaimants).to_merkle_format()
+        tree = MerkleTree(encodedNodes)
+        proofs = tree.get_all_proofs()
+
+        assert len(proofs) == len(encodedNodes)
+        for encoded, proof in zip(encodedNodes, proofs):
+            assert proof == tree.get_proof(encoded)
+            assert verify_proof(tree.root, encoded, proof)
+
+
+def test_parallel_encoding_matches_serial():
+    rewards = build_rewards(rewards_config.merkleEncodingBatchSize * 3 + 7)
+
+    serial = rewards_to_merkle_tree(rewards, 1, 2, {}, serial=True)
+    parallel = rewards_to_merkle_tree(rewards, 1, 2, {})
+
+    assert serial == parallel
+
+
+def test_incremental_build_matches_full_rebuild(tmp_path):
+    cachePath = str(tmp_path / "merkle-cache.bin")
+    rewards = build_rewards(500, cycle=10)
+
+    builder = IncrementalMerkleBuilder(cachePath)
+    first = rewards_to_merkle_tree(rewards, 1, 2, {}, builder=builder)
+    builder.save()
+    assert first == rewards_to_merkle_tree(rewards, 1, 2, {})
+    assert builder.stats["reencoded"] == 500
+
+    # Same cycle again (e.g. guardian run): nothing to encode or hash
+    builder = IncrementalMerkleBuilder(cachePath)
+    again = rewards_to_merkle_tree(rewards, 1, 2, {}, builder=builder)
+    assert again == first
+    assert builder.stats["unchanged"] == 500
+    assert builder.stats["layerHashesComputed"] == 0
+
+    # Next cycle with a few changed users and a new one
+    nextRewards = RewardsList(11, None)
+    newUser = web3.toChecksumAddress("0x" + "ab" * 20)
+    nextRewards.increase_user_rewards(newUser, BADGER, 10**18)
+    for idx, (user, claims) in enumerate(rewards.claims.items()):
+        for token, amount in claims.items():
+            nextRewards.increase_user_rewards(
+                user, token, amount + (idx if idx % 10 == 0 else 0)
+            )
+    builder = IncrementalMerkleBuilder(cachePath)
+    incremental = rewards_to_merkle_tree(nextRewards, 2, 3, {}, builder=builder)
+    assert incremental == rewards_to_merkle_tree(nextRewards, 2, 3, {})
+    assert builder.stats["reencoded"] == 1 + 49
+    assert builder.stats["spliced"] == 500 - 49
+
+
+def test_incremental_build_ignores_bad_caches(tmp_path, monkeypatch):
+    cachePath = str(tmp_path / "merkle-cache.bin")
+    rewards = build_rewards(50, cycle=10)
+    builder = IncrementalMerkleBuilder(cachePath)
+    expected = rewards_to_merkle_tree(rewards, 1, 2, {}, builder=builder)
+    builder.save()
+    with open(cachePath, "rb") as f:
+        saved = f.read()
+
+    # A flipped byte in the last leaf hash of the nodes section
+    lastLeaf = saved.rindex(builder.nodes[list(builder.nodes)[-1]][3])
+    corrupted = bytearray(saved)
+    corrupted[lastLeaf] ^= 1
+    # Same data written by another format version
+    otherVersion = bytearray(saved)
+    otherVersion[8:10] = (builder_module.CACHE_VERSION + 1).to_bytes(2, "little")
+    monkeypatch.setattr(builder_module, "CACHE_SAMPLE", 50)
+
+    for data in [bytes(corrupted), bytes(otherVersion), saved[:-1]]:
+        with open(cachePath, "wb") as f:
+            f.write(data)
+        builder = IncrementalMerkleBuilder(cachePath)
+        assert builder.nodes == {}
+        assert rewards_to_merkle_tree(rewards, 1, 2, {}, builder=builder) == expected
+        assert builder.stats["reencoded"] == 50
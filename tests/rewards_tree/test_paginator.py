@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from gql import gql
+from gql.transport.exceptions import TransportQueryError, TransportServerError
+
+from assistant.subgraph import paginator
+from assistant.subgraph.paginator import Listing, collect, fetch_pages, id_shards
+from config.rewards_config import rewards_config
+
+QUERY = gql(
+    """
+    query holders($first: Int, $where: Holder_filter) {
+        holders(first: $first, where: $where) {
+            id
+        }
+    }
+    """
+)
+
+
+class HolderSession:
+    """
+    Serves holders the way the subgraph filters and pages them, failing the
+    requests failures() picks
+    """
+
+    def __init__(self, ids, failures=lambda variables: None):
+        self.ids = sorted(ids)
+        self.failures = failures
+        self.requests = []
+
+    async def execute(self, document, variable_values=None):
+        self.requests.append(variable_values)
+        await asyncio.sleep(0)
+        error = self.failures(variable_values)
+        if error is not None:
+            raise error
+        where = variable_values["where"]
+        matches = [
+            {"id": i}
+            for i in self.ids
+            if i > where["id_gt"] and ("id_lt" not in where or i < where["id_lt"])
+        ]
+        return {"holders": matches[: variable_values["first"]]}
+
+
+def run_pages(session, numShards):
+    listing = Listing(QUERY, {}, {"where": ("holders",)})
+    pages = asyncio.run(fetch_pages(session, [listing], numShards))[0]
+    return collect(pages, ("holders",))
+
+
+@pytest.fixture
+def no_backoff():
+    saved = (rewards_config.subgraphBackoff, rewards_config.subgraphRetries)
+    rewards_config.subgraphBackoff = 0
+    rewards_config.subgraphRetries = 2
+    yield
+    (rewards_config.subgraphBackoff, rewards_config.subgraphRetries) = saved
+
+
+def test_id_shards_cover_the_id_space():
+    assert id_shards(1) == [("", None)]
+    assert id_shards(4) == [
+        ("", "0x40"),
+        ("0x40", "0x80"),
+        ("0x80", "0xc0"),
+        ("0xc0", None),
+    ]
+    assert len(id_shards(1000)) == 256
+
+
+def test_sharded_pages_match_a_serial_walk():
+    ids = ["0x{:040x}".format((i * 0x9E3779B97F4A7C15) % 2**160) for i in range(5000)]
+    session = HolderSession(ids)
+    assert [h["id"] for h in run_pages(session, 16)] == sorted(ids)
+    # One short page per shard
+    assert len(session.requests) == 16 + sum(
+        len([i for i in ids if lower < i and (upper is None or i < upper)]) // 1000
+        for (lower, upper) in id_shards(16)
+    )
+
+
+def test_failed_requests_are_retried(no_backoff):
+    ids = ["0x{:040x}".format(i << 150) for i in range(3000)]
+    failed = set()
+
+    def failures(variables):
+        # Every first page fails once, the second shard with a timeout
+        cursor = variables["where"]["id_gt"]
+        if cursor in ["", "0x80"] and cursor not in failed:
+            failed.add(cursor)
+            if cursor == "":
+                return TransportServerError("429, message='Too Many Requests'")
+            return TransportQueryError("Query timed out")
+        return None
+
+    session = HolderSession(ids, failures)
+    assert [h["id"] for h in run_pages(session, 2)] == sorted(ids)
+    firstPages = [r["first"] for r in session.requests if r["where"]["id_gt"] == ""]
+    timedOut = [r["first"] for r in session.requests if r["where"]["id_gt"] == "0x80"]
+    # Rate limits keep the page size, timeouts halve it
+    assert firstPages == [1000, 1000]
+    assert timedOut == [1000, 500]
+
+    def broken(variables):
+        return TransportQueryError("Unknown field")
+
+    with pytest.raises(TransportQueryError):
+        run_pages(HolderSession(ids, broken), 2)
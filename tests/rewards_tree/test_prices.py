@@ -0,0 +1,58 @@
+import pytest
+
+from assistant.badger_api import prices as token_prices
+from config.rewards_config import rewards_config
+from helpers.ttl_cache import TTLCache
+
+
+@pytest.fixture
+def price_feed(monkeypatch):
+    feed = {"calls": 0, "prices": {"0xb": 1.5}}
+
+    def fetch():
+        feed["calls"] += 1
+        return dict(feed["prices"])
+
+    monkeypatch.setattr(token_prices, "fetch_token_prices", fetch)
+    monkeypatch.setattr(rewards_config, "priceSnapshot", None)
+    return feed
+
+
+def test_ttl_cache_refetches_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("helpers.ttl_cache.time.monotonic", lambda: now[0])
+    cache = TTLCache()
+    fetches = iter(range(10))
+
+    assert cache.get("k", lambda: next(fetches), 60) == 0
+    now[0] += 59
+    assert cache.get("k", lambda: next(fetches), 60) == 0
+    now[0] += 1
+    assert cache.get("k", lambda: next(fetches), 60) == 1
+    cache.pin("k", "pinned")
+    now[0] += 600
+    assert cache.get("k", lambda: next(fetches), 60) == "pinned"
+
+
+def test_prices_are_fetched_on_first_use(price_feed):
+    prices = token_prices.TokenPrices()
+    assert price_feed["calls"] == 0
+    assert prices["0xb"] == 1.5
+    assert prices.all() == {"0xb": 1.5}
+    assert price_feed["calls"] == 1
+
+
+def test_prices_pinned_to_snapshot(price_feed, tmp_path, monkeypatch):
+    prices = token_prices.TokenPrices()
+    path = str(tmp_path / "prices.json")
+    prices.snapshot(path, block=12000000)
+    assert token_prices.read_price_snapshot(path)["block"] == 12000000
+
+    price_feed["prices"] = {"0xb": 2.0}
+    monkeypatch.setattr(rewards_config, "priceSnapshot", path)
+    replay = token_prices.TokenPrices()
+    assert replay["0xb"] == 1.5
+    assert price_feed["calls"] == 1
+
+    replay.pin({"0xb": 3.0})
+    assert replay["0xb"] == 3.0
@@ -0,0 +1,139 @@
+import json
+import os
+import random
+
+import boto3
+import pytest
+
+from assistant.rewards import aws_utils
+from assistant.rewards.classes.LazyTree import LazyTree
+from config.rewards_config import rewards_config
+
+moto = pytest.importorskip("moto")
+# mock_aws replaced the per service mocks in moto 5
+mock_s3 = getattr(moto, "mock_aws", None) or moto.mock_s3
+
+BUCKETS = ["badger-staging-merkle-proofs", "badger-merkle-proofs", "badger-json"]
+
+
+def make_tree(numClaims, seed=0):
+    rng = random.Random(seed)
+    return {
+        "merkleRoot": "0x" + "ab" * 32,
+        "cycle": 10,
+        "claims": {
+            "0x{:040x}".format(rng.getrandbits(160)): {
+                "cumulativeAmounts": [str(rng.getrandbits(80))],
+                "proof": ["0x{:064x}".format(rng.getrandbits(256))],
+            }
+            for _ in range(numClaims)
+        },
+    }
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_s3():
+        client = boto3.client("s3", region_name="us-east-1")
+        for bucket in BUCKETS:
+            client.create_bucket(Bucket=bucket)
+        monkeypatch.setattr(aws_utils, "s3_client", lambda: client)
+        yield client
+
+
+def test_publish_gzip_to_every_target(s3, monkeypatch):
+    monkeypatch.setattr(rewards_config, "publishEncoding", "gzip")
+    tree = make_tree(200)
+    aws_utils.upload("rewards-1-0x1.json", tree)
+
+    for bucket in ["badger-staging-merkle-proofs", "badger-merkle-proofs"]:
+        head = s3.head_object(Bucket=bucket, Key="badger-tree.json")
+        assert head["ContentEncoding"] == "gzip"
+        assert head["ContentLength"] < len(json.dumps(tree))
+    assert json.loads(aws_utils.download_latest_tree()) == tree
+
+
+def test_publish_plain_json_by_default(s3):
+    tree = make_tree(20)
+    aws_utils.upload("rewards-1-0x1.json", tree)
+
+    head = s3.head_object(Bucket="badger-merkle-proofs", Key="badger-tree.json")
+    assert "ContentEncoding" not in head
+    body = s3.get_object(Bucket="badger-merkle-proofs", Key="badger-tree.json")
+    assert json.loads(body["Body"].read()) == tree
+
+
+def test_lazy_tree_round_trip(s3, tmp_path, monkeypatch):
+    monkeypatch.setattr(rewards_config, "publishEncoding", "gzip")
+    tree = make_tree(50)
+    path = str(tmp_path / "tree.json")
+    with open(path, "w") as f:
+        json.dump(tree, f)
+
+    aws_utils.upload("rewards-1-0x2.json", LazyTree(path), publish=False)
+    downloaded = str(tmp_path / "downloaded.json")
+    aws_utils.download_tree_to_file("rewards-1-0x2.json", downloaded)
+    with open(downloaded) as f:
+        assert f.read() == json.dumps(tree)
+    assert json.loads(aws_utils.download_tree("rewards-1-0x2.json")) == tree
+
+
+def test_multipart_upload_is_verified(s3, monkeypatch):
+    monkeypatch.setattr(rewards_config, "publishEncoding", None)
+    monkeypatch.setattr(rewards_config, "s3MultipartChunkSize", 5 * 1024**2)
+    tree = make_tree(60000)
+    assert len(json.dumps(tree)) > 5 * 1024**2
+
+    aws_utils.upload("rewards-1-0x3.json", tree)
+    head = s3.head_object(Bucket="badger-merkle-proofs", Key="badger-tree.json")
+    # Multipart ETags end with the number of parts
+    assert "-" in head["ETag"]
+    assert json.loads(aws_utils.download_latest_tree()) == tree
+
+
+def test_verify_upload_rejects_other_content(s3, tmp_path):
+    tree = make_tree(10)
+    payload = aws_utils.write_payload(tree, str(tmp_path))
+    aws_utils.upload_payload(payload, {"bucket": "badger-json", "key": "tree.json"})
+
+    s3.upload_file(
+        payload["path"],
+        "badger-json",
+        "tree.json",
+        ExtraArgs={"Metadata": {"sha256": "0" * 64}},
+    )
+    with pytest.raises(AssertionError):
+        aws_utils.verify_upload(payload, "badger-json", "tree.json")
+
+
+class CountingClient:
+    def __init__(self, client):
+        self.client = client
+        self.downloads = 0
+
+    def get_object(self, **kwargs):
+        self.downloads += 1
+        return self.client.get_object(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def test_past_trees_are_downloaded_once(s3, tmp_path, monkeypatch):
+    monkeypatch.setattr(rewards_config, "treeCachePath", str(tmp_path / "trees"))
+    s3.put_bucket_versioning(
+        Bucket="badger-merkle-proofs", VersioningConfiguration={"Status": "Enabled"}
+    )
+    trees = [make_tree(20, seed=cycle) for cycle in range(3)]
+    for tree in trees:
+        aws_utils.upload("rewards.json", tree)
+    client = CountingClient(s3)
+    monkeypatch.setattr(aws_utils, "s3_client", lambda: client)
+
+    versions = aws_utils.cache_past_trees(2)
+    assert client.downloads == 2
+    assert [aws_utils.tree_cache().load(v) for v in versions] == trees[:0:-1]
+    assert [json.loads(t) for t in aws_utils.download_past_trees(2)] == trees[:0:-1]
+    assert client.downloads == 2
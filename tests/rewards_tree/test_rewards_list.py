@@ -0,0 +1,88 @@
+import pytest
+from assistant.rewards.classes.RewardsList import RewardsList
+from helpers.constants import BADGER, DIGG, FARM
+
+(ALICE, BOB, CAROL) = ("0x" + "aa" * 20, "0x" + "bb" * 20, "0x" + "cc" * 20)
+
+
+def test_rewards_list_accumulates_in_insertion_order():
+    rewards = RewardsList(1, None)
+    (alice, bob) = (ALICE, BOB)
+    rewards.increase_user_rewards(bob, DIGG, 5)
+    rewards.increase_user_rewards(alice, BADGER, 1)
+    rewards.increase_user_rewards(bob, BADGER, 2)
+    rewards.increase_user_rewards(bob, DIGG, 3)
+    rewards.increase_user_rewards(alice, DIGG, -1)
+
+    assert rewards.claims.toDict() == {
+        bob: {DIGG: 8, BADGER: 2},
+        alice: {BADGER: 1, DIGG: 0},
+    }
+    assert list(rewards.claims) == [bob, alice]
+    assert list(rewards.claims[bob]) == [DIGG, BADGER]
+    assert rewards.totals.toDict() == {DIGG: 8, BADGER: 3}
+    assert rewards.getTokenRewards(alice, DIGG) == 0
+    assert rewards.getTokenRewards("0x" + "cc" * 20, BADGER) == 0
+    assert "0x" + "cc" * 20 not in rewards.claims
+
+    (nodes, encodedNodes, entries) = rewards.to_merkle_format()
+    assert [n["user"] for n in nodes] == [bob, alice]
+    assert nodes[0]["tokens"] == [DIGG, BADGER]
+    assert nodes[0]["cumulativeAmounts"] == ["8", "2"]
+
+
+def test_claims_and_totals_are_read_only_views():
+    rewards = RewardsList(1, None)
+    rewards.increase_user_rewards(ALICE, BADGER, 1)
+    claims = rewards.claims
+    totals = rewards.totals
+    aliceClaims = claims[ALICE]
+
+    for view, key in [(claims, BOB), (aliceClaims, DIGG), (totals, DIGG)]:
+        with pytest.raises(TypeError):
+            view[key] = 1
+        with pytest.raises(AttributeError):
+            view.extra = 1
+    with pytest.raises(TypeError):
+        del totals[BADGER]
+
+    with pytest.raises(KeyError):
+        claims[BOB]
+    with pytest.raises(KeyError):
+        aliceClaims[DIGG]
+    with pytest.raises(KeyError):
+        totals[DIGG]
+    assert aliceClaims.get(DIGG, 0) == 0
+
+    # Views read through to the list, later rewards show up in them
+    rewards.increase_user_rewards(ALICE, BADGER, 2)
+    rewards.increase_user_rewards(ALICE, DIGG, 4)
+    rewards.increase_user_rewards(BOB, DIGG, 5)
+    assert aliceClaims.toDict() == {BADGER: 3, DIGG: 4}
+    assert len(aliceClaims) == 2
+    assert dict(totals) == {BADGER: 3, DIGG: 9}
+    assert [user for user, _ in claims.items()] == [ALICE, BOB]
+    assert [v.toDict() for v in claims.values()] == [{BADGER: 3, DIGG: 4}, {DIGG: 5}]
+
+
+def test_interned_id_columns():
+    rewards = RewardsList(1, None)
+    rewards.increase_user_rewards(ALICE, BADGER, 1)
+    rewards.increase_user_rewards(BOB, DIGG, 2)
+    rewards.increase_user_rewards(CAROL, BADGER, 3)
+    rewards.increase_user_rewards(BOB, FARM, 4)
+    rewards.increase_user_rewards(ALICE, FARM, 5)
+
+    assert rewards.users == [ALICE, BOB, CAROL]
+    assert rewards.userIds == {ALICE: 0, BOB: 1, CAROL: 2}
+    assert rewards.tokenList == [BADGER, DIGG, FARM]
+    assert rewards.tokenIds == {BADGER: 0, DIGG: 1, FARM: 2}
+    # Token ids of each user, in the order they first received them
+    assert rewards.userTokens == [[0, 2], [1, 2], [0]]
+
+    # Columns are indexed by user id and only grow when a user past their end
+    # gets the token; users without it read 0 there but have no claim of it
+    assert rewards.columns == [[1, 0, 3], [0, 2], [5, 4, 0]]
+    assert DIGG not in rewards.claims[ALICE]
+    assert rewards.getTokenRewards(CAROL, DIGG) == 0
+    assert rewards.tokenTotals == [sum(column) for column in rewards.columns]
@@ -0,0 +1,40 @@
+import random
+from collections import Counter
+
+from assistant.rewards.rewards_utils import merge_sett_balances
+
+SETT = "0x" + "5e" * 20
+GEYSER = "0x" + "9e" * 20
+
+
+class Contract:
+    def __init__(self, address):
+        self.address = address
+
+
+class Badger:
+    def getSett(self, name):
+        return Contract(SETT)
+
+    def getGeyser(self, name):
+        return Contract(GEYSER)
+
+
+def test_merge_matches_counter_merge():
+    rng = random.Random(11)
+    users = ["0x{:040x}".format(i + 1) for i in range(50)]
+    blacklisted = "0x758a43ee2bff8230eeb784879cdcff4828f2544d"
+    shares = {u: rng.randrange(-10, 10**20) for u in rng.sample(users, 30)}
+    shares[GEYSER] = 10**21
+    shares[blacklisted] = 10**18
+    stakes = {u: rng.randrange(-(10**18), 10**20) for u in rng.sample(users, 30)}
+
+    # Previous Counter based merge
+    expected = dict(Counter({**shares, GEYSER: 0}) + Counter(stakes))
+    del expected[blacklisted]
+
+    merged = merge_sett_balances(Badger(), "native.renCrv", shares, stakes)
+    assert [(u.address, u.balance) for u in merged] == list(expected.items())
+    assert merged.total_balance() == sum(expected.values())
+    assert blacklisted not in merged
+    assert all(u.token == SETT for u in merged)
@@ -0,0 +1,198 @@
+import asyncio
+
+import pytest
+from gql import gql
+
+from assistant.subgraph.cache import (
+    CachedClient,
+    SubgraphCache,
+    SubgraphCacheMiss,
+    get_subgraph_cache,
+    query_block,
+)
+from config.rewards_config import rewards_config
+
+QUERY = gql(
+    """
+    query balances($blockHeight: Block_height, $lastId: String) {
+        balances(block: $blockHeight, where: { id_gt: $lastId }) {
+            id
+        }
+    }
+    """
+)
+
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+
+    def execute(self, document, variable_values=None):
+        self.calls += 1
+        return {"balances": [{"id": "call-{}".format(self.calls)}]}
+
+
+@pytest.fixture
+def cache_config(tmp_path):
+    saved = (
+        rewards_config.subgraphCacheMode,
+        rewards_config.subgraphCachePath,
+        rewards_config.subgraphCacheMaxBytes,
+    )
+    rewards_config.subgraphCacheMode = "readwrite"
+    rewards_config.subgraphCachePath = str(tmp_path / "subgraph-cache.sqlite")
+    yield rewards_config
+    (
+        rewards_config.subgraphCacheMode,
+        rewards_config.subgraphCachePath,
+        rewards_config.subgraphCacheMaxBytes,
+    ) = saved
+
+
+def test_pinned_queries_are_cached(cache_config):
+    client = CountingClient()
+    cached = CachedClient(client, "https://subgraph")
+    pinned = {"blockHeight": {"number": 100}, "lastId": ""}
+
+    first = cached.execute(QUERY, variable_values=pinned)
+    assert cached.execute(QUERY, variable_values=dict(pinned)) == first
+    assert client.calls == 1
+
+    # A different page, block or endpoint is a different entry
+    cached.execute(QUERY, variable_values={**pinned, "lastId": "0x1"})
+    cached.execute(QUERY, variable_values={**pinned, "blockHeight": {"number": 101}})
+    CachedClient(client, "https://other").execute(QUERY, variable_values=pinned)
+    assert client.calls == 4
+
+    # Latest block queries always go to the subgraph
+    cached.execute(QUERY, variable_values={"lastId": ""})
+    cached.execute(QUERY, variable_values={"lastId": ""})
+    assert client.calls == 6
+
+
+def test_replay_mode_never_hits_the_subgraph(cache_config):
+    client = CountingClient()
+    cached = CachedClient(client, "https://subgraph")
+    recorded = cached.execute(QUERY, variable_values={"lastId": ""})
+
+    cache_config.subgraphCacheMode = "replay"
+    assert cached.execute(QUERY, variable_values={"lastId": ""}) == recorded
+    with pytest.raises(SubgraphCacheMiss):
+        cached.execute(QUERY, variable_values={"lastId": "0x1"})
+    assert client.calls == 1
+
+
+def test_least_recently_used_responses_are_evicted(tmp_path):
+    cache = SubgraphCache(str(tmp_path / "cache.sqlite"), maxBytes=None)
+    response = {"balances": [{"id": str(i)} for i in range(100)]}
+    cache.put("a", "e", 1, response)
+    entrySize = cache.totalBytes
+    cache.put("b", "e", 1, response)
+    cache.get("a")
+
+    cache.maxBytes = entrySize * 2
+    cache.put("c", "e", 1, response)
+    assert cache.get("b") is None
+    assert cache.get("a") == response
+    assert cache.get("c") == response
+
+    cache.close()
+    reopened = SubgraphCache(str(tmp_path / "cache.sqlite"), maxBytes=None)
+    assert reopened.get("c") == response
+    assert reopened.totalBytes == entrySize * 2
+
+
+def test_query_block():
+    assert query_block({"blockHeight": {"number": "12"}, "vaultID": {"id": "0x"}}) == 12
+    assert query_block({"lastID": "0x0"}) is None
+    assert query_block(None) is None
+
+
+class SubgraphSession:
+    """
+    Async stand in for a gql session over a vault's balances and a geyser's
+    events, filtering and paging them the way the subgraph does
+    """
+
+    def __init__(self, balances, stakes):
+        self.balances = balances
+        self.stakes = stakes
+        self.calls = 0
+
+    def page(self, entities, where, first):
+        matches = [
+            e
+            for e in entities
+            if e["id"] > where["id_gt"]
+            and ("id_lt" not in where or e["id"] < where["id_lt"])
+        ]
+        return matches[:first]
+
+    async def execute(self, document, variable_values=None):
+        self.calls += 1
+        await asyncio.sleep(0)
+        v = variable_values
+        if "vaultID" in v:
+            balances = self.page(self.balances, v["lastBalanceId"], v["first"])
+            return {"vaults": [{"balances": balances}]}
+        return {
+            "geysers": [
+                {
+                    "totalStaked": "0",
+                    "stakeEvents": self.page(
+                        self.stakes, v["lastStakedId"], v["first"]
+                    ),
+                    "unstakeEvents": self.page([], v["lastUnstakedId"], v["first"]),
+                }
+            ]
+        }
+
+
+def test_prefetched_pages_serve_sett_balance_fetches(cache_config, monkeypatch):
+    from contextlib import asynccontextmanager
+
+    from assistant.subgraph import client, paginator
+    from assistant.subgraph.cache import CachedSession
+    from assistant.subgraph.prefetch import prefetch_sett_balances
+
+    balances = [
+        {
+            "id": "0x{:040x}-0xsett".format((i * 0x9E3779B97F4A7C15) % 2**160),
+            "shareBalanceRaw": str(i * 10),
+        }
+        for i in range(1, 2500)
+    ]
+    balances.sort(key=lambda b: b["id"])
+    stakes = [{"id": "0x{:064x}".format(i << 250), "user": "0xa"} for i in range(50)]
+    session = SubgraphSession(balances, stakes)
+
+    @asynccontextmanager
+    async def open_session(endpoint):
+        yield CachedSession(session, endpoint)
+
+    monkeypatch.setattr(paginator, "open_session", open_session)
+
+    class Badger:
+        class sett_system:
+            vaults = {"native.renCrv": type("Sett", (), {"address": "0xSETT"})}
+
+        def getGeyser(self, name):
+            return type("Geyser", (), {"address": "0xGEYSER"})
+
+    prefetch_sett_balances(Badger(), 1234)
+    prefetched = session.calls
+
+    fetched = client.fetch_sett_balances.__wrapped__("key", "0xsett", 1234)
+    events = client.fetch_geyser_events.__wrapped__("0xgeyser", 1234)
+    assert session.calls == prefetched
+
+    # Same balances in the same order as paging serially, newest page first
+    expected = {}
+    for start in range(0, len(balances), 1000):
+        page = {
+            b["id"].split("-")[0]: int(b["shareBalanceRaw"])
+            for b in balances[start : start + 1000]
+        }
+        expected = {**page, **expected}
+    assert list(fetched.items()) == list(expected.items())
+    assert events["stakes"] == stakes
@@ -0,0 +1,40 @@
+from assistant.subgraph import client
+
+
+class WindowClient:
+    """
+    Serves tree distributions the way the subgraph filters and pages them
+    """
+
+    def __init__(self, distributions):
+        self.distributions = sorted(distributions, key=lambda d: d["id"])
+        self.requests = []
+
+    def execute(self, document, variable_values=None):
+        self.requests.append(variable_values)
+        where = variable_values["where"]
+        matches = [
+            d
+            for d in self.distributions
+            if d["id"] > where["id_gt"]
+            and int(where["blockNumber_gt"])
+            < int(d["blockNumber"])
+            <= int(where["blockNumber_lte"])
+        ]
+        return {"treeDistributions": matches[:1000]}
+
+
+def test_tree_distributions_are_fetched_by_block_window(monkeypatch):
+    distributions = [
+        {"id": "0x{:06x}".format(i), "blockNumber": str(100 + i // 10)}
+        for i in range(5000)
+    ]
+    windowClient = WindowClient(distributions)
+    monkeypatch.setattr(client, "harvests_client", windowClient)
+
+    fetched = client.fetch_tree_distributions(200, 450)
+    expected = [d for d in distributions if 200 < int(d["blockNumber"]) <= 450]
+    assert fetched == expected
+    # 2500 distributions in the window, in three pages
+    assert len(windowClient.requests) == 3
+    assert all(r["blockHeight"] == {"number": 450} for r in windowClient.requests)
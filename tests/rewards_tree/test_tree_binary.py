@@ -0,0 +1,116 @@
+import json
+import random
+
+import pytest
+from brownie import web3
+from assistant.rewards.classes.BinaryTree import BinaryTree
+from assistant.rewards.classes.MerkleTree import rewards_to_merkle_tree
+from assistant.rewards.classes.RewardsList import RewardsList
+from assistant.rewards.tree_binary import (
+    binary_to_json,
+    encode_claim,
+    json_to_binary,
+    load_tree,
+)
+from helpers.constants import BADGER, DIGG
+
+
+def build_tree(numClaimants):
+    rng = random.Random(numClaimants)
+    rewards = RewardsList(1, None)
+    for _ in range(numClaimants):
+        user = web3.toChecksumAddress("0x{:040x}".format(rng.getrandbits(160)))
+        rewards.increase_user_rewards(user, BADGER, rng.getrandbits(80))
+        if rng.random() < 0.5:
+            rewards.increase_user_rewards(user, DIGG, rng.getrandbits(60))
+    return rewards_to_merkle_tree(rewards, 1, 2, {})
+
+
+def write_binary(tmp_path, tree):
+    jsonPath = str(tmp_path / "tree.json")
+    binaryPath = str(tmp_path / "tree.bin")
+    with open(jsonPath, "w") as f:
+        json.dump(tree, f)
+    json_to_binary(jsonPath, binaryPath)
+    return (jsonPath, binaryPath)
+
+
+def test_binary_tree_round_trip(tmp_path):
+    tree = build_tree(300)
+    (jsonPath, binaryPath) = write_binary(tmp_path, tree)
+
+    binary = load_tree(binaryPath)
+    assert isinstance(binary, BinaryTree)
+    assert len(binary["claims"]) == len(tree["claims"])
+    for user, claim in tree["claims"].items():
+        assert binary["claims"][user] == claim
+    assert binary.to_dict() == tree
+    binary.close()
+
+    binary_to_json(binaryPath, str(tmp_path / "tree2.json"))
+    with open(jsonPath) as a, open(str(tmp_path / "tree2.json")) as b:
+        assert a.read() == b.read()
+
+
+def test_claims_that_dont_pack_are_kept_verbatim(tmp_path):
+    tree = build_tree(20)
+    (user, claim) = next(iter(tree["claims"].items()))
+    odd = {
+        # Not the claim layout at all
+        "0x" + "cd" * 20: {"index": "0x05", "user": "someone"},
+        # Extra key
+        "0x" + "ce" * 20: {**claim, "user": "0x" + "ce" * 20, "note": "manual"},
+        # Mixed case but not checksummed
+        "0x" + "Cf" * 20: {**claim, "user": "0x" + "Cf" * 20},
+        # Index too large for the record
+        "0x" + "d0" * 20: {**claim, "user": "0x" + "d0" * 20, "index": hex(2**64)},
+        # Amount that isn't a decimal integer
+        "0x" + "d1" * 20: {
+            **claim,
+            "user": "0x" + "d1" * 20,
+            "cumulativeAmounts": ["1e18"] * len(claim["tokens"]),
+        },
+        # Node that doesn't match the claim, so it wouldn't round trip
+        "0x" + "d2" * 20: {**claim, "user": "0x" + "d2" * 20},
+    }
+    for oddUser, oddClaim in odd.items():
+        tree["claims"][oddUser] = oddClaim
+        if oddUser != "0x" + "d2" * 20:
+            assert encode_claim(oddUser, oddClaim, {}) is None
+    (jsonPath, binaryPath) = write_binary(tmp_path, tree)
+
+    binary = load_tree(binaryPath)
+    for oddUser, oddClaim in odd.items():
+        assert binary["claims"][oddUser] == oddClaim
+    assert binary["claims"][user] == claim
+    binary.close()
+
+    binary_to_json(binaryPath, str(tmp_path / "tree2.json"))
+    with open(jsonPath) as a, open(str(tmp_path / "tree2.json")) as b:
+        assert a.read() == b.read()
+
+
+def test_unknown_address_lookup(tmp_path):
+    tree = build_tree(50)
+    (_, binaryPath) = write_binary(tmp_path, tree)
+    users = sorted(tree["claims"].keys(), key=str.lower)
+
+    with pytest.raises(ValueError):
+        BinaryTree(str(tmp_path / "tree.json"))
+
+    binary = load_tree(binaryPath)
+    claims = binary["claims"]
+    # Below, between and above the indexed addresses
+    for unknown in ["0x" + "00" * 20, "0x" + "ff" * 20, users[0][:-1] + "0"]:
+        if unknown in tree["claims"]:
+            continue
+        assert claims.get(unknown) is None
+        assert claims.get(unknown, "missing") == "missing"
+        assert unknown not in claims
+        with pytest.raises(KeyError):
+            claims[unknown]
+    # Keys are case sensitive, like the json tree
+    assert users[0].lower() != users[0]
+    assert claims.get(users[0].lower()) is None
+    assert users[0] in claims
+    binary.close()
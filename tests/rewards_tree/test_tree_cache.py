@@ -0,0 +1,38 @@
+import gzip
+import io
+import json
+
+from assistant.rewards.classes.TreeCache import TreeCache
+
+TREE = {
+    "merkleRoot": "0x01",
+    "claims": {
+        "0xA": {"index": "0x0", "cumulativeAmounts": ["1"]},
+        "0xB": {"index": "0x1", "cumulativeAmounts": ["2"]},
+    },
+}
+
+
+def test_plain_and_gzip_bodies_are_stored_alike(tmp_path):
+    cache = TreeCache(str(tmp_path))
+    body = json.dumps(TREE).encode()
+    plain = cache.put("v1", io.BytesIO(body))
+    compressed = cache.put("v2", io.BytesIO(gzip.compress(body)))
+
+    assert plain["sha256"] == compressed["sha256"]
+    assert plain["size"] == len(body)
+    assert cache.read("v1") == body
+    assert cache.load("v2") == TREE
+    assert dict(cache.claims("v1")) == TREE["claims"]
+    with open(cache.path(plain["sha256"]), "rb") as f:
+        assert f.read(2) == b"\x1f\x8b"
+
+
+def test_index_survives_restarts(tmp_path):
+    TreeCache(str(tmp_path)).put(
+        "v1", io.BytesIO(json.dumps(TREE).encode()), lastModified="2021-08-01"
+    )
+    cache = TreeCache(str(tmp_path))
+    assert cache.get("v1")["lastModified"] == "2021-08-01"
+    assert cache.get("v2") is None
+    assert cache.load("v1") == TREE
@@ -0,0 +1,72 @@
+import json
+import random
+
+import pytest
+from assistant.rewards import tree_stream
+from assistant.rewards.classes.LazyTree import LazyTree
+from assistant.rewards.tree_stream import dump_tree, iter_claims
+
+
+def build_tree(numClaims):
+    rng = random.Random(numClaims)
+    claims = {}
+    for index in range(numClaims):
+        user = "0x{:040x}".format(rng.getrandbits(160))
+        claims[user] = {
+            "index": hex(index),
+            "user": user,
+            "cycle": hex(42),
+            "tokens": ["0x3472A5A71965499acd81997a54BBA8D852C6E53d"],
+            "cumulativeAmounts": [str(rng.getrandbits(90))],
+            "proof": ["0x" + rng.getrandbits(256).to_bytes(32, "big").hex()],
+            "node": "0x00",
+        }
+    return {
+        "merkleRoot": "0x" + "ab" * 32,
+        "cycle": 42,
+        "startBlock": "1",
+        "endBlock": "2",
+        "tokenTotals": {"0x3472A5A71965499acd81997a54BBA8D852C6E53d": 10**30},
+        "claims": claims,
+        "metadata": {},
+    }
+
+
+@pytest.mark.parametrize("numClaims", [0, 1, 100])
+@pytest.mark.parametrize("indent", [None, 4])
+def test_stream_round_trip(tmp_path, monkeypatch, numClaims, indent):
+    # Force values to straddle buffer refills
+    monkeypatch.setattr(tree_stream, "CHUNK_SIZE", 16)
+    tree = build_tree(numClaims)
+    path = str(tmp_path / "tree.json")
+
+    with open(path, "w") as f:
+        dump_tree({**tree, "claims": iter(tree["claims"].items())}, f, indent)
+    with open(path) as f:
+        assert f.read() == json.dumps(tree, indent=indent)
+
+    with open(path, "rb") as f:
+        assert dict(iter_claims(f)) == tree["claims"]
+
+    with LazyTree(path) as lazy:
+        assert lazy["merkleRoot"] == tree["merkleRoot"]
+        assert len(lazy["claims"]) == numClaims
+        for user, claim in tree["claims"].items():
+            assert user in lazy["claims"]
+            assert lazy["claims"][user] == claim
+        assert lazy.to_dict() == tree
+    assert lazy["claims"]._fp is None
+
+
+@pytest.mark.parametrize("numClaims", [0, 3])
+def test_lazy_tree_rewrites_with_indent(tmp_path, numClaims):
+    tree = build_tree(numClaims)
+    path = str(tmp_path / "tree.json")
+    with open(path, "w") as f:
+        json.dump(tree, f)
+
+    indented = str(tmp_path / "indented.json")
+    with LazyTree(path) as lazy, open(indented, "w") as f:
+        dump_tree(lazy, f, indent=4)
+    with open(indented) as f:
+        assert f.read() == json.dumps(tree, indent=4)